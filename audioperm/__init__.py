@@ -10,5 +10,6 @@ __version__ = "0.0.5"
 __maintainer__ = "https://github.com/zabir-nabil"
 __status__ = "Production"
 
-from .audioperm import read_audio, word_segments, permutations, fixed_len_segments
+from .audioperm import read_audio, word_segments, batch_word_segments, stream_word_segments, permutations, iter_permutations, permutation_segments, batch_permutations, permutation_plan, write_permutations, fixed_len_segments
+from .audioperm import aread_audio, aword_segments, aiter_permutations
 from .audioperm import AudioPerm
\ No newline at end of file
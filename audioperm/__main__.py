@@ -0,0 +1,5 @@
+import sys
+
+from audioperm.cli import main
+
+sys.exit(main())
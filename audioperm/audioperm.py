@@ -1,66 +1,276 @@
+import functools
 import itertools
 import os
-import random
 
 import numpy as np
-import librosa
-import pydub
-import soundfile as sf
 
-from audioperm.utils import type_nested, noise_boundaries, type_chain, save_audio, segment_aud_eq
+from audioperm.utils import type_nested, noise_boundaries, type_chain, load_audio, iter_blocks, native_sr, segment_aud_eq, eq_windows, slice_windows, window_blocks, render_words, as_spans, span_words, permutation_blocks, gather_indices, sample_permutations, permutation_range, rank_range, nonsilent_ranges, batch_noise_boundaries, batch_nonsilent_ranges, stream_nonsilent_ranges
+from audioperm.parallel import parallel_map, n_workers, to_shared, from_shared, free_shared
+from audioperm.cache import get_cache
+from audioperm.stats import Stats, get_stats, stage
+from audioperm.augmentation import augment_arrays
+from audioperm.writer import BackgroundWriter
+from audioperm.shards import ShardWriter
+from audioperm.plan import PermutationPlan, order_dtype
 
 class AudioPerm:
     """
     The main class for audioperm. Takes an audio file (or a batch of files) path or numpy array (int16, float). Internal audio representation is pcm 16 (not same as librosa default).
     """
-    def __init__(self, audio, sr = 22050, **kwargs):
+    def __init__(self, audio, sr = 22050, n_jobs = 1, executor = None, cache = None, stats = None, resample = "librosa", **kwargs):
         """ Reads audio files.
         Args:
             audio (Union[:obj:`list` of :obj:`str`, :obj:`list` of :obj:`ndarray`, ndarray, str]): A list of file paths (str) or A list of numpy array (PCM16, 32FP) 
             sr (int): Sampling rate of audio
+            n_jobs (int): Number of worker processes for decoding, segmentation and rendering (-1 for all cpus)
+            executor (:obj:`concurrent.futures.Executor`): An executor to use instead of creating a process pool
+            cache (Union[:obj:`audioperm.cache.AudioCache`, str]): Cache (or cache directory) for the decoded audio and the segment tables
+            stats (Union[:obj:`audioperm.stats.Stats`, bool]): Record per-stage, per-file timings in ``self.stats`` (True for a new :obj:`audioperm.stats.Stats`)
+            resample (str): Resampler of the files at another rate, "librosa", "soxr" or a polyphase quality ("low", "medium", "high"), see :func:`audioperm.utils.load_audio`
         """
         # if everything is okay
         self.audio_type = type(audio)
-        self.audio_files = read_audio(audio, sr = sr, return_as_array = True)
+        self.n_jobs = n_jobs
+        self.executor = executor
+        self.cache = get_cache(cache)
+        self.stats = get_stats(stats)
+        self.audio_files = read_audio(audio, sr = sr, return_as_array = True, n_jobs = n_jobs, executor = executor, cache = self.cache, stats = self.stats, resample = resample)
         self.sr = sr
         self.words = []
+        self.offsets = []
 
 
-    def word_segments(self, silence_thresh = -60., min_silence_len = 5, return_words = True):
+    def word_segments(self, silence_thresh = -60., min_silence_len = 5, return_words = True, engine = "numpy", return_offsets = False):
         """ Segments the audio files into multiple segments or words.
         TODO: Improve word segmentation. Add label wise segmentation (If given n words as labels, find n appropriate words).
 
         Args:
             silence_thresh (float): Silence threshold for segmenting the audio. Same as pydub.
             min_silence_len (int): Minimum silence lenth (in ms). Same as pydub.
+            engine (str): Silence splitting backend, "numpy" (vectorized) or "pydub".
+            return_offsets (bool): Keep the words as zero-copy views into the audio files and also return the spans of their sample offsets (stored in ``self.offsets``), see :func:`word_segments`.
         
         Returns:
             Union[:obj:`list` of :obj:`list` of :obj:`ndarray`, :obj:`list` of :obj:`ndarray`]
 
         """
-        self.words = word_segments(self.audio_files, self.sr, silence_thresh=silence_thresh, min_silence_len=min_silence_len, return_as_array = True)
+        self.offsets = []
+        out = word_segments(self.audio_files, self.sr, silence_thresh=silence_thresh, min_silence_len=min_silence_len, return_as_array = True, engine = engine, return_offsets = return_offsets, n_jobs = self.n_jobs, executor = self.executor, cache = self.cache, stats = self.stats)
+        if return_offsets:
+            self.words, self.offsets = out
+        else:
+            self.words = out
         
         if return_words == True:
             if self.audio_type == str:
-                return self.words[0]
+                return (self.words[0], self.offsets[0]) if return_offsets else self.words[0]
             elif self.audio_type == np.ndarray:
-                return self.words[0]
+                return (self.words[0], self.offsets[0]) if return_offsets else self.words[0]
             elif self.audio_type == list:
-                return self.words
+                return (self.words, self.offsets) if return_offsets else self.words
             else:
                 raise TypeError(f"audio_type is {self.audio_type}, expected: str, np.ndarray, or list")
 
-    def permutations(self, n_permutations = 1, interm_silence = 1000):
+    def permutations(self, n_permutations = 1, interm_silence = 1000, random = False, seed = None, augment = None, start_rank = 0, stop_rank = None, shard_index = 0, num_shards = 1):
         """Get the permutation of words.
-        TODO: Use yield.
 
         Args:
             n_permutations (int): Number of (max) permutations to return
             interm_silence (int): Intermediate silence between words (in ms).
+            random (bool): Draw distinct random permutations instead of the first n_permutations lexicographic ones.
+            seed (int): Seed for the random permutations.
+            augment (:obj:`audioperm.augmentation.Augmentation`): Augmentation applied to every permutation, with a generator of its rank.
+            start_rank (int): First rank to generate (see :func:`permutations`)
+            stop_rank (int): Rank to stop before, None for n_permutations
+            shard_index (int): Index of the shard of the n_permutations ranks to generate
+            num_shards (int): Number of disjoint shards the ranks are split into
         Returns:
             Union[:obj:`list` of :obj:`list` of :obj:`ndarray`, :obj:`list` of :obj:`ndarray`]
         """
-        audio_perms = permutations(self.words, n_permutations = n_permutations, interm_silence = interm_silence, return_as_array = True)
+        audio_perms = permutations(self.words, sr = self.sr, n_permutations = n_permutations, interm_silence = interm_silence, random = random, seed = seed, return_as_array = True, n_jobs = self.n_jobs, executor = self.executor, stats = self.stats, augment = augment, start_rank = start_rank, stop_rank = stop_rank, shard_index = shard_index, num_shards = num_shards)
+
+        if self.audio_type == str:
+            return audio_perms[0]
+        elif self.audio_type == np.ndarray:
+            return audio_perms[0]
+        elif self.audio_type == list:
+            return audio_perms
+        else:
+            raise TypeError(f"audio_type is {self.audio_type}, expected: str, np.ndarray, or list")
+
+    def iter_permutations(self, n_permutations = 1, interm_silence = 1000, random = False, seed = None, start_rank = 0, stop_rank = None, shard_index = 0, num_shards = 1):
+        """Lazily get the permutation of words, one rendered permutation at a time.
+
+        Args:
+            n_permutations (int): Number of (max) permutations to yield per audio file
+            interm_silence (int): Intermediate silence between words (in ms).
+            random (bool): Draw distinct random permutations instead of the first n_permutations lexicographic ones.
+            seed (int): Seed for the random permutations.
+            start_rank (int): First rank to generate (see :func:`permutations`)
+            stop_rank (int): Rank to stop before, None for n_permutations
+            shard_index (int): Index of the shard of the n_permutations ranks to generate
+            num_shards (int): Number of disjoint shards the ranks are split into
+        Returns:
+            Union[:obj:`generator` of :obj:`ndarray`, :obj:`list` of :obj:`generator` of :obj:`ndarray`]: A generator for a single audio file, a list of generators (one per file) otherwise.
+        """
+        audio_perms = iter_permutations(self.words, sr = self.sr, n_permutations = n_permutations, interm_silence = interm_silence, random = random, seed = seed, return_as_array = True, start_rank = start_rank, stop_rank = stop_rank, shard_index = shard_index, num_shards = num_shards)
+
+        if self.audio_type == str:
+            return audio_perms[0]
+        elif self.audio_type == np.ndarray:
+            return audio_perms[0]
+        elif self.audio_type == list:
+            return audio_perms
+        else:
+            raise TypeError(f"audio_type is {self.audio_type}, expected: str, np.ndarray, or list")
+
+    def batch_permutations(self, n_permutations = 1, interm_silence = 1000, random = False, seed = None, start_rank = 0, stop_rank = None, shard_index = 0, num_shards = 1):
+        """Get the permutation of words as a (n_permutations, n_samples) int16 array per audio file.
+
+        Args:
+            n_permutations (int): Number of (max) permutations to return
+            interm_silence (int): Intermediate silence between words (in ms).
+            random (bool): Draw distinct random permutations instead of the first n_permutations lexicographic ones.
+            seed (int): Seed for the random permutations.
+            start_rank (int): First rank to generate (see :func:`permutations`)
+            stop_rank (int): Rank to stop before, None for n_permutations
+            shard_index (int): Index of the shard of the n_permutations ranks to generate
+            num_shards (int): Number of disjoint shards the ranks are split into
+        Returns:
+            Union[:obj:`list` of :obj:`ndarray`, ndarray]
+        """
+        audio_perms = batch_permutations(self.words, sr = self.sr, n_permutations = n_permutations, interm_silence = interm_silence, random = random, seed = seed, return_as_array = True, stats = self.stats, start_rank = start_rank, stop_rank = stop_rank, shard_index = shard_index, num_shards = num_shards)
+
+        if self.audio_type == str:
+            return audio_perms[0]
+        elif self.audio_type == np.ndarray:
+            return audio_perms[0]
+        elif self.audio_type == list:
+            return audio_perms
+        else:
+            raise TypeError(f"audio_type is {self.audio_type}, expected: str, np.ndarray, or list")
+
+    def permutation_plan(self, n_permutations = 1, interm_silence = 1000, random = False, seed = None, start_rank = 0, stop_rank = None, shard_index = 0, num_shards = 1):
+        """Get the word orders of the permutations without rendering them, see :func:`permutation_plan`. Needs the offsets of ``word_segments(return_offsets = True)``.
+
+        Args:
+            n_permutations (int): Number of (max) permutations per audio file
+            interm_silence (int): Intermediate silence between words (in ms).
+            random (bool): Draw distinct random permutations instead of the first n_permutations lexicographic ones.
+            seed (int): Seed for the random permutations.
+            start_rank (int): First rank to generate (see :func:`permutations`)
+            stop_rank (int): Rank to stop before, None for n_permutations
+            shard_index (int): Index of the shard of the n_permutations ranks to generate
+            num_shards (int): Number of disjoint shards the ranks are split into
+        Returns:
+            Union[:obj:`list` of :obj:`audioperm.plan.PermutationPlan`, :obj:`audioperm.plan.PermutationPlan`]
+        """
+        if len(self.offsets) != len(self.audio_files):
+            raise ValueError("No word offsets, call word_segments(return_offsets = True) first.")
+        plans = permutation_plan(self.offsets, sr = self.sr, n_permutations = n_permutations, interm_silence = interm_silence, random = random, seed = seed, return_as_array = True, start_rank = start_rank, stop_rank = stop_rank, shard_index = shard_index, num_shards = num_shards)
+
+        if self.audio_type == str:
+            return plans[0]
+        elif self.audio_type == np.ndarray:
+            return plans[0]
+        elif self.audio_type == list:
+            return plans
+        else:
+            raise TypeError(f"audio_type is {self.audio_type}, expected: str, np.ndarray, or list")
+
+    def write_permutations(self, save_path, n_permutations = 1, interm_silence = 1000, random = False, seed = None, file_save_tag = "", augment = None, max_pending = 8, shard_size = None, start_rank = 0, stop_rank = None, shard_index = 0, num_shards = 1):
+        """Writes the permutation of words straight to wav files, see :func:`write_permutations`.
+
+        Args:
+            save_path (str): Output directory
+            n_permutations (int): Number of (max) permutations to write per audio file
+            interm_silence (int): Intermediate silence between words (in ms).
+            random (bool): Draw distinct random permutations instead of the first n_permutations lexicographic ones.
+            seed (int): Seed for the random permutations.
+            file_save_tag (str): Tag added to the output file names
+            augment (:obj:`audioperm.augmentation.Augmentation`): Augmentation applied to every permutation, with a generator of its rank.
+            max_pending (int): Maximum number of files waiting to be written
+            shard_size (int): Size (in bytes) of packed shards to write instead of wav files
+            start_rank (int): First rank to generate (see :func:`permutations`)
+            stop_rank (int): Rank to stop before, None for n_permutations
+            shard_index (int): Index of the shard of the n_permutations ranks to generate
+            num_shards (int): Number of disjoint shards the ranks are split into
+        Returns:
+            Union[:obj:`list` of :obj:`list` of :obj:`str`, :obj:`list` of :obj:`str`]: Paths of the written files (clip indices with shard_size)
+        """
+        paths = write_permutations(self.words, save_path, sr = self.sr, n_permutations = n_permutations, interm_silence = interm_silence, random = random, seed = seed, file_save_tag = file_save_tag, augment = augment, max_pending = max_pending, return_as_array = True, shard_size = shard_size, start_rank = start_rank, stop_rank = stop_rank, shard_index = shard_index, num_shards = num_shards)
+
+        if self.audio_type == str:
+            return paths[0]
+        elif self.audio_type == np.ndarray:
+            return paths[0]
+        elif self.audio_type == list:
+            return paths
+        else:
+            raise TypeError(f"audio_type is {self.audio_type}, expected: str, np.ndarray, or list")
+
+    @classmethod
+    async def aload(cls, audio, sr = 22050, executor = None, limit = None, **kwargs):
+        """ Reads audio files without blocking the event loop, see :func:`aread_audio`.
+        Args:
+            audio (Union[:obj:`list` of :obj:`str`, :obj:`list` of :obj:`ndarray`, ndarray, str]): A list of file paths (str) or A list of numpy array (PCM16, 32FP)
+            sr (int): Sampling rate of audio
+            executor (:obj:`concurrent.futures.Executor`): Executor for the decoding, the loop's default (thread pool) if None
+            limit (Union[int, :obj:`asyncio.Semaphore`]): Maximum number of files decoded at the same time
+            **kwargs: Arguments for AudioPerm
+        Returns:
+            AudioPerm: The AudioPerm object
+        """
+        audio_files = await aread_audio(audio, sr = sr, return_as_array = True, executor = executor, limit = limit, cache = kwargs.get("cache"), resample = kwargs.get("resample", "librosa"))
+        ap = cls(audio_files, sr = sr, **kwargs)
+        ap.audio_type = type(audio)
+        return ap
+
+    async def aword_segments(self, silence_thresh = -60., min_silence_len = 5, return_words = True, engine = "numpy", return_offsets = False, executor = None, limit = None):
+        """ Segments the audio files without blocking the event loop, one executor task per file. See :meth:`word_segments`.
+
+        Args:
+            silence_thresh (float): Silence threshold for segmenting the audio. Same as pydub.
+            min_silence_len (int): Minimum silence lenth (in ms). Same as pydub.
+            engine (str): Silence splitting backend, "numpy" (vectorized) or "pydub".
+            return_offsets (bool): Keep the words as zero-copy views into the audio files and also return the spans of their sample offsets (stored in ``self.offsets``), see :func:`word_segments`.
+            executor (:obj:`concurrent.futures.Executor`): Executor for the segmentation, the loop's default (thread pool) if None
+            limit (Union[int, :obj:`asyncio.Semaphore`]): Maximum number of files segmented at the same time
+
+        Returns:
+            Union[:obj:`list` of :obj:`list` of :obj:`ndarray`, :obj:`list` of :obj:`ndarray`]
+        """
+        self.offsets = []
+        out = await aword_segments(self.audio_files, self.sr, silence_thresh = silence_thresh, min_silence_len = min_silence_len, return_as_array = True, engine = engine, return_offsets = return_offsets, cache = self.cache, executor = executor, limit = limit)
+        if return_offsets:
+            self.words, self.offsets = out
+        else:
+            self.words = out
+
+        if return_words == True:
+            if self.audio_type == str:
+                return (self.words[0], self.offsets[0]) if return_offsets else self.words[0]
+            elif self.audio_type == np.ndarray:
+                return (self.words[0], self.offsets[0]) if return_offsets else self.words[0]
+            elif self.audio_type == list:
+                return (self.words, self.offsets) if return_offsets else self.words
+            else:
+                raise TypeError(f"audio_type is {self.audio_type}, expected: str, np.ndarray, or list")
+
+    def aiter_permutations(self, n_permutations = 1, interm_silence = 1000, random = False, seed = None, executor = None, limit = None):
+        """Asynchronously get the permutation of words, every permutation is rendered in the executor. See :meth:`iter_permutations`.
+
+        Args:
+            n_permutations (int): Number of (max) permutations to yield per audio file
+            interm_silence (int): Intermediate silence between words (in ms).
+            random (bool): Draw distinct random permutations instead of the first n_permutations lexicographic ones.
+            seed (int): Seed for the random permutations.
+            executor (:obj:`concurrent.futures.Executor`): Executor for the rendering, the loop's default (thread pool) if None
+            limit (Union[int, :obj:`asyncio.Semaphore`]): Maximum number of permutations rendered at the same time
+        Returns:
+            Union[:obj:`async_generator` of :obj:`ndarray`, :obj:`list` of :obj:`async_generator` of :obj:`ndarray`]: An async generator for a single audio file, a list of them (one per file) otherwise.
+        """
+        audio_perms = aiter_permutations(self.words, sr = self.sr, n_permutations = n_permutations, interm_silence = interm_silence, random = random, seed = seed, return_as_array = True, executor = executor, limit = limit)
 
         if self.audio_type == str:
             return audio_perms[0]
@@ -75,17 +285,79 @@ class AudioPerm:
 """
 audioperm functions
 """
-def read_audio(audio, sr = 22050, return_as_array = False):
+def _worker_stats(track_memory):
+    """A recorder for a worker task, track_memory is None if the caller does not record stats."""
+    return None if track_memory is None else Stats(track_memory)
+
+
+def _decode(filename, sr, stats, i, resample = "librosa"):
+    """Decodes a single audio file to (pcm16, sr)."""
+    with stage(stats, "decode", i) as record:
+        y, y_sr = load_audio(filename, sr, resample)
+        record.update(samples = len(y), bytes = y.nbytes)
+    return y, y_sr
+
+
+def _read_task(args):
+    """Worker task for read_audio, the decoded audio is returned through shared memory."""
+    filename, sr, i, track_memory, resample = args
+    stats = _worker_stats(track_memory)
+    y, y_sr = _decode(filename, sr, stats, i, resample)
+    return to_shared([y]), y_sr, stats.records if stats else []
+
+
+def _decode_files(filenames, sr, n_jobs, executor, stats = None, index = None, resample = "librosa"):
+    """Decodes audio files to (pcm16, sr), in parallel if asked to. index are the positions of the files in the batch, for stats."""
+    index = range(len(filenames)) if index is None else index
+    if n_jobs == 1 and executor is None:
+        return [_decode(f, sr, stats, i, resample) for f, i in zip(filenames, index)]
+    track_memory = stats.track_memory if stats else None
+    results = parallel_map(_read_task, [(f, sr, i, track_memory, resample) for f, i in zip(filenames, index)], n_jobs, executor, cleanup = lambda r: free_shared(r[0]))
+    decoded = []
+    for h, y_sr, records in results:
+        decoded.append((from_shared(h)[0], y_sr))
+        if stats:
+            stats.extend(records)
+    return decoded
+
+
+def _load_files(filenames, sr, n_jobs, executor, cache, stats = None, resample = "librosa"):
+    """Decodes audio files to pcm16, in parallel and through the cache if given."""
+    if cache is None:
+        return [y for y, _ in _decode_files(filenames, sr, n_jobs, executor, stats, resample = resample)]
+    # cache lookups and writes stay in this process, only the misses are decoded by the workers
+    cached = []
+    for i, f in enumerate(filenames):
+        with stage(stats, "cache", i, cache):
+            cached.append(cache.lookup_audio(f, sr, resample))
+    misses = [i for i, c in enumerate(cached) if c is None]
+    decoded = iter(_decode_files([filenames[i] for i in misses], sr, n_jobs, executor, stats, misses, resample))
+    audio_files = []
+    for f, c in zip(filenames, cached):
+        if c is None:
+            c = next(decoded)
+            cache.store_audio(f, sr, *c, resample = resample)
+        audio_files.append(c[0])
+    return audio_files
+
+
+def read_audio(audio, sr = 22050, return_as_array = False, n_jobs = 1, executor = None, cache = None, stats = None, resample = "librosa"):
     """ Reads audio files.
     Args:
         audio (Union[:obj:`list` of :obj:`str`, :obj:`list` of :obj:`ndarray`, ndarray, str]): A list of file paths (str) or A list of numpy array (PCM16, 32FP) 
         sr (int): Sampling rate of audio
+        n_jobs (int): Number of worker processes for decoding a list of files (-1 for all cpus)
+        executor (:obj:`concurrent.futures.Executor`): An executor to use instead of creating a process pool
+        cache (Union[:obj:`audioperm.cache.AudioCache`, str]): Cache (or cache directory) for the decoded audio
+        stats (:obj:`audioperm.stats.Stats`): Recorder for the decode timings
+        resample (str): Resampler of the files at another rate, "librosa", "soxr" or a polyphase quality ("low", "medium", "high"), see :func:`audioperm.utils.load_audio`
     """
+    cache = get_cache(cache)
+    stats = get_stats(stats)
     if type(audio) == list:
         if type_nested(audio, str):
             # read all the filepaths
-            audio_files = [librosa.load(f, sr = sr)[0] for f in audio] # librosa
-            audio_files = [np.array(y * (1<<15), dtype=np.int16) for y in audio_files]
+            audio_files = _load_files(audio, sr, n_jobs, executor, cache, stats, resample)
         elif type_nested(audio, np.ndarray):
             if audio[0].dtype == np.int16:
                 audio_files = audio
@@ -97,8 +369,7 @@ def read_audio(audio, sr = 22050, return_as_array = False):
         else:
             raise TypeError("Takes an audio file (or a list of files) path or numpy array (int16, float). Type mismatch!")
     elif type(audio) == str:
-        audio_files = [librosa.load(audio, sr = sr)[0]] # always use arrays for consistency
-        audio_files = [np.array(y * (1<<15), dtype=np.int16) for y in audio_files]
+        audio_files = _load_files([audio], sr, 1, None, cache, stats, resample) # always use arrays for consistency
     elif type(audio) == np.ndarray:
         if audio.dtype == np.int16:
             audio_files = [audio]
@@ -119,7 +390,153 @@ def read_audio(audio, sr = 22050, return_as_array = False):
             return audio_files
 
 
-def word_segments(audio_files, sr = 22050, silence_thresh = -60., min_silence_len = 5, return_as_array = False):
+def _semaphore(limit):
+    """Resolves the limit argument of the async functions, an int gives a semaphore for a single call, a semaphore can be shared between calls."""
+    import asyncio
+    if limit is None or isinstance(limit, asyncio.Semaphore):
+        return limit
+    return asyncio.Semaphore(limit)
+
+
+async def _offload(func, *args, executor = None, semaphore = None, **kwargs):
+    """Runs func in an executor, at most as many at a time as the semaphore allows.
+    Cancelling the awaiting task cancels the call if it has not started yet, a call that is already running is left to finish in the background."""
+    import asyncio
+    if semaphore is None:
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(func, *args, **kwargs))
+    async with semaphore:
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+async def aread_audio(audio, sr = 22050, return_as_array = False, executor = None, limit = None, cache = None, resample = "librosa"):
+    """ Reads audio files without blocking the event loop, one executor task per file. See :func:`read_audio`.
+    Args:
+        audio (Union[:obj:`list` of :obj:`str`, :obj:`list` of :obj:`ndarray`, ndarray, str]): A list of file paths (str) or A list of numpy array (PCM16, 32FP)
+        sr (int): Sampling rate of audio
+        executor (:obj:`concurrent.futures.Executor`): Executor for the decoding (thread or process pool), the loop's default (thread pool) if None
+        limit (Union[int, :obj:`asyncio.Semaphore`]): Maximum number of files decoded at the same time, share a semaphore to bound several calls together
+        cache (Union[:obj:`audioperm.cache.AudioCache`, str]): Cache (or cache directory) for the decoded audio
+        resample (str): Resampler of the files at another rate, see :func:`read_audio`
+    """
+    import asyncio
+    semaphore = _semaphore(limit)
+    if type(audio) == list and type_nested(audio, str):
+        audio_files = await asyncio.gather(*[_offload(read_audio, f, sr = sr, return_as_array = True, cache = cache, resample = resample, executor = executor, semaphore = semaphore) for f in audio])
+        audio_files = [y[0] for y in audio_files]
+        return audio_files
+    return await _offload(read_audio, audio, sr = sr, return_as_array = return_as_array, cache = cache, resample = resample, executor = executor, semaphore = semaphore)
+
+
+def _merge_chunks(chunks, n_max, n_min):
+    """Merges non-silent chunks into words, attaching the noise-only chunks to the neighbouring words.
+
+    Args:
+        chunks (iterable): (start, end, samples) of every chunk, in order
+        n_max (float): maximum boundary for noise
+        n_min (float): minimum boundary for noise
+    Yields:
+        list: The chunks of every word
+    """
+    pending = {} # chunks that may still be part of a word
+    def flags():
+        last_noise = True
+        for k, chunk in enumerate(chunks):
+            noise = chunk[2].max() <= n_max and chunk[2].min() >= n_min # inside noise boundaries
+            if noise and last_noise:
+                pending.clear() # a noise chunk after a noise chunk starts a new word, see _merge_flags
+            pending[k] = chunk
+            last_noise = noise
+            yield noise, len(chunk[2])
+    for word in _merge_flags(flags()):
+        yield [pending[k] for k in word]
+        for k in [k for k in pending if k < word[0]]: # the next word may extend this one (after a noise closure) or start at its last chunk
+            del pending[k]
+
+
+def _merge_flags(flags):
+    """Merges chunks into words from their noise flags and lengths, see _merge_chunks. Yields the indices of the chunks of every word.
+
+    Args:
+        flags (iterable): (is_noise, length) of every chunk, in order, consumed lazily
+    Yields:
+        list: The indices of the chunks of every word
+    """
+    last_word = -1
+    c_word = []
+    c_len = 0
+    # adding one silence word before and after for avoiding abrupt start and ending
+    for k, (noise, length) in enumerate(flags):
+        if noise:
+            # if we don't want to add noise/ silence
+            if last_word == -1:
+                c_word, c_len = [k], length
+            else:
+                c_word, c_len = c_word + [k], c_len + length # closure
+                yield c_word
+            last_word = -1
+        else:
+            if last_word == -1:
+                c_word, c_len = c_word + [k], c_len + length
+            else:
+                yield c_word
+                c_word, c_len = [k], length
+            last_word = 1
+    if last_word == 1:
+        if c_len > 10: # it should be longer than 10 timepoints for sure
+            yield c_word
+
+
+def _segment_table(y, sr, silence_thresh, min_silence_len, engine, stats = None, i = None):
+    """Segments a single audio file into a table of chunks, the [start, end) sample offsets of the chunks and the word each one belongs to."""
+    with stage(stats, "noise_boundaries", i) as record:
+        n_max, n_min = noise_boundaries(y)
+        record["samples"] = len(y)
+
+    with stage(stats, "split_silence", i) as record:
+        ranges = nonsilent_ranges(y, sr, silence_thresh=silence_thresh, min_silence_len=min_silence_len, engine=engine)
+        record.update(samples = len(y), segments = len(ranges), bytes = ranges.nbytes)
+
+    with stage(stats, "merge_chunks", i) as record:
+        aud_segs = ((start, end, y[start:end]) for start, end in ranges)
+        word_chunks = list(_merge_chunks(aud_segs, n_max, n_min))
+
+        chunks = np.array([[chunk[0], chunk[1]] for c in word_chunks for chunk in c], dtype = np.int64).reshape(-1, 2)
+        word_index = np.array([i for i, c in enumerate(word_chunks) for chunk in c], dtype = np.int64)
+        record.update(samples = int((ranges[:, 1] - ranges[:, 0]).sum()), segments = len(word_chunks), bytes = chunks.nbytes + word_index.nbytes)
+    return chunks, word_index
+
+
+def _word_spans(chunks, word_index):
+    """The (n_spans, 3) [start, end, word] table of the contiguous spans of the words, merging the chunks of a word that follow each other without silence."""
+    chunks = np.asarray(chunks, dtype = np.int64).reshape(-1, 2)
+    word_index = np.asarray(word_index, dtype = np.int64)
+    # a chunk starts a span unless it continues the previous chunk of its word
+    first = np.r_[True, (chunks[1:, 0] != chunks[:-1, 1]) | (word_index[1:] != word_index[:-1])][:len(chunks)]
+    last = np.r_[np.flatnonzero(first)[1:] - 1, len(chunks) - 1][:first.sum()]
+    return np.stack([chunks[first, 0], chunks[last, 1], word_index[first]], axis = 1)
+
+
+def _table_words(y, chunks, word_index, return_offsets):
+    """Builds the words and the [start, end, word] table of their spans from a table of chunks."""
+    spans = _word_spans(chunks, word_index)
+    if return_offsets:
+        # merging chunks is index arithmetic, a word is a view unless it skips a silence
+        seg_words = span_words(y, spans)
+    else:
+        bounds = np.flatnonzero(np.diff(word_index, prepend = -1, append = -1)) # first chunk of every word, and the end
+        seg_words = [np.concatenate([y[start:end] for start, end in chunks[i:j]]).astype(np.int16, copy = False) for i, j in zip(bounds[:-1], bounds[1:])]
+    return seg_words, spans
+
+
+def _segment_task(args):
+    """Worker task for word_segments, the audio comes in through shared memory and only the (small) table of chunks goes back."""
+    handle, sr, silence_thresh, min_silence_len, engine, i, track_memory = args
+    stats = _worker_stats(track_memory)
+    y = from_shared(handle, unlink = False)[0]
+    return _segment_table(y, sr, silence_thresh, min_silence_len, engine, stats, i), stats.records if stats else []
+
+
+def word_segments(audio_files, sr = 22050, silence_thresh = -60., min_silence_len = 5, return_as_array = False, engine = "numpy", return_offsets = False, n_jobs = 1, executor = None, cache = None, stats = None):
     """ Segments the audio files into multiple segments or words.
     TODO: Improve word segmentation. Add label wise segmentation (If given n words as labels, find n appropriate words).
 
@@ -128,81 +545,356 @@ def word_segments(audio_files, sr = 22050, silence_thresh = -60., min_silence_le
         sr (int): Sampling rate for audio files
         silence_thresh (float): Silence threshold for segmenting the audio. Same as pydub.
         min_silence_len (int): Minimum silence lenth (in ms). Same as pydub.
+        engine (str): Silence splitting backend, "numpy" (vectorized) or "pydub". Both split like pydub.silence.split_on_silence.
+        return_offsets (bool): Also return the sample offsets of every word. The words are then zero-copy views into the audio files, except the ones that skip a silence between their chunks (copies, the same samples as without offsets).
+        n_jobs (int): Number of worker processes, one audio file per task (-1 for all cpus)
+        executor (:obj:`concurrent.futures.Executor`): An executor to use instead of creating a process pool
+        cache (Union[:obj:`audioperm.cache.AudioCache`, str]): Cache (or cache directory) for the segment tables
+        stats (:obj:`audioperm.stats.Stats`): Recorder for the timings of the segmentation stages
     
     Returns:
-        Union[:obj:`list` of :obj:`list` of :obj:`ndarray`, :obj:`list` of :obj:`ndarray`]
+        Union[:obj:`list` of :obj:`list` of :obj:`ndarray`, :obj:`list` of :obj:`ndarray`]: The words, or a tuple of (words, offsets) if return_offsets is True, with a (n_spans, 3) int64 array of [start, end, word] rows per audio file: the [start, end) sample offsets of the contiguous spans of the words, one row per word unless a word skips a silence (see :func:`audioperm.utils.span_words`).
 
     """
-    # conversion to AudioSegment
     words = []
+    offsets = []
     type_audio_files = type(audio_files)
     if type_audio_files is not list: # single np.ndarray
         audio_files = [audio_files]
-    for y in audio_files: # can use mp later
-        if len(y.shape) > 1:
-            y = y[:,0] # single channel
+    audio_files = [y[:,0] if len(y.shape) > 1 else y for y in audio_files] # single channel
 
-        n_max, n_min = noise_boundaries(y)
+    cache = get_cache(cache)
+    stats = get_stats(stats)
+    keys = [cache.key("segments", cache.array_key(y), sr, silence_thresh, min_silence_len, engine) for y in audio_files] if cache else [None] * len(audio_files)
+    tables = []
+    for i, key in enumerate(keys):
+        t = None
+        if cache:
+            with stage(stats, "cache", i, cache):
+                t = cache.get(key)
+        tables.append(None if t is None else (t["chunks"], t["word_index"]))
+    misses = [i for i, t in enumerate(tables) if t is None]
 
-        audio_segment = pydub.AudioSegment(
-            y.tobytes(), 
-            frame_rate=sr,
-            sample_width=y.dtype.itemsize, 
-            channels=1)
-        aud_segs = pydub.silence.split_on_silence(audio_segment, silence_thresh=silence_thresh, min_silence_len=5)
-        
-        seg_words = []
-        
-        last_word = -1
-        c_word = np.array([], dtype=np.int16)
-        # adding one silence word before and after for avoiding abrupt start and ending
-        for s in aud_segs:
-            s_pcm16 = np.array(s.get_array_of_samples(), dtype = np.int16)
-            sig_max = s_pcm16.max()
-            sig_min = s_pcm16.min() # negative max
-
-            if (sig_max <= n_max and sig_min >= n_min): # inside noise boundaries
-                # if we don't want to add noise/ silence
-                if last_word == -1:
-                    c_word = s_pcm16
-                else:
-                    c_word = np.r_[c_word, s_pcm16] # closure
-                    seg_words.append(c_word)
-                last_word = -1
-            else:
-                if last_word == -1:
-                    c_word = np.r_[c_word, s_pcm16]
-                else:
-                    seg_words.append(c_word)
-                    c_word = s_pcm16
-                last_word = 1
-        if last_word == 1:
-            if len(c_word) > 10: # it should be longer than 10 timepoints for sure
-                seg_words.append(c_word)
-            
-        
+    if n_jobs == 1 and executor is None:
+        computed = [_segment_table(audio_files[i], sr, silence_thresh, min_silence_len, engine, stats, i) for i in misses]
+    else:
+        track_memory = stats.track_memory if stats else None
+        handles = [to_shared([audio_files[i]]) for i in misses]
+        try:
+            results = parallel_map(_segment_task, [(h, sr, silence_thresh, min_silence_len, engine, i, track_memory) for h, i in zip(handles, misses)], n_jobs, executor)
+        finally:
+            for h in handles:
+                free_shared(h)
+        computed = []
+        for table, records in results:
+            computed.append(table)
+            if stats:
+                stats.extend(records)
+    computed = iter(computed)
+
+    for i, (y, key, table) in enumerate(zip(audio_files, keys, tables)):
+        if table is None:
+            table = next(computed)
+            if cache:
+                cache.put(key, chunks = table[0], word_index = table[1])
+        with stage(stats, "words", i) as record:
+            seg_words, seg_offsets = _table_words(y, table[0], table[1], return_offsets)
+            record.update(samples = len(y), segments = len(seg_words), bytes = sum(w.nbytes for w in seg_words if w.base is None)) # views take no memory
         words.append(seg_words)
+        offsets.append(seg_offsets)
     # if everything is okay
     if return_as_array:
-        return words
+        return (words, offsets) if return_offsets else words
     else:
         if type_audio_files == np.ndarray:
-            return words[0]
+            return (words[0], offsets[0]) if return_offsets else words[0]
         elif type_audio_files == list:
-            return words
+            return (words, offsets) if return_offsets else words
         else:
             raise TypeError("Takes an audio file (or a list of files) in numpy array format (int16, float). Type mismatch!")
 
 
-def permutations(words, sr = 22050, n_permutations = 1, interm_silence = 1000, random = False, return_as_array = False):
-    """Get the permutation of words.
-    TODO: Use yield.
+def _batch_tables(batch, lengths, sr, silence_thresh, min_silence_len):
+    """Segment tables of the clips of a zero padded batch, the noise boundaries, the silence and the chunk peaks of all the clips at once."""
+    n_max, n_min = batch_noise_boundaries(batch)
+    ranges = batch_nonsilent_ranges(batch, lengths, sr, silence_thresh = silence_thresh, min_silence_len = min_silence_len)
+    # peaks of every chunk of every clip, with one reduceat over the flattened batch
+    counts = np.array([len(r) for r in ranges], dtype = np.int64)
+    rows = np.repeat(np.arange(len(batch)), counts)
+    flat_idx = (np.concatenate(ranges) + (rows * batch.shape[1])[:, None]).ravel()
+    flat = np.r_[batch.ravel(), np.int16(0)] # an end offset may be the end of the batch
+    if len(flat_idx):
+        is_noise = (np.maximum.reduceat(flat, flat_idx)[::2] <= n_max[rows]) & (np.minimum.reduceat(flat, flat_idx)[::2] >= n_min[rows])
+    else:
+        is_noise = np.zeros(0, dtype = bool)
+    tables = []
+    for r, i, j in zip(ranges, np.cumsum(counts) - counts, np.cumsum(counts)):
+        word_chunks = list(_merge_flags(zip(is_noise[i:j], r[:, 1] - r[:, 0])))
+        word_index = np.array([w for w, c in enumerate(word_chunks) for k in c], dtype = np.int64)
+        tables.append((r[[k for c in word_chunks for k in c]].reshape(-1, 2), word_index))
+    return tables
+
+
+def batch_word_segments(clips, lengths = None, sr = 22050, silence_thresh = -60., min_silence_len = 5, return_words = False, batch_samples = 1<<22, stats = None):
+    """ Segments many short clips (e.g. keyword clips of a few seconds) into words with vectorized passes over batches of clips, instead of a call per clip.
+    The noise boundaries, the framed rms, the silence runs and the chunk peaks of a batch are computed with numpy along axis 1, the offsets are the ones of ``word_segments(clips, engine = "numpy", return_offsets = True)``.
+    The clips are sorted by length and cut into zero padded batches of about batch_samples samples, which bounds the memory (about 20 bytes per padded sample).
 
     Args:
-        n_permutations (int): Number of (max) permutations to return
+        clips (Union[:obj:`list` of :obj:`ndarray`, ndarray]): A list of clips, or a zero padded (n_clips, n_samples) array (pcm16)
+        lengths (ndarray): Length (in samples) of every row of a padded array, None for full rows
+        sr (int): Sampling rate of the clips
+        silence_thresh (float): Silence threshold for segmenting the audio. Same as pydub.
+        min_silence_len (int): Minimum silence lenth (in ms). Same as pydub.
+        return_words (bool): Also return the words, as views into the clips (see :func:`word_segments`)
+        batch_samples (int): Number of (padded) samples per batch
+        stats (:obj:`audioperm.stats.Stats`): Recorder for the timing of every batch (stage ``batch_segments``, the file is the index of the batch)
+
+    Returns:
+        Union[:obj:`list` of :obj:`ndarray`, tuple]: A (n_spans, 3) int64 array of [start, end, word] rows per clip (see :func:`word_segments`), or a tuple of (words, offsets) if return_words is True.
+    """
+    if type(clips) == np.ndarray and clips.ndim == 2:
+        lengths = [clips.shape[1]] * len(clips) if lengths is None else lengths
+        clips = [row[:n] for row, n in zip(clips, lengths)]
+    elif type(clips) != list:
+        raise TypeError("Takes a list of np.ndarray or a (n_clips, n_samples) np.ndarray. Type mismatch!")
+    if not all(type(y) == np.ndarray and y.dtype == np.int16 for y in clips):
+        raise TypeError("The clips should be pcm16 (int16) numpy arrays.")
+    clips = [y[:, 0] if y.ndim > 1 else y for y in clips] # single channel
+
+    stats = get_stats(stats)
+    order = np.argsort([len(y) for y in clips], kind = "stable") # clips of similar lengths share a batch, less padding
+    tables = [None] * len(clips)
+    start, k = 0, 0
+    while start < len(order):
+        stop = start + 1
+        while stop < len(order) and (stop - start + 1) * len(clips[order[stop]]) <= batch_samples:
+            stop += 1
+        idx = order[start:stop]
+        with stage(stats, "batch_segments", k) as record:
+            batch = np.zeros((len(idx), len(clips[idx[-1]])), dtype = np.int16)
+            for row, i in zip(batch, idx):
+                row[:len(clips[i])] = clips[i]
+            for i, table in zip(idx, _batch_tables(batch, [len(clips[i]) for i in idx], sr, silence_thresh, min_silence_len)):
+                tables[i] = table
+            record.update(samples = batch.size, segments = len(idx), bytes = batch.nbytes)
+        start, k = stop, k + 1
+
+    words, offsets = [], []
+    for y, (chunks, word_index) in zip(clips, tables):
+        seg_words, seg_offsets = _table_words(y, chunks, word_index, True)
+        words.append(seg_words)
+        offsets.append(seg_offsets)
+    return (words, offsets) if return_words else offsets
+
+
+async def aword_segments(audio_files, sr = 22050, silence_thresh = -60., min_silence_len = 5, return_as_array = False, engine = "numpy", return_offsets = False, cache = None, executor = None, limit = None):
+    """ Segments the audio files into words without blocking the event loop, one executor task per file. See :func:`word_segments`.
+    Cancellation takes effect between files.
+
+    Args:
+        audio_files (Union[:obj:`list` of :obj:`ndarray`, ndarray]): The audio files (pcm16)
+        sr (int): Sampling rate for audio files
+        silence_thresh (float): Silence threshold for segmenting the audio. Same as pydub.
+        min_silence_len (int): Minimum silence lenth (in ms). Same as pydub.
+        engine (str): Silence splitting backend, "numpy" (vectorized) or "pydub".
+        return_offsets (bool): Also return the sample offsets of every word, see :func:`word_segments`.
+        cache (Union[:obj:`audioperm.cache.AudioCache`, str]): Cache (or cache directory) for the segment tables
+        executor (:obj:`concurrent.futures.Executor`): Executor for the segmentation (thread or process pool), the loop's default (thread pool) if None
+        limit (Union[int, :obj:`asyncio.Semaphore`]): Maximum number of files segmented at the same time, share a semaphore to bound several calls together
+
+    Returns:
+        Union[:obj:`list` of :obj:`list` of :obj:`ndarray`, :obj:`list` of :obj:`ndarray`]: The words, or a tuple of (words, offsets) if return_offsets is True.
+    """
+    import asyncio
+    semaphore = _semaphore(limit)
+    type_audio_files = type(audio_files)
+    files = audio_files if type_audio_files is list else [audio_files]
+    results = await asyncio.gather(*[_offload(word_segments, [y], sr, silence_thresh = silence_thresh, min_silence_len = min_silence_len, return_as_array = True, engine = engine, return_offsets = return_offsets, cache = cache, executor = executor, semaphore = semaphore) for y in files])
+    if return_offsets:
+        words, offsets = [r[0][0] for r in results], [r[1][0] for r in results]
+    else:
+        words, offsets = [r[0] for r in results], []
+    if return_as_array or type_audio_files == list:
+        return (words, offsets) if return_offsets else words
+    return (words[0], offsets[0]) if return_offsets else words[0]
+
+
+def stream_word_segments(audio, sr = 22050, silence_thresh = -60., min_silence_len = 5, engine = "numpy", block_size = 1<<20, return_offsets = False, resample = "librosa"):
+    """ Segments a (very long) audio into words, yielding every word as soon as it is complete.
+    The audio is read block by block (SoundFile.blocks for audio files at the sampling rate, np.memmap for .npy files and arrays), so memory depends on block_size and the longest word, not on the length of the file.
+    The noise boundaries come from a first O(n) histogram pass over the blocks, the silence splitter (:func:`audioperm.utils.stream_nonsilent_ranges`) scans every block once and carries its state across block boundaries.
+    The words are the ones of word_segments.
+    Audio files that need resampling with librosa (or that soundfile can't read) are decoded into memory first, a polyphase ``resample`` streams them through :func:`audioperm.resample.resample_blocks`.
+
+    Args:
+        audio (Union[str, ndarray]): Filepath of an audio (or .npy) file, or a numpy array / np.memmap (PCM16, 32FP)
+        sr (int): Sampling rate of audio, None for the native one of an audio file
+        silence_thresh (float): Silence threshold for segmenting the audio. Same as pydub.
+        min_silence_len (int): Minimum silence lenth (in ms). Same as pydub.
+        engine (str): Silence splitting backend, "numpy" (vectorized) or "pydub".
+        block_size (int): Block size (in samples)
+        return_offsets (bool): Yield (word, spans) with the [start, end, word] rows of the spans of the word, the rows of word_segments(return_offsets = True).
+        resample (str): Resampler of an audio file at another rate, "librosa", "soxr" or a polyphase quality ("low", "medium", "high")
+    Yields:
+        ndarray: The next word (int16)
+    """
+    if type(audio) == str and not audio.endswith(".npy"):
+        file_sr = native_sr(audio)
+        if sr is None:
+            sr = file_sr
+        if file_sr is None or (file_sr != sr and resample == "librosa"):
+            audio, sr = load_audio(audio, sr, resample) # can't be streamed
+    if sr is None:
+        raise ValueError("sr is required for numpy arrays and .npy files")
+
+    n_max, n_min = noise_boundaries(iter_blocks(audio, sr, block_size, resample), method = "histogram")
+    chunks = stream_nonsilent_ranges(iter_blocks(audio, sr, block_size, resample), sr, silence_thresh = silence_thresh, min_silence_len = min_silence_len, engine = engine)
+    for k, c in enumerate(_merge_chunks(chunks, n_max, n_min)):
+        word = c[0][2] if len(c) == 1 else np.concatenate([chunk[2] for chunk in c]) # the chunks are copies already
+        if return_offsets:
+            yield word, _word_spans([chunk[:2] for chunk in c], np.full(len(c), k))
+        else:
+            yield word
+
+
+def _permutation_orders(n_words, n_permutations, random = False, rng = None, ranks = None):
+    """Yields the word orders of the ranks (range(n_permutations) by default), lexicographic or distinct random samples."""
+    ranks = range(n_permutations) if ranks is None else ranks
+    if random:
+        return itertools.islice(sample_permutations(n_words, rng, ranks.start), len(ranks))
+    return permutation_range(n_words, ranks.start, ranks.stop)
+
+
+def _file_rngs(seed, n_files):
+    """Independent random generators for every audio file, so lazy outputs do not depend on consumption order."""
+    return [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(n_files)]
+
+
+def _augment_seeds(seed, n_files):
+    """Seed sequences for the augmentation of every audio file, independent of the ones drawing the permutations, see _rank_rng."""
+    return np.random.SeedSequence(seed).spawn(2 * n_files)[n_files:]
+
+
+def _rank_rng(augment_seed, rank):
+    """Random generator for the augmentation of a single rank (permutation or segment) of a file, the same whichever shard or resumed range generates the rank."""
+    return np.random.default_rng(np.random.SeedSequence(augment_seed.entropy, spawn_key = augment_seed.spawn_key + (int(rank),)))
+
+
+def _gaps(n_words, gap, augment, augment_rng):
+    """Silence after every word of a permutation, random if augment asks for it."""
+    gaps = getattr(augment, "gaps", None)
+    g = gaps(1, n_words, gap, augment_rng) if gaps else None
+    return gap if g is None else g[0]
+
+
+def _iter_word_permutations(audio, sr, n_permutations, interm_silence, random = False, rng = None, augment = None, augment_seed = None, ranks = None):
+    """Yields the rendered permutations of a single list of words, with random gaps and augmented if augment is set, each from the generator of its rank."""
+    gap = int(sr * interm_silence / 1000.)
+    ranks = range(n_permutations) if ranks is None else ranks
+    for rank, idxs in zip(ranks, _permutation_orders(len(audio), n_permutations, random, rng, ranks)):
+        if augment is None:
+            yield render_words(audio, idxs, gap)
+        else:
+            augment_rng = _rank_rng(augment_seed, rank)
+            yield augment_arrays(augment, [render_words(audio, idxs, _gaps(len(audio), gap, augment, augment_rng))], augment_rng)[0]
+
+
+def permutation_segments(items, n_files, sr = 22050, segment_size = 1.0, n_permutations = 1, interm_silence = 1000, random = True, seed = None, augment = None):
+    """Lazily get the fixed length segments of the permutations of the words of audio files, one file at a time.
+    Every permutation is cut into the windows of segment_size seconds of :func:`fixed_len_segments` (padded to the same length), the segments of a file only depend on the seed and the index of the file.
+
+    Args:
+        items (iterable): (file index, words) of the files, in any order (e.g. one worker's share of a corpus)
+        n_files (int): Number of files the indices refer to
+        sr (int): Sampling rate of the words
+        segment_size (float): Segment size (in sec.)
+        n_permutations (int): Number of (max) permutations per file
+        interm_silence (int): Intermediate silence between words (in ms).
+        random (bool): Draw distinct random permutations instead of the first n_permutations lexicographic ones.
+        seed (Union[int, list]): Seed for the permutations and the augmentation
+        augment (:obj:`audioperm.augmentation.Augmentation`): Augmentation applied to the segments of every permutation as one batch
+    Yields:
+        tuple: (file index, segment) of every segment (int16)
+    """
+    rngs, augment_seeds = _file_rngs(seed, n_files), _augment_seeds(seed, n_files)
+    gap = int(sr * interm_silence / 1000.)
+    k = int(segment_size * 1000)
+    n = int(k * (sr / 1000.0)) # pydub's millisecond grid
+    for i, words in items:
+        for rank, idxs in enumerate(_permutation_orders(len(words), n_permutations, random, rngs[i])):
+            augment_rng = None if augment is None else _rank_rng(augment_seeds[i], rank)
+            perm = render_words(words, idxs, _gaps(len(words), gap, augment, augment_rng))
+            segs = []
+            for start, end in eq_windows(len(perm), sr, k):
+                seg = np.zeros(n, dtype = np.int16) # the windows differ by a sample or a millisecond, they are padded to n
+                seg[:min(end - start, n)] = perm[start:start + min(end - start, n)]
+                segs.append(seg)
+            if augment is not None:
+                segs = augment_arrays(augment, segs, augment_rng) # the segments of a permutation as one batch
+            for seg in segs:
+                yield i, seg
+
+
+def iter_permutations(words, sr = 22050, n_permutations = 1, interm_silence = 1000, random = False, seed = None, return_as_array = False, start_rank = 0, stop_rank = None, shard_index = 0, num_shards = 1):
+    """Lazily get the permutation of words. Only one rendered permutation is held in memory at a time.
+
+    Args:
+        words (Union[:obj:`list` of :obj:`ndarray`, :obj:`list` of :obj:`list` of :obj:`ndarray`]): Words of one audio file or a list of words per audio file.
+        sr (int): Sampling rate of the words
+        n_permutations (int): Number of (max) permutations to yield per audio file
         interm_silence (int): Intermediate silence between words (in ms).
+        random (bool): Draw distinct random permutations instead of the first n_permutations lexicographic ones.
+        seed (int): Seed for the random permutations.
+        start_rank (int): First rank to generate, the position in the sequence of permutations (the lexicographic rank if random is False).
+        stop_rank (int): Rank to stop before, None for n_permutations.
+        shard_index (int): Index of the shard of the n_permutations ranks to generate, see :func:`audioperm.utils.rank_range`.
+        num_shards (int): Number of disjoint shards the ranks are split into.
     Returns:
-        Union[:obj:`list` of :obj:`list` of :obj:`ndarray`, :obj:`list` of :obj:`ndarray`]
+        Union[:obj:`list` of :obj:`generator` of :obj:`ndarray`, :obj:`generator` of :obj:`ndarray`]: A generator per audio file.
+    """
+    type_list_of_words = False
+    if type_chain(words, [list, np.ndarray]):
+        words = [words]
+    elif type_chain(words, [list, list, np.ndarray]):
+        type_list_of_words = True
+    else:
+        raise TypeError("Takes a list of np.ndarray or list of list of np.ndarray. Type mismatch!")
+
+    rngs = _file_rngs(seed, len(words))
+    ranks = rank_range(n_permutations, start_rank, stop_rank, shard_index, num_shards)
+    audio_perms = [_iter_word_permutations(audio, sr, n_permutations, interm_silence, random, rng, ranks = ranks) for audio, rng in zip(words, rngs)]
+
+    if return_as_array == True:
+        return audio_perms
+    elif type_list_of_words == False:
+        return audio_perms[0]
+    else:
+        return audio_perms
+
+
+async def _aiter_word_permutations(audio, sr, n_permutations, interm_silence, random, rng, executor, semaphore):
+    """Yields the rendered permutations of a single list of words, each one rendered in the executor."""
+    gap = int(sr * interm_silence / 1000.)
+    for idxs in _permutation_orders(len(audio), n_permutations, random, rng):
+        yield await _offload(render_words, audio, idxs, gap, executor = executor, semaphore = semaphore)
+
+
+def aiter_permutations(words, sr = 22050, n_permutations = 1, interm_silence = 1000, random = False, seed = None, return_as_array = False, executor = None, limit = None):
+    """Asynchronously get the permutation of words, each permutation is rendered in the executor so the event loop keeps running. See :func:`iter_permutations`.
+    The orders are drawn in the calling thread, so the outputs are the same as iter_permutations with the same seed. A thread pool avoids pickling the words for every permutation.
+
+    Args:
+        words (Union[:obj:`list` of :obj:`ndarray`, :obj:`list` of :obj:`list` of :obj:`ndarray`]): Words of one audio file or a list of words per audio file.
+        sr (int): Sampling rate of the words
+        n_permutations (int): Number of (max) permutations to yield per audio file
+        interm_silence (int): Intermediate silence between words (in ms).
+        random (bool): Draw distinct random permutations instead of the first n_permutations lexicographic ones.
+        seed (int): Seed for the random permutations.
+        executor (:obj:`concurrent.futures.Executor`): Executor for the rendering, the loop's default (thread pool) if None
+        limit (Union[int, :obj:`asyncio.Semaphore`]): Maximum number of permutations rendered at the same time (across the files)
+    Returns:
+        Union[:obj:`list` of :obj:`async_generator` of :obj:`ndarray`, :obj:`async_generator` of :obj:`ndarray`]: An async generator per audio file.
     """
     type_list_of_words = False
     if type_chain(words, [list, np.ndarray]):
@@ -212,20 +904,167 @@ def permutations(words, sr = 22050, n_permutations = 1, interm_silence = 1000, r
     else:
         raise TypeError("Takes a list of np.ndarray or list of list of np.ndarray. Type mismatch!")
 
+    semaphore = _semaphore(limit)
+    audio_perms = [_aiter_word_permutations(audio, sr, n_permutations, interm_silence, random, rng, executor, semaphore) for audio, rng in zip(words, _file_rngs(seed, len(words)))]
+
+    if return_as_array == True:
+        return audio_perms
+    elif type_list_of_words == False:
+        return audio_perms[0]
+    else:
+        return audio_perms
+
+
+def batch_permutations(words, sr = 22050, n_permutations = 1, interm_silence = 1000, random = False, seed = None, return_as_array = False, stats = None, start_rank = 0, stop_rank = None, shard_index = 0, num_shards = 1):
+    """Get the permutation of words as a single 2-D array. The words (and the silence after each one) are concatenated once and every permutation is gathered from that base buffer with one fancy-index operation.
+    All the permutations of one list of words share the same length, so they fit in a dense matrix.
 
+    Args:
+        words (Union[:obj:`list` of :obj:`ndarray`, :obj:`list` of :obj:`list` of :obj:`ndarray`]): Words of one audio file or a list of words per audio file.
+        sr (int): Sampling rate of the words
+        n_permutations (int): Number of (max) permutations to return
+        interm_silence (int): Intermediate silence between words (in ms).
+        random (bool): Draw distinct random permutations instead of the first n_permutations lexicographic ones.
+        seed (int): Seed for the random permutations.
+        stats (:obj:`audioperm.stats.Stats`): Recorder for the rendering timings
+        start_rank (int): First rank to generate, the position in the sequence of permutations (the lexicographic rank if random is False).
+        stop_rank (int): Rank to stop before, None for n_permutations.
+        shard_index (int): Index of the shard of the n_permutations ranks to generate, see :func:`audioperm.utils.rank_range`.
+        num_shards (int): Number of disjoint shards the ranks are split into.
+    Returns:
+        Union[:obj:`list` of :obj:`ndarray`, ndarray]: A (n_permutations, n_samples) int16 array per audio file.
+    """
+    type_list_of_words = False
+    if type_chain(words, [list, np.ndarray]):
+        words = [words]
+    elif type_chain(words, [list, list, np.ndarray]):
+        type_list_of_words = True
+    else:
+        raise TypeError("Takes a list of np.ndarray or list of list of np.ndarray. Type mismatch!")
+
+    stats = get_stats(stats)
+    gap = int(sr * interm_silence / 1000.)
+    ranks = rank_range(n_permutations, start_rank, stop_rank, shard_index, num_shards)
     audio_perms = []
+    for i, (audio, rng) in enumerate(zip(words, _file_rngs(seed, len(words)))):
+        with stage(stats, "permutations", i) as record:
+            base = render_words(audio, range(len(audio)), gap)
+            orders = list(_permutation_orders(len(audio), n_permutations, random, rng, ranks))
+            orders = np.array(orders, dtype = np.intp).reshape(len(orders), len(audio))
+            idx = gather_indices([len(w) + gap for w in audio], orders)
+            audio_perms.append(base[idx])
+            record.update(samples = audio_perms[-1].size, segments = len(orders), bytes = audio_perms[-1].nbytes)
+
+    if return_as_array == True:
+        return audio_perms
+    elif type_list_of_words == False:
+        return audio_perms[0]
+    else:
+        return audio_perms
+
+
+def _render_file(perms, stats, i):
+    """Renders the lazy permutations of a single audio file."""
+    with stage(stats, "permutations", i) as record:
+        perms = list(perms)
+        record.update(samples = sum(len(p) for p in perms), segments = len(perms), bytes = sum(p.nbytes for p in perms))
+    return perms
 
-    for audio in words:
-        # audio = list of ndarray [word1, word2, word3]
-        c_audio = []
-        for ind, idxs in enumerate(itertools.permutations(range(len(audio)))):
-            if ind == n_permutations:
-                break
-            x = np.append([], [np.r_[audio[i], np.zeros(int(sr * interm_silence / 1000.))] for i in idxs])
-            x = np.hstack(x).astype(np.int16)
-            c_audio.append(x)
-        # c_audio = np.hstack(c_audio).astype(np.int16)
-        audio_perms.append(c_audio)
+
+def permutation_plan(offsets, sr = 22050, n_permutations = 1, interm_silence = 1000, random = False, seed = None, return_as_array = False, start_rank = 0, stop_rank = None, shard_index = 0, num_shards = 1):
+    """Get the word orders of the permutations as plans, without rendering any audio. The orders are the ones :func:`permutations` renders with the same seed.
+    ``plan.render(y, i)`` gives the i-th permutation of the words of word_segments(return_offsets = True), whose offsets the plan keeps.
+
+    Args:
+        offsets (Union[ndarray, :obj:`list` of :obj:`ndarray`]): The (n_spans, 3) word spans of one audio file or a list of them, from word_segments(return_offsets = True), or (n_words, 2) offsets of a single span per word
+        sr (int): Sampling rate of the audio
+        n_permutations (int): Number of (max) permutations per audio file
+        interm_silence (int): Intermediate silence between words (in ms).
+        random (bool): Draw distinct random permutations instead of the first n_permutations lexicographic ones.
+        seed (int): Seed for the random permutations.
+        start_rank (int): First rank to generate, the position in the sequence of permutations (the lexicographic rank if random is False).
+        stop_rank (int): Rank to stop before, None for n_permutations.
+        shard_index (int): Index of the shard of the n_permutations ranks to generate, see :func:`audioperm.utils.rank_range`.
+        num_shards (int): Number of disjoint shards the ranks are split into.
+    Returns:
+        Union[:obj:`list` of :obj:`audioperm.plan.PermutationPlan`, :obj:`audioperm.plan.PermutationPlan`]: A plan per audio file
+    """
+    type_list_of_offsets = type(offsets) == list
+    if type(offsets) == np.ndarray:
+        offsets = [offsets]
+    elif not type_list_of_offsets or not type_nested(offsets, np.ndarray):
+        raise TypeError("Takes a (n_spans, 3) np.ndarray or list of np.ndarray of word spans. Type mismatch!")
+
+    gap = int(sr * interm_silence / 1000.)
+    ranks = rank_range(n_permutations, start_rank, stop_rank, shard_index, num_shards)
+    plans = []
+    for o, rng in zip(offsets, _file_rngs(seed, len(offsets))):
+        o = as_spans(o)
+        n_words = int(o[-1, 2]) + 1 if len(o) else 0
+        orders = _permutation_orders(n_words, n_permutations, random, rng, ranks)
+        if n_words:
+            orders = np.fromiter(itertools.chain.from_iterable(orders), dtype = order_dtype(n_words)).reshape(-1, n_words) # without a list of tuples
+        else:
+            orders = np.zeros((sum(1 for _ in orders), 0), dtype = order_dtype(0)) # the empty permutation of no words
+        plans.append(PermutationPlan(orders, o, gap, sr))
+
+    if return_as_array == True or type_list_of_offsets:
+        return plans
+    return plans[0]
+
+
+def _permute_task(args):
+    """Worker task for permutations, the words come in and the permutations go back through shared memory."""
+    handle, sr, n_permutations, interm_silence, random, rng, augment, augment_seed, ranks, i, track_memory = args
+    stats = _worker_stats(track_memory)
+    audio = from_shared(handle, unlink = False)
+    perms = _render_file(_iter_word_permutations(audio, sr, n_permutations, interm_silence, random, rng, augment, augment_seed, ranks), stats, i)
+    return to_shared(perms), stats.records if stats else []
+
+
+def permutations(words, sr = 22050, n_permutations = 1, interm_silence = 1000, random = False, seed = None, return_as_array = False, n_jobs = 1, executor = None, stats = None, augment = None, start_rank = 0, stop_rank = None, shard_index = 0, num_shards = 1):
+    """Get the permutation of words. See :func:`iter_permutations` for a lazy version.
+    The permutations have a deterministic rank, so several jobs (e.g. one per machine) split one job with ``shard_index``/``num_shards`` or ``start_rank``/``stop_rank`` and produce disjoint outputs, the same as a single job.
+
+    Args:
+        n_permutations (int): Number of (max) permutations to return
+        interm_silence (int): Intermediate silence between words (in ms).
+        random (bool): Draw distinct random permutations instead of the first n_permutations lexicographic ones.
+        seed (int): Seed for the random permutations.
+        n_jobs (int): Number of worker processes, one audio file per task (-1 for all cpus)
+        executor (:obj:`concurrent.futures.Executor`): An executor to use instead of creating a process pool
+        stats (:obj:`audioperm.stats.Stats`): Recorder for the rendering timings
+        augment (:obj:`audioperm.augmentation.Augmentation`): Augmentation (or any callable taking a (batch, samples) array and a Generator), applied to every permutation with a generator of (seed, file, rank), so sharded or resumed ranges augment a rank as one job would.
+        start_rank (int): First rank to generate, the position in the sequence of permutations (the lexicographic rank if random is False).
+        stop_rank (int): Rank to stop before, None for n_permutations.
+        shard_index (int): Index of the shard of the n_permutations ranks to generate, see :func:`audioperm.utils.rank_range`.
+        num_shards (int): Number of disjoint shards the ranks are split into.
+    Returns:
+        Union[:obj:`list` of :obj:`list` of :obj:`ndarray`, :obj:`list` of :obj:`ndarray`]
+    """
+    stats = get_stats(stats)
+    type_list_of_words = type_chain(words, [list, list, np.ndarray])
+    if not type_list_of_words:
+        iter_permutations(words) # type check
+        words = [words]
+    ranks = rank_range(n_permutations, start_rank, stop_rank, shard_index, num_shards)
+    rngs, augment_seeds = _file_rngs(seed, len(words)), _augment_seeds(seed, len(words))
+    if n_jobs == 1 and executor is None:
+        audio_perms = [_render_file(_iter_word_permutations(audio, sr, n_permutations, interm_silence, random, rng, augment, augment_seed, ranks), stats, i)
+                       for i, (audio, rng, augment_seed) in enumerate(zip(words, rngs, augment_seeds))]
+    else:
+        handles = [to_shared(audio) for audio in words]
+        try:
+            track_memory = stats.track_memory if stats else None
+            results = parallel_map(_permute_task, [(h, sr, n_permutations, interm_silence, random, rng, augment, augment_seed, ranks, i, track_memory) for i, (h, rng, augment_seed) in enumerate(zip(handles, rngs, augment_seeds))], n_jobs, executor, cleanup = lambda r: free_shared(r[0]))
+        finally:
+            for h in handles:
+                free_shared(h)
+        audio_perms = []
+        for h, records in results:
+            audio_perms.append(from_shared(h))
+            if stats:
+                stats.extend(records)
 
     if return_as_array == True:
         return audio_perms
@@ -236,26 +1075,116 @@ def permutations(words, sr = 22050, n_permutations = 1, interm_silence = 1000, r
 
 
 
-def fixed_len_segments(filename, sr = 22050, silence_thresh=-60., min_silence_len = 20, segment_size = 5.0, permute = True, max_segments = 10, augment = None, save = False, save_path = "", file_save_tag = "", return_segments = True):
-    """Takes an audiofile path, loads it, removes the silence with a threshold, makes a list of segment of size = segment_size (in sec.), runs premutation, augmentation (if applied), saves the wav file or returns a numpy array (16 bit PCM)
+def write_permutations(words, save_path, sr = 22050, n_permutations = 1, interm_silence = 1000, random = False, seed = None, file_save_tag = "", augment = None, max_pending = 8, return_as_array = False, shard_size = None, start_rank = 0, stop_rank = None, shard_index = 0, num_shards = 1):
+    """Writes the permutation of words straight to wav files (pcm16), the same audio as :func:`permutations` gives.
+    Without augmentation a permutation is never concatenated, its words and the silence after each one are streamed into the file. A background thread writes while the next permutations are prepared, at most max_pending files wait in its queue.
+    The files are named ``{file_save_tag}{file index}_{rank}.wav``, so jobs writing disjoint rank ranges (``shard_index``/``num_shards``) into one directory never collide.
+    With ``shard_size``, the permutations are appended to packed shards (see :mod:`audioperm.shards`) instead, with the file index, the rank, the word order and the gap as metadata of every clip.
+
+    Args:
+        words (Union[:obj:`list` of :obj:`ndarray`, :obj:`list` of :obj:`list` of :obj:`ndarray`]): Words of one audio file or a list of words per audio file.
+        save_path (str): Output directory
+        sr (int): Sampling rate of the words
+        n_permutations (int): Number of (max) permutations to write per audio file
+        interm_silence (int): Intermediate silence between words (in ms).
+        random (bool): Draw distinct random permutations instead of the first n_permutations lexicographic ones.
+        seed (int): Seed for the random permutations.
+        file_save_tag (str): Tag added to the output file names
+        augment (:obj:`audioperm.augmentation.Augmentation`): Augmentation applied to every permutation, with a generator of its rank (the permutation is then rendered in memory).
+        max_pending (int): Maximum number of files waiting to be written
+        shard_size (int): Size (in bytes) of the shards to write, None for a wav file per permutation
+        start_rank (int): First rank to generate, the position in the sequence of permutations (the lexicographic rank if random is False).
+        stop_rank (int): Rank to stop before, None for n_permutations.
+        shard_index (int): Index of the shard of the n_permutations ranks to generate, see :func:`audioperm.utils.rank_range`.
+        num_shards (int): Number of disjoint shards the ranks are split into.
+    Returns:
+        Union[:obj:`list` of :obj:`list` of :obj:`str`, :obj:`list` of :obj:`str`]: Paths of the written files (clip indices in the shards with shard_size), per audio file
     """
-    y, sr = librosa.load(filename, sr = sr)
-    # convert from float to uint16
-    y = np.array(y * (1<<15), dtype=np.int16)
+    type_list_of_words = False
+    if type_chain(words, [list, np.ndarray]):
+        words = [words]
+    elif type_chain(words, [list, list, np.ndarray]):
+        type_list_of_words = True
+    else:
+        raise TypeError("Takes a list of np.ndarray or list of list of np.ndarray. Type mismatch!")
+
+    os.makedirs(save_path, exist_ok = True)
+    gap = int(sr * interm_silence / 1000.)
+    ranks = rank_range(n_permutations, start_rank, stop_rank, shard_index, num_shards)
+    if shard_size is not None:
+        prefix = (file_save_tag or "shard") + (f"-{ranks.start}" if ranks.start else "") # the shards of other rank ranges do not collide
+        return _write_permutation_shards(words, type_list_of_words or return_as_array, save_path, sr, n_permutations, gap, random, seed, prefix, augment, shard_size, ranks)
+    paths = []
+    with BackgroundWriter(max_pending) as writer:
+        for j, (audio, rng, augment_seed) in enumerate(zip(words, _file_rngs(seed, len(words)), _augment_seeds(seed, len(words)))):
+            if augment is None:
+                outputs = (permutation_blocks(audio, idxs, gap) for idxs in _permutation_orders(len(audio), n_permutations, random, rng, ranks))
+            else:
+                outputs = _iter_word_permutations(audio, sr, n_permutations, interm_silence, random, rng, augment, augment_seed, ranks)
+            paths.append([])
+            for i, blocks in zip(ranks, outputs):
+                paths[-1].append(os.path.join(save_path, f"{file_save_tag}{j}_{i}.wav"))
+                writer.write(paths[-1][-1], blocks, sr)
+
+    if return_as_array == True or type_list_of_words == True:
+        return paths
+    return paths[0]
+
+
+def _write_permutation_shards(words, as_list, save_path, sr, n_permutations, gap, random, seed, prefix, augment, shard_size, ranks):
+    """write_permutations into packed shards."""
+    clips = []
+    with ShardWriter(save_path, sr = sr, max_bytes = shard_size, prefix = prefix, overwrite = True) as writer: # like the wav files, a new run replaces the shards of the prefix
+        for j, (audio, rng, augment_seed) in enumerate(zip(words, _file_rngs(seed, len(words)), _augment_seeds(seed, len(words)))):
+            orders = list(_permutation_orders(len(audio), n_permutations, random, rng, ranks))
+            if augment is None:
+                outputs = (permutation_blocks(audio, idxs, gap) for idxs in orders)
+                gaps = [gap] * len(orders)
+            else:
+                augment_rngs = [_rank_rng(augment_seed, rank) for rank in ranks[:len(orders)]]
+                gaps = [_gaps(len(audio), gap, augment, r) for r in augment_rngs]
+                outputs = (augment_arrays(augment, [render_words(audio, idxs, g)], r)[0] for idxs, g, r in zip(orders, gaps, augment_rngs))
+            clips.append([writer.add(blocks, source = j, rank = rank, order = idxs, gap = g) for blocks, rank, idxs, g in zip(outputs, ranks, orders, gaps)])
+    return clips if as_list else clips[0]
+
+
+def segment_path(filename, save_path, file_save_tag, i, save_name = None):
+    """Path of the i-th segment fixed_len_segments saves for an audio file.
+
+    Args:
+        filename (str): Path of the audio file
+        save_path (str): Output directory
+        file_save_tag (str): Tag added before the segment number
+        i (int): Segment number
+        save_name (str): Name of the outputs (a path relative to save_path, without extension), the base name of the file without its extension if None
+    Returns:
+        str: Path of the wav file
+    """
+    if save_name is None:
+        save_name = os.path.splitext(os.path.basename(filename))[0]
+    return f"{os.path.join(save_path, save_name)}_{file_save_tag}{i}.wav"
+
+
+def _fixed_len_task(args):
+    """Worker task for fixed_len_segments over a list of files, the segments are returned through shared memory."""
+    filename, kwargs = args
+    eq_segs = fixed_len_segments(filename, **kwargs)
+    return None if eq_segs is None else to_shared(eq_segs)
+
+
+def _pydub_fixed_len(y, sr, ranges, orders, segment_size, max_segments):
+    """The pydub version of the fixed length segments, every order is concatenated as AudioSegments and cut by segment_aud_eq."""
+    import pydub
     audio_segment = pydub.AudioSegment(
         y.tobytes(), 
         frame_rate=sr,
         sample_width=y.dtype.itemsize, 
         channels=1
     )
-    aud_segs = pydub.silence.split_on_silence(audio_segment, silence_thresh=silence_thresh, min_silence_len = min_silence_len)
+    aud_segs = [audio_segment.get_sample_slice(start, end) for start, end in ranges]
     # calculate n_permutations
     eq_segs_all = []
-    for ind, idxs in enumerate(itertools.permutations(range(len(aud_segs)))):
-        r_idxs = list(idxs)
-        if ind != 0:
-            # random shuffle
-            random.shuffle(r_idxs)
+    for r_idxs in orders:
         all_seg = sum([aud_segs[i] for i in r_idxs])
         eq_segs = segment_aud_eq(all_seg, int(segment_size * 1000))
         n = max_segments - len(eq_segs_all)
@@ -263,14 +1192,99 @@ def fixed_len_segments(filename, sr = 22050, silence_thresh=-60., min_silence_le
         if n < len(eq_segs):
             break
     # convert to numpy
-    eq_segs_all = [np.array(s.get_array_of_samples(), dtype = np.int16) for s in eq_segs_all]
-    if save:
-        # save as wav
-        bn = os.path.basename(filename)
-        os.makedirs(save_path, exist_ok=True) 
-        for i, s in enumerate(eq_segs_all):
-            f_p = f"{os.path.join(save_path, bn.split('.')[0])}_{file_save_tag}{i}.wav"
-            save_audio(s, f_p, sr = sr)
+    return [np.array(s.get_array_of_samples(), dtype = np.int16) for s in eq_segs_all]
+
+
+def fixed_len_segments(filename, sr = 22050, silence_thresh=-60., min_silence_len = 20, segment_size = 5.0, permute = True, max_segments = 10, augment = None, save = False, save_path = "", file_save_tag = "", return_segments = True, seed = None, engine = "numpy", n_jobs = 1, executor = None, cache = None, shard_writer = None, start_rank = 0, stop_rank = None, shard_index = 0, num_shards = 1, resample = "librosa", save_name = None):
+    """Takes an audiofile path, loads it, removes the silence with a threshold, makes a list of segment of size = segment_size (in sec.), runs premutation, augmentation (if applied), saves the wav file or returns a numpy array (16 bit PCM)
+    The original order of the segments is used first, followed by distinct random permutations (reproducible with ``seed``).
+    Silence is split and the segments are cut with the ``engine`` backend, "numpy" (offset tables over a single buffer) or "pydub" (AudioSegments).
+    A list of files is processed with ``n_jobs`` worker processes (or ``executor``) and gives a list of results, in the same order.
+    The decoded audio and the silence ranges are kept in ``cache`` (an :obj:`audioperm.cache.AudioCache` or a directory), if given.
+    ``augment`` (an :obj:`audioperm.augmentation.Augmentation`, or any callable taking a (batch, samples) array and a Generator) is applied to every segment, with a generator of (seed, segment number), so shards augment a segment as one job would.
+    With ``save`` and a ``shard_writer`` (an :obj:`audioperm.shards.ShardWriter`), the segments are appended to its packed shards instead of wav files, with the source file, the segment order and the window as metadata.
+    The segment numbers are ranks: ``shard_index``/``num_shards`` (or ``start_rank``/``stop_rank``) select a disjoint range of the max_segments segments (see :func:`audioperm.utils.rank_range`), which keep their numbers in the saved file names.
+    Files at another sampling rate are resampled with ``resample``, "librosa", "soxr" or a polyphase quality ("low", "medium", "high") of :mod:`audioperm.resample`.
+    The saved segments are named ``{save_name}_{file_save_tag}{i}.wav`` in save_path (see :func:`segment_path`), ``save_name`` (a list for a list of files) defaults to the base name of the file.
+    """
+    if type(filename) == list:
+        to_shards = save and shard_writer is not None # the shards are written by this process
+        kwargs = dict(sr = sr, silence_thresh = silence_thresh, min_silence_len = min_silence_len, segment_size = segment_size, permute = permute, max_segments = max_segments, augment = augment,
+                      save = save and not to_shards, save_path = save_path, file_save_tag = file_save_tag, return_segments = return_segments or to_shards, seed = seed, engine = engine, cache = cache,
+                      start_rank = start_rank, stop_rank = stop_rank, shard_index = shard_index, num_shards = num_shards, resample = resample)
+        names = [None] * len(filename) if save_name is None else save_name
+        if type(names) != list or len(names) != len(filename):
+            raise TypeError("save_name should be a list with a name per file.")
+        if executor is None and min(n_workers(n_jobs), len(filename)) <= 1:
+            results = [fixed_len_segments(f, save_name = n, **kwargs) for f, n in zip(filename, names)] # in process, no shared memory
+        else:
+            results = parallel_map(_fixed_len_task, [(f, dict(kwargs, save_name = n)) for f, n in zip(filename, names)], n_jobs, executor, cleanup = lambda h: None if h is None else free_shared(h))
+            results = [None if h is None else from_shared(h) for h in results]
+        if to_shards:
+            ranks = rank_range(max_segments, start_rank, stop_rank, shard_index, num_shards)
+            for f, eq_segs in zip(filename, results):
+                for i, s in zip(ranks, eq_segs):
+                    shard_writer.add(s, source = f, segment = i)
+        if return_segments:
+            return results
+        return
+
+    cache = get_cache(cache)
+    if cache:
+        y, sr = cache.load_audio(filename, sr, resample)
+        key = cache.key("ranges", cache.array_key(y), sr, silence_thresh, min_silence_len, engine)
+        entry = cache.get(key)
+        if entry is None:
+            ranges = nonsilent_ranges(y, sr, silence_thresh=silence_thresh, min_silence_len=min_silence_len, engine=engine)
+            cache.put(key, ranges = ranges)
+        else:
+            ranges = entry["ranges"]
+    else:
+        y, sr = load_audio(filename, sr, resample)
+        ranges = nonsilent_ranges(y, sr, silence_thresh=silence_thresh, min_silence_len=min_silence_len, engine=engine)
+    ranks = rank_range(max_segments, start_rank, stop_rank, shard_index, num_shards)
+    # original order first, then distinct random orders
+    identity = tuple(range(len(ranges)))
+    orders = itertools.chain([identity], (o for o in sample_permutations(len(ranges), seed) if o != identity))
+    if engine == "pydub":
+        eq_segs_all = _pydub_fixed_len(y, sr, ranges, orders, segment_size, ranks.stop)[ranks.start:]
+    else:
+        # every order has the same length, so the same windows; only the ones of the ranks are cut
+        windows = eq_windows(int((ranges[:, 1] - ranges[:, 0]).sum()), sr, int(segment_size * 1000))
+        selected = [] # (order, windows) of every segment
+        if len(windows) and len(ranks):
+            # skip the orders before the first rank
+            for r_idxs in itertools.islice(orders, ranks.start // len(windows), None):
+                n = ranks.stop - ranks.start - len(selected)
+                first = ranks.start % len(windows) if not selected else 0
+                selected.extend((r_idxs, w) for w in windows[first:first + n])
+                if first + n <= len(windows):
+                    break
+        if save and not return_segments and augment is None:
+            # nothing to return, the segments are streamed from the audio into the files
+            if shard_writer is not None:
+                for i, (r_idxs, w) in zip(ranks, selected):
+                    shard_writer.add(window_blocks(y, ranges, r_idxs, w), source = filename, segment = i, order = r_idxs, window = w)
+                return
+            os.makedirs(os.path.join(save_path, os.path.dirname(save_name or "")), exist_ok=True)
+            with BackgroundWriter() as writer:
+                for i, (r_idxs, w) in zip(ranks, selected):
+                    writer.write(segment_path(filename, save_path, file_save_tag, i, save_name), window_blocks(y, ranges, r_idxs, w), sr)
+            return
+        eq_segs_all = [seg for r_idxs, w in selected for seg in slice_windows(y, ranges, r_idxs, [w])]
+    if augment is not None:
+        augment_seed = _augment_seeds(seed, 1)[0]
+        eq_segs_all = [augment_arrays(augment, [s], _rank_rng(augment_seed, i))[0] for i, s in zip(ranks, eq_segs_all)]
+    if save and shard_writer is not None:
+        for k, (i, s) in enumerate(zip(ranks, eq_segs_all)):
+            meta = dict(order = selected[k][0], window = selected[k][1]) if engine != "pydub" else {}
+            shard_writer.add(s, source = filename, segment = i, **meta)
+    elif save:
+        # save as wav, in the background
+        os.makedirs(os.path.join(save_path, os.path.dirname(save_name or "")), exist_ok=True)
+        with BackgroundWriter() as writer:
+            for i, s in zip(ranks, eq_segs_all):
+                writer.write(segment_path(filename, save_path, file_save_tag, i, save_name), s, sr)
 
     if return_segments:
         return eq_segs_all
\ No newline at end of file
@@ -1,3 +1,157 @@
 """
 all the augmentation
-"""
\ No newline at end of file
+
+Every op takes a (batch, samples) float array and a seeded numpy Generator, draws one parameter per row and transforms the whole batch in one call.
+:class:`Augmentation` chains them, converting int16 batches to float32 (and back) only once.
+"""
+import numpy as np
+
+def gain(x, rng, min_db = -6., max_db = 6.):
+    """ Scales every row by a random gain.
+    Args:
+        x (ndarray): A (batch, samples) float array
+        rng (:obj:`numpy.random.Generator`): Random generator
+        min_db (float): Minimum gain (in dB)
+        max_db (float): Maximum gain (in dB)
+    Returns:
+        ndarray: The scaled batch
+    """
+    db = rng.uniform(min_db, max_db, (len(x), 1))
+    return x * (10. ** (db / 20.)).astype(x.dtype)
+
+def add_noise(x, rng, min_snr = 10., max_snr = 30.):
+    """ Adds white gaussian noise at a random signal to noise ratio per row.
+    Args:
+        x (ndarray): A (batch, samples) float array
+        rng (:obj:`numpy.random.Generator`): Random generator
+        min_snr (float): Minimum SNR (in dB)
+        max_snr (float): Maximum SNR (in dB)
+    Returns:
+        ndarray: The noisy batch
+    """
+    snr = rng.uniform(min_snr, max_snr, (len(x), 1))
+    power = np.mean(np.square(x, dtype = np.float64), axis = 1, keepdims = True)
+    scale = np.sqrt(power / 10. ** (snr / 10.)).astype(x.dtype)
+    return x + rng.standard_normal(x.shape, dtype = np.float32).astype(x.dtype, copy = False) * scale
+
+def time_shift(x, rng, max_shift = 0.1):
+    """ Circularly shifts every row by a random number of samples.
+    Args:
+        x (ndarray): A (batch, samples) array
+        rng (:obj:`numpy.random.Generator`): Random generator
+        max_shift (float): Maximum shift, as a fraction of the length (in both directions)
+    Returns:
+        ndarray: The shifted batch
+    """
+    n = x.shape[1]
+    shift = rng.integers(-int(max_shift * n), int(max_shift * n) + 1, (len(x), 1))
+    return np.take_along_axis(x, (np.arange(n) - shift) % max(n, 1), axis = 1)
+
+def speed(x, rng, min_rate = 0.9, max_rate = 1.1):
+    """ Changes the speed (and pitch) of every row by a random rate, with linear interpolation. Rows keep their length, they are cut or padded with silence.
+    Args:
+        x (ndarray): A (batch, samples) float array
+        rng (:obj:`numpy.random.Generator`): Random generator
+        min_rate (float): Minimum rate (< 1 is slower)
+        max_rate (float): Maximum rate
+    Returns:
+        ndarray: The resampled batch
+    """
+    n = x.shape[1]
+    rate = rng.uniform(min_rate, max_rate, (len(x), 1))
+    pos = np.arange(n) * rate # source position of every output sample
+    i0 = np.minimum(pos.astype(np.intp), n - 1)
+    i1 = np.minimum(i0 + 1, n - 1)
+    frac = (pos - i0).astype(x.dtype)
+    y = np.take_along_axis(x, i0, axis = 1) * (1 - frac) + np.take_along_axis(x, i1, axis = 1) * frac
+    y[pos > n - 1] = 0
+    return y
+
+def random_gaps(n_rows, n_gaps, gap, rng, jitter = 0.5):
+    """ Draws random silence lengths between words, every row sums to n_gaps * gap so the rendered permutations keep the same length.
+    Args:
+        n_rows (int): Number of permutations
+        n_gaps (int): Number of gaps (words) per permutation
+        gap (int): Mean gap (in samples)
+        rng (:obj:`numpy.random.Generator`): Random generator
+        jitter (float): Relative spread of the gaps, 0 for fixed gaps, up to 1
+    Returns:
+        ndarray: A (n_rows, n_gaps) int64 array
+    """
+    g = rng.uniform(1. - jitter, 1. + jitter, (n_rows, n_gaps))
+    g *= n_gaps * gap / np.maximum(g.sum(axis = 1, keepdims = True), 1e-12)
+    ends = np.rint(np.cumsum(g, axis = 1)).astype(np.int64)
+    return np.diff(ends, axis = 1, prepend = 0)
+
+class Augmentation:
+    """
+    A chain of batched augmentations, applied in the order speed, time shift, gain and noise. An op is disabled if its range is None.
+    Instances are callable as ``augment(batch, rng)``, the form the ``augment`` argument of :func:`audioperm.permutations` and :func:`audioperm.fixed_len_segments` takes.
+    """
+    def __init__(self, gain_db = None, snr_db = None, shift = None, speed_rate = None, gap_jitter = 0.):
+        """ Configures the augmentations.
+        Args:
+            gain_db (tuple): (min, max) gain (in dB)
+            snr_db (tuple): (min, max) SNR (in dB) of the added noise
+            shift (float): Maximum circular time shift (fraction of the length)
+            speed_rate (tuple): (min, max) speed rate
+            gap_jitter (float): Relative spread of the silence between words in permutations (0 keeps interm_silence)
+        """
+        self.gain_db = gain_db
+        self.snr_db = snr_db
+        self.shift = shift
+        self.speed_rate = speed_rate
+        self.gap_jitter = gap_jitter
+
+    def __call__(self, x, rng = None):
+        """ Augments a batch.
+        Args:
+            x (ndarray): A (batch, samples) int16 or float32 array
+            rng (Union[int, :obj:`numpy.random.Generator`]): Seed or generator
+        Returns:
+            ndarray: The augmented batch, with the dtype of x
+        """
+        rng = np.random.default_rng(rng)
+        if type(x) != np.ndarray or x.ndim != 2:
+            raise TypeError("Expected a (batch, samples) numpy array (int16, float32).")
+        if x.dtype == np.int16:
+            y = x.astype(np.float32)
+        elif x.dtype == np.float32:
+            y = x
+        else:
+            raise TypeError("Expected a (batch, samples) numpy array (int16, float32).")
+        if self.speed_rate is not None:
+            y = speed(y, rng, *self.speed_rate)
+        if self.shift is not None:
+            y = time_shift(y, rng, self.shift)
+        if self.gain_db is not None:
+            y = gain(y, rng, *self.gain_db)
+        if self.snr_db is not None:
+            y = add_noise(y, rng, *self.snr_db)
+        if x.dtype == np.int16:
+            return np.clip(np.rint(y), -32768, 32767).astype(np.int16)
+        return y
+
+    def gaps(self, n_rows, n_gaps, gap, rng):
+        """ Silence lengths between words for n_rows permutations, None if they are not randomized. See :func:`random_gaps`. """
+        if not self.gap_jitter:
+            return None
+        return random_gaps(n_rows, n_gaps, gap, rng, self.gap_jitter)
+
+def augment_arrays(augment, arrays, rng = None):
+    """ Augments a list of 1-D arrays as one batch, shorter arrays are zero padded for the batch and cut back afterwards.
+    Args:
+        augment (callable): An :class:`Augmentation` or any callable taking (batch, rng)
+        arrays (list): a list of numpy arrays (int16, float32)
+        rng (Union[int, :obj:`numpy.random.Generator`]): Seed or generator
+    Returns:
+        list: The augmented arrays
+    """
+    if not len(arrays):
+        return []
+    lengths = [len(a) for a in arrays]
+    batch = np.zeros((len(arrays), max(lengths)), dtype = arrays[0].dtype)
+    for row, a in zip(batch, arrays):
+        row[:len(a)] = a
+    batch = augment(batch, rng)
+    return [row[:n] for row, n in zip(batch, lengths)]
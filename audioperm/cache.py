@@ -0,0 +1,200 @@
+"""
+Content-addressed on-disk cache of decoded audio and segmentation results.
+"""
+import hashlib
+import os
+import weakref
+
+import numpy as np
+
+from audioperm.utils import load_audio
+
+class AudioCache:
+    """
+    A size-bounded (LRU) cache of decoded pcm16 audio and segment tables, stored as .npz files in a directory.
+    Files are keyed by path, modification time and size, arrays by a hash of their samples, together with the parameters of the stage (sampling rate, silence threshold, ...).
+    Hit and miss counters are kept per process.
+    """
+    def __init__(self, path, max_bytes = 1<<30):
+        """ Opens (or creates) a cache directory.
+        Args:
+            path (str): Cache directory
+            max_bytes (int): Size limit of the cache, least recently used entries are evicted beyond it
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(path, exist_ok = True)
+        self._sources = {} # id(array) -> (weakref, key) of the audio this cache decoded
+        self._size = sum(os.path.getsize(f) for f in self._entries())
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_sources"] = {}
+        return state
+
+    def _entries(self):
+        return [os.path.join(self.path, f) for f in os.listdir(self.path) if f.endswith(".npz")]
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".npz")
+
+    @staticmethod
+    def key(*parts):
+        """ Hashes the parts of a key into a file name. """
+        return hashlib.blake2b(repr(parts).encode(), digest_size = 16).hexdigest()
+
+    @staticmethod
+    def file_key(filename):
+        """ Identity of a file: absolute path, modification time and size. """
+        st = os.stat(filename)
+        return os.path.abspath(filename), st.st_mtime_ns, st.st_size
+
+    def array_key(self, y):
+        """ Identity of an array: the file it was decoded from by this cache, or a hash of its samples. """
+        source = self._sources.get(id(y))
+        if source is not None and source[0]() is y:
+            return source[1]
+        y = np.ascontiguousarray(y)
+        return hashlib.blake2b(y.view(np.uint8), digest_size = 16).hexdigest(), y.dtype.str, y.shape
+
+    def get(self, key):
+        """ Reads an entry.
+        Args:
+            key (str): Key of the entry
+        Returns:
+            dict: The arrays of the entry, None on a miss
+        """
+        f = self._file(key)
+        try:
+            with np.load(f) as data:
+                arrays = {k: data[k] for k in data.files}
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(f) # most recently used
+        except OSError:
+            pass # evicted by another process since it was read, the arrays are still valid
+        self.hits += 1
+        return arrays
+
+    def put(self, key, **arrays):
+        """ Writes an entry and evicts the least recently used ones beyond max_bytes.
+        Args:
+            key (str): Key of the entry
+            **arrays: numpy arrays to store
+        """
+        f = self._file(key)
+        tmp = f"{f}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as fp:
+            np.savez(fp, **arrays)
+        old_size = os.path.getsize(f) if os.path.isfile(f) else 0
+        os.replace(tmp, f) # atomic, concurrent readers never see a partial entry
+        self._size += os.path.getsize(f) - old_size
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        for f in self._entries():
+            try:
+                st = os.stat(f)
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, f))
+        self._size = sum(e[1] for e in entries)
+        for _, size, f in sorted(entries):
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.remove(f)
+            except OSError:
+                continue
+            self._size -= size
+            self.evictions += 1
+
+    def clear(self):
+        """ Removes every entry. """
+        for f in self._entries():
+            os.remove(f)
+        self._size = 0
+
+    def stats(self):
+        """ Cache counters.
+        Returns:
+            dict: hits, misses, evictions, entries and bytes
+        """
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": len(self._entries()), "bytes": self._size}
+
+    @staticmethod
+    def _audio_key(file_key, sr, resample):
+        """ Key parts of decoded audio, the resampler is only part of it when it isn't librosa's (the keys of older entries). """
+        return ("audio", file_key, sr) if resample == "librosa" else ("audio", file_key, sr, resample)
+
+    def lookup_audio(self, filename, sr = 22050, resample = "librosa"):
+        """ Reads the decoded audio of a file.
+        Args:
+            filename (str): Filepath of the audio file.
+            sr (int): Sampling rate, None for the native one.
+            resample (str): Resampler, see utils.load_audio
+        Returns:
+            tuple: (y, sr) as utils.load_audio, None on a miss
+        """
+        file_key = self.file_key(filename)
+        entry = self.get(self.key(*self._audio_key(file_key, sr, resample)))
+        if entry is None:
+            return None
+        y = entry["y"]
+        self.track(y, self._audio_key(file_key, int(entry["sr"]), resample)[1:])
+        return y, int(entry["sr"])
+
+    def store_audio(self, filename, sr, y, y_sr, resample = "librosa"):
+        """ Writes the decoded audio of a file.
+        Args:
+            filename (str): Filepath of the audio file.
+            sr (int): Requested sampling rate (part of the key)
+            y (ndarray): The audio (int16)
+            y_sr (int): Sampling rate of the audio
+            resample (str): Resampler (part of the key), see utils.load_audio
+        """
+        file_key = self.file_key(filename)
+        self.put(self.key(*self._audio_key(file_key, sr, resample)), y = y, sr = np.int64(y_sr))
+        self.track(y, self._audio_key(file_key, y_sr, resample)[1:])
+
+    def load_audio(self, filename, sr = 22050, resample = "librosa"):
+        """ Cached utils.load_audio.
+        Args:
+            filename (str): Filepath of the audio file.
+            sr (int): Sampling rate, None for the native one.
+            resample (str): Resampler, see utils.load_audio
+        Returns:
+            (tuple): tuple containing:
+                y(ndarray): The audio (int16)
+                sr(int): Sampling rate of the audio
+        """
+        out = self.lookup_audio(filename, sr, resample)
+        if out is None:
+            out = load_audio(filename, sr, resample)
+            self.store_audio(filename, sr, *out, resample = resample)
+        return out
+
+    def track(self, y, source):
+        """ Remembers the source of an array, so it is keyed without hashing its samples. """
+        self._sources = {k: v for k, v in self._sources.items() if v[0]() is not None}
+        self._sources[id(y)] = (weakref.ref(y), source)
+
+def get_cache(cache):
+    """ Resolves the cache argument of the audioperm functions.
+    Args:
+        cache (Union[:obj:`AudioCache`, str, None]): A cache, a cache directory or None
+    Returns:
+        AudioCache: The cache, None if caching is disabled
+    """
+    if cache is None or isinstance(cache, AudioCache):
+        return cache
+    if type(cache) == str:
+        return AudioCache(cache)
+    raise TypeError("cache should be an AudioCache, a directory (str) or None.")
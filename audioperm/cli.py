@@ -0,0 +1,197 @@
+"""
+Command line interface for audioperm. Runs the fixed length segment, permute and save pipeline over a corpus.
+
+usage: audioperm INPUT -o OUTPUT_DIR [-j WORKERS] [options]
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from audioperm.audioperm import fixed_len_segments, segment_path
+from audioperm.cache import get_cache
+from audioperm.parallel import n_workers
+from audioperm.utils import load_audio, rank_range
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".mp3", ".m4a", ".aac", ".ogg", ".sph")
+
+def list_inputs(source):
+    """ Lists the audio files of a directory, a glob pattern or a manifest.
+    Args:
+        source (str): A directory, a glob pattern (``**`` is recursive), a .csv manifest (``path`` column, or the first column) or a .jsonl manifest (``path`` key)
+    Returns:
+        list: Paths of the audio files
+    """
+    if source.endswith(".jsonl"):
+        with open(source) as f:
+            return [json.loads(line)["path"] for line in f if line.strip()]
+    if source.endswith(".csv"):
+        with open(source, newline = "") as f:
+            rows = list(csv.reader(f))
+        if not rows:
+            return []
+        col = rows[0].index("path") if "path" in rows[0] else 0
+        if "path" in rows[0]:
+            rows = rows[1:]
+        return [r[col] for r in rows if r]
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, f) for f in os.listdir(source) if f.lower().endswith(AUDIO_EXTENSIONS))
+    return sorted(glob.glob(source, recursive = True))
+
+def read_manifest(manifest):
+    """ Reads the sources already processed from an output manifest.
+    Args:
+        manifest (str): Path of the output manifest (.jsonl)
+    Returns:
+        set: Paths of the processed audio files
+    """
+    done = set()
+    if os.path.isfile(manifest):
+        with open(manifest) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue # partially written line of an interrupted run
+                if "error" not in record:
+                    done.add(record["source"])
+    return done
+
+def output_names(inputs):
+    """ Names of the outputs of every input: its path relative to the common directory of the inputs, without the extension.
+    Two inputs with the same name (e.g. x.wav and x.flac) raise a ValueError.
+    Args:
+        inputs (list): Paths of the audio files
+    Returns:
+        list: Names of the outputs (relative paths), see :func:`audioperm.audioperm.segment_path`
+    """
+    if not inputs:
+        return []
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in inputs])
+    names = [os.path.splitext(os.path.relpath(os.path.abspath(f), root))[0] for f in inputs]
+    seen = {}
+    for f, name in zip(inputs, names):
+        if name in seen:
+            raise ValueError(f"{seen[name]} and {f} would write the same outputs ({name})")
+        seen[name] = f
+    return names
+
+def _duration(filename, cache = None):
+    """ Duration of an audio file (in sec.), from its header or, for the containers soundfile can't read (.mp3, .m4a, ...), from the decoded audio. 0 if unknown. """
+    import soundfile as sf
+    try:
+        return sf.info(filename).duration
+    except Exception:
+        pass
+    try:
+        cache = get_cache(cache)
+        y, sr = cache.load_audio(filename, None) if cache else load_audio(filename, None) # native rate, nothing to resample
+    except Exception:
+        return 0.
+    return len(y) / sr
+
+def _process(args):
+    """ Runs fixed_len_segments on one file, returns its manifest record. """
+    filename, name, kwargs = args
+    try:
+        segments = fixed_len_segments(filename, save = True, return_segments = True, save_name = name, **kwargs)
+    except Exception as e:
+        return {"source": filename, "error": f"{type(e).__name__}: {e}"}
+    ranks = rank_range(kwargs.get("max_segments", 10), shard_index = kwargs.get("shard_index", 0), num_shards = kwargs.get("num_shards", 1))
+    outputs = [segment_path(filename, kwargs["save_path"], kwargs["file_save_tag"], i, name) for i in ranks[:len(segments)]]
+    return {"source": filename, "outputs": outputs, "duration": _duration(filename, kwargs.get("cache"))}
+
+def run(inputs, output_dir, manifest = None, workers = 1, log = sys.stderr, **kwargs):
+    """ Runs the fixed length segment, permute and save pipeline over audio files, skipping the ones already in the manifest.
+    The outputs of every input are named from its path relative to the common directory of the inputs (see :func:`output_names`), inputs that would write the same outputs are an error.
+    Args:
+        inputs (list): Paths of the audio files
+        output_dir (str): Output directory
+        manifest (str): Output manifest (.jsonl), one record per input. Defaults to manifest.jsonl in output_dir.
+        workers (int): Number of worker processes (-1 for all cpus)
+        log (file): Where to report progress and throughput
+        **kwargs: Arguments for fixed_len_segments
+    Returns:
+        dict: Summary with the number of files processed, skipped and failed, the elapsed time and the throughput
+    """
+    manifest = manifest or os.path.join(output_dir, "manifest.jsonl")
+    os.makedirs(output_dir, exist_ok = True)
+    unique = list(dict.fromkeys(inputs))
+    names = dict(zip(unique, output_names(unique)))
+    done = read_manifest(manifest)
+    todo = [f for f in unique if f not in done]
+    kwargs = dict(kwargs, save_path = output_dir, file_save_tag = kwargs.get("file_save_tag", ""))
+
+    n_files, n_failed, audio_sec = 0, 0, 0.
+    start = time.perf_counter()
+    workers = min(n_workers(workers), max(len(todo), 1))
+    executor = ProcessPoolExecutor(max_workers = workers) if workers > 1 else None
+    try:
+        results = (executor.map if executor else map)(_process, [(f, names[f], kwargs) for f in todo])
+        with open(manifest, "a") as m:
+            for record in results:
+                m.write(json.dumps(record) + "\n")
+                m.flush() # every finished file survives an interruption
+                if "error" in record:
+                    n_failed += 1
+                    print(f"failed: {record['source']}: {record['error']}", file = log)
+                else:
+                    n_files += 1
+                    audio_sec += record["duration"]
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures = True)
+    elapsed = time.perf_counter() - start
+
+    summary = {
+        "processed": n_files,
+        "skipped": len(inputs) - len(todo),
+        "failed": n_failed,
+        "elapsed": elapsed,
+        "files_per_sec": n_files / elapsed if elapsed > 0 else 0.,
+        "audio_hours_per_sec": audio_sec / 3600. / elapsed if elapsed > 0 else 0.,
+    }
+    print(f"{n_files} files ({audio_sec / 3600.:.3f} audio-hours) in {elapsed:.2f}s: {summary['files_per_sec']:.2f} files/sec, "
+          f"{summary['audio_hours_per_sec']:.4f} audio-hours/sec, {summary['skipped']} skipped, {n_failed} failed", file = log)
+    return summary
+
+def main(argv = None):
+    """ Entry point of the ``audioperm`` command. """
+    parser = argparse.ArgumentParser(prog = "audioperm", description = "Generate fixed length (permuted) segments for a corpus of audio files.")
+    parser.add_argument("input", help = "A directory, a glob pattern or a .csv/.jsonl manifest of audio files")
+    parser.add_argument("-o", "--output-dir", required = True, help = "Output directory for the segments")
+    parser.add_argument("-m", "--manifest", default = None, help = "Output manifest (.jsonl), default: OUTPUT_DIR/manifest.jsonl (OUTPUT_DIR/manifest-SHARD_INDEX.jsonl with --num-shards)")
+    parser.add_argument("-j", "--workers", type = int, default = 1, help = "Number of worker processes (-1 for all cpus)")
+    parser.add_argument("--sr", type = int, default = 22050, help = "Sampling rate")
+    parser.add_argument("--silence-thresh", type = float, default = -60., help = "Silence threshold (in dBFS)")
+    parser.add_argument("--min-silence-len", type = int, default = 20, help = "Minimum silence length (in ms)")
+    parser.add_argument("--segment-size", type = float, default = 5.0, help = "Segment size (in sec.)")
+    parser.add_argument("--max-segments", type = int, default = 10, help = "Maximum number of segments per file")
+    parser.add_argument("--seed", type = int, default = None, help = "Seed for the random permutations")
+    parser.add_argument("--engine", choices = ["numpy", "pydub"], default = "numpy", help = "Silence splitting backend")
+    parser.add_argument("--resample", choices = ["librosa", "soxr", "low", "medium", "high"], default = "librosa", help = "Resampler of the files at another rate: librosa's, soxr on the int16 samples (fastest) or a polyphase filter quality")
+    parser.add_argument("--tag", default = "", help = "Tag added to the output file names")
+    parser.add_argument("--shard-index", type = int, default = 0, help = "Index of the shard of the segments of every file to generate (one per machine)")
+    parser.add_argument("--num-shards", type = int, default = 1, help = "Number of disjoint shards the segments of every file are split into")
+    args = parser.parse_args(argv)
+    if not 0 <= args.shard_index < args.num_shards:
+        parser.error("--shard-index should be in [0, --num-shards)")
+
+    inputs = list_inputs(args.input)
+    if not inputs:
+        parser.error(f"no audio files found for {args.input}")
+    try:
+        output_names(list(dict.fromkeys(inputs)))
+    except ValueError as e:
+        parser.error(str(e))
+    manifest = args.manifest
+    if manifest is None and args.num_shards > 1:
+        manifest = os.path.join(args.output_dir, f"manifest-{args.shard_index}.jsonl") # a manifest per shard, the others do not skip its files
+    summary = run(inputs, args.output_dir, manifest = manifest, workers = args.workers, sr = args.sr, silence_thresh = args.silence_thresh,
+                  min_silence_len = args.min_silence_len, segment_size = args.segment_size, max_segments = args.max_segments,
+                  seed = args.seed, engine = args.engine, resample = args.resample, file_save_tag = args.tag, shard_index = args.shard_index, num_shards = args.num_shards)
+    return 1 if summary["failed"] else 0
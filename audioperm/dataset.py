@@ -0,0 +1,186 @@
+"""
+An iterable dataset of fixed length permuted segments, for the (optional) torch DataLoader.
+
+Every DataLoader worker (and every distributed rank) reads, segments and permutes its own share of the files, so no file is decoded twice.
+"""
+import queue
+import threading
+
+import numpy as np
+
+from audioperm.audioperm import read_audio, word_segments, permutation_segments
+
+try:
+    import torch
+    from torch.utils.data import IterableDataset as _Base
+except ImportError:
+    torch = None
+    _Base = object
+
+def worker_shard(rank = None, world_size = None):
+    """ The shard of the files the current process reads: one per (rank, DataLoader worker) pair.
+    Args:
+        rank (int): Distributed rank, from torch.distributed if None and initialized
+        world_size (int): Number of distributed ranks
+    Returns:
+        tuple: (shard index, number of shards)
+    """
+    worker_id, num_workers = 0, 1
+    if torch is not None:
+        info = torch.utils.data.get_worker_info()
+        if info is not None:
+            worker_id, num_workers = info.id, info.num_workers
+        if rank is None and torch.distributed.is_available() and torch.distributed.is_initialized():
+            rank, world_size = torch.distributed.get_rank(), torch.distributed.get_world_size()
+    rank, world_size = rank or 0, world_size or 1
+    return rank * num_workers + worker_id, world_size * num_workers
+
+def _put(q, item, stop):
+    """ Puts an item in a bounded queue, gives up if the consumer has stopped. """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout = 0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def prefetch(items, depth):
+    """ Runs an iterator in a background thread, at most depth items ahead of the consumer.
+    Args:
+        items (iterable): The items
+        depth (int): Number of items computed ahead, 0 to run in the calling thread
+    Yields:
+        The items, in order. An error of the iterator is raised by the consumer.
+    """
+    if depth <= 0:
+        yield from items
+        return
+    q = queue.Queue(maxsize = depth)
+    stop = threading.Event()
+    def run():
+        try:
+            for x in items:
+                if not _put(q, (True, x), stop):
+                    return
+            _put(q, (False, None), stop)
+        except BaseException as e:
+            _put(q, (False, e), stop)
+    threading.Thread(target = run, daemon = True).start()
+    try:
+        while True:
+            ok, x = q.get()
+            if not ok:
+                if x is not None:
+                    raise x
+                return
+            yield x
+    finally:
+        stop.set()
+
+def shuffle_buffer(items, size, rng = None):
+    """ Shuffles a stream with a bounded buffer: every new item replaces (and yields) a random item of the buffer.
+    Args:
+        items (iterable): The items
+        size (int): Buffer size, 0 or 1 keeps the order
+        rng (Union[int, :obj:`numpy.random.Generator`]): Seed or generator
+    Yields:
+        The items, shuffled
+    """
+    if size <= 1:
+        yield from items
+        return
+    rng = np.random.default_rng(rng)
+    buf = []
+    for x in items:
+        if len(buf) < size:
+            buf.append(x)
+            continue
+        j = int(rng.integers(size))
+        yield buf[j]
+        buf[j] = x
+    for j in rng.permutation(len(buf)):
+        yield buf[j]
+
+class PermutationDataset(_Base):
+    """
+    Yields fixed length segments of the permutations of the words of audio files, as 1-D int16 or float32 tensors (numpy arrays without torch).
+    Every file goes through read_audio, word_segments and permutation rendering in the worker that owns it, the permutations are cut into windows of segment_size seconds (see :func:`audioperm.permutation_segments`).
+    The files are split across the DataLoader workers and the distributed ranks (:func:`worker_shard`), every worker prepares ``prefetch`` files ahead in a thread and shuffles its segments in a bounded buffer.
+    With a ``seed``, the segments of a file only depend on the seed, the epoch (:meth:`set_epoch`) and the index of the file, not on the number of workers. Ranks may get different numbers of segments.
+    """
+    def __init__(self, files, sr = 22050, segment_size = 1.0, n_permutations = 1, interm_silence = 1000, random = True, seed = None, augment = None,
+                 silence_thresh = -60., min_silence_len = 5, engine = "numpy", shuffle_buffer = 0, prefetch = 2, dtype = "int16", rank = None, world_size = None, cache = None, resample = "librosa"):
+        """ Configures the dataset.
+        Args:
+            files (list): Paths of the audio files
+            sr (int): Sampling rate
+            segment_size (float): Segment size (in sec.)
+            n_permutations (int): Number of (max) permutations per file
+            interm_silence (int): Intermediate silence between words (in ms).
+            random (bool): Draw distinct random permutations instead of the first n_permutations lexicographic ones.
+            seed (int): Seed for the permutations, the augmentation and the shuffling
+            augment (:obj:`audioperm.augmentation.Augmentation`): Augmentation applied to the segments of every permutation as one batch
+            silence_thresh (float): Silence threshold (in dBFS) of word_segments
+            min_silence_len (int): Minimum silence length (in ms) of word_segments
+            engine (str): "numpy" or "pydub"
+            shuffle_buffer (int): Size of the shuffle buffer (in segments), 0 to keep the order
+            prefetch (int): Number of files read and segmented ahead, 0 to read them in the iterating thread
+            dtype (str): "int16", or "float32" for samples in [-1, 1)
+            rank (int): Distributed rank, from torch.distributed if None
+            world_size (int): Number of distributed ranks
+            cache (Union[:obj:`audioperm.cache.AudioCache`, str]): Cache (or cache directory) for the decoded audio
+            resample (str): Resampler of the files at another rate, "librosa", "soxr" or a polyphase quality ("low", "medium", "high")
+        """
+        if type(files) == str:
+            files = [files]
+        if type(files) != list or not all(type(f) == str for f in files):
+            raise TypeError("files should be a list of file paths (str).")
+        if dtype not in ("int16", "float32"):
+            raise ValueError(f"dtype should be int16 or float32, got {dtype}.")
+        self.files = files
+        self.sr = sr
+        self.segment_size = segment_size
+        self.n_permutations = n_permutations
+        self.interm_silence = interm_silence
+        self.random = random
+        self.seed = seed
+        self.augment = augment
+        self.silence_thresh = silence_thresh
+        self.min_silence_len = min_silence_len
+        self.engine = engine
+        self.shuffle_buffer = shuffle_buffer
+        self.prefetch = prefetch
+        self.dtype = dtype
+        self.rank = rank
+        self.world_size = world_size
+        self.cache = cache
+        self.resample = resample
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        """ Sets the epoch, which (with a seed) changes the permutations, the augmentation and the shuffling. """
+        self.epoch = epoch
+
+    def _words(self, indices):
+        """ Yields (file index, words) of the files, read and segmented one at a time. """
+        for i in indices:
+            y = read_audio([self.files[i]], sr = self.sr, return_as_array = True, cache = self.cache, resample = self.resample)
+            yield i, word_segments(y, sr = self.sr, silence_thresh = self.silence_thresh, min_silence_len = self.min_silence_len, return_as_array = True, engine = self.engine)[0]
+
+    def _convert(self, seg):
+        if self.dtype == "float32":
+            seg = seg.astype(np.float32) / 32768.
+        return torch.from_numpy(seg) if torch is not None else seg
+
+    def __iter__(self):
+        shard, n_shards = worker_shard(self.rank, self.world_size)
+        seed = None if self.seed is None else [self.seed, self.epoch]
+        worker_rng = np.random.default_rng(None if seed is None else seed + [shard])
+        indices = list(range(shard, len(self.files), n_shards))
+        if self.shuffle_buffer > 1:
+            indices = [indices[j] for j in worker_rng.permutation(len(indices))]
+        segments = (seg for _, seg in permutation_segments(prefetch(self._words(indices), self.prefetch), len(self.files), self.sr, self.segment_size, self.n_permutations,
+                                                             self.interm_silence, self.random, seed, self.augment))
+        for seg in shuffle_buffer(segments, self.shuffle_buffer, worker_rng):
+            yield self._convert(seg)
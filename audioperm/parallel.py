@@ -0,0 +1,114 @@
+"""
+Multi-processing helpers for audioperm.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+def n_workers(n_jobs):
+    """ Resolves the number of workers.
+    Args:
+        n_jobs (int): Number of workers, negative values count back from the number of cpus (-1 means all of them)
+    Returns:
+        int: Number of workers
+    """
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max((os.cpu_count() or 1) + 1 + n_jobs, 1)
+    return max(n_jobs, 1)
+
+def _collect(futures, cleanup):
+    """ Results of futures in submission order. On the first error the pending futures are cancelled, cleanup is called on the results of the finished ones, then the error is raised. """
+    try:
+        for f in as_completed(futures):
+            f.result()
+    except BaseException:
+        for f in futures:
+            f.cancel()
+        wait(futures)
+        if cleanup is not None:
+            for f in futures:
+                if not f.cancelled() and f.exception() is None:
+                    cleanup(f.result())
+        raise
+    return [f.result() for f in futures]
+
+def parallel_map(func, items, n_jobs = 1, executor = None, cleanup = None):
+    """ Maps func over items, in a process pool if n_jobs > 1 or an executor is given. Results are returned in input order.
+    Args:
+        func (callable): A picklable (module level) function
+        items (list): Arguments for func
+        n_jobs (int): Number of worker processes (-1 for all cpus)
+        executor (:obj:`concurrent.futures.Executor`): An executor to use instead of creating a process pool
+        cleanup (callable): Called on the result of every finished task if a task raises (e.g. to free its shared memory), before the error is raised
+    Returns:
+        list: func(item) for every item
+    """
+    items = list(items)
+    # workers have to share the parent's tracker, shared memory created in a worker is freed by the parent
+    resource_tracker.ensure_running()
+    if executor is not None:
+        return _collect([executor.submit(func, item) for item in items], cleanup)
+    n_jobs = min(n_workers(n_jobs), len(items))
+    if n_jobs <= 1:
+        results = []
+        try:
+            for item in items:
+                results.append(func(item))
+        except BaseException:
+            if cleanup is not None:
+                for r in results:
+                    cleanup(r)
+            raise
+        return results
+    with ProcessPoolExecutor(max_workers = n_jobs) as ex:
+        return _collect([ex.submit(func, item) for item in items], cleanup)
+
+def to_shared(arrays):
+    """ Packs a list of 1-D arrays of the same dtype into a single shared memory block, so they are not pickled between processes.
+    Args:
+        arrays (list): a list of numpy arrays
+    Returns:
+        tuple: A handle (name, dtype, lengths) for from_shared
+    """
+    dtype = arrays[0].dtype if len(arrays) else np.dtype(np.int16)
+    lengths = [len(a) for a in arrays]
+    shm = shared_memory.SharedMemory(create = True, size = max(sum(lengths) * dtype.itemsize, 1))
+    buf = np.ndarray((sum(lengths),), dtype = dtype, buffer = shm.buf)
+    pos = 0
+    for a in arrays:
+        buf[pos:pos + len(a)] = a
+        pos += len(a)
+    del buf
+    shm.close()
+    return shm.name, dtype.str, lengths
+
+def from_shared(handle, unlink = True):
+    """ Copies the arrays of a shared memory block out of it. Inverse of to_shared.
+    Args:
+        handle (tuple): A handle from to_shared
+        unlink (bool): Free the shared memory block afterwards
+    Returns:
+        list: a list of numpy arrays
+    """
+    name, dtype, lengths = handle
+    shm = shared_memory.SharedMemory(name = name)
+    try:
+        buf = np.ndarray((sum(lengths),), dtype = np.dtype(dtype), buffer = shm.buf)
+        bounds = np.r_[0, np.cumsum(lengths, dtype = np.int64)]
+        arrays = [buf[bounds[i]:bounds[i + 1]].copy() for i in range(len(lengths))]
+        del buf
+    finally:
+        shm.close()
+        if unlink:
+            shm.unlink()
+    return arrays
+
+def free_shared(handle):
+    """ Frees a shared memory block from to_shared without reading it. """
+    shm = shared_memory.SharedMemory(name = handle[0])
+    shm.close()
+    shm.unlink()
@@ -0,0 +1,73 @@
+"""
+Permutation plans: the word orders of many permutations of one audio file, rendered only when needed.
+"""
+import numpy as np
+
+from audioperm.utils import render_words, permutation_blocks, as_spans, span_words
+
+def order_dtype(n_words):
+    """ Smallest unsigned integer type holding the word indices of n_words words. """
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if n_words <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.uint64
+
+class PermutationPlan:
+    """
+    The word orders of a set of permutations, a compact (n_permutations, n_words) integer array, with the spans of the words in their audio file (see :func:`audioperm.utils.span_words`) and the silence after each word.
+    A plan holds no audio, it is small to store and to send to worker processes. Permutations are rendered from the audio with :meth:`render`.
+    """
+    def __init__(self, orders, offsets, gap, sr = 22050):
+        """ Creates a plan.
+        Args:
+            orders (ndarray): A (n_permutations, n_words) array of word indices
+            offsets (ndarray): A (n_spans, 3) array of [start, end, word] spans of the words, or a (n_words, 2) array of [start, end) sample offsets of single span words
+            gap (int): Silence (in samples) after each word
+            sr (int): Sampling rate of the audio
+        """
+        offsets = as_spans(offsets)
+        n_words = int(offsets[-1, 2]) + 1 if len(offsets) else 0
+        self.orders = np.asarray(orders, dtype = order_dtype(n_words))
+        self.orders = self.orders.reshape(-1, n_words) if n_words else self.orders.reshape(len(self.orders), 0)
+        self.offsets = offsets
+        self.gap = int(gap)
+        self.sr = sr
+
+    def __len__(self):
+        return len(self.orders)
+
+    @property
+    def length(self):
+        """ Length (in samples) of every rendered permutation. """
+        return int((self.offsets[:, 1] - self.offsets[:, 0]).sum()) + self.gap * self.orders.shape[1]
+
+    def words(self, y):
+        """ The words of the plan, as views into the audio (copies for the words of several spans). """
+        return span_words(y, self.offsets)
+
+    def render(self, y, i, out = None):
+        """ Renders a permutation of the plan.
+        Args:
+            y (ndarray): The audio file the offsets refer to (int16)
+            i (Union[int, ndarray]): Index of the permutation in the plan, or an order (a row of ``orders``)
+            out (ndarray): Optional int16 buffer of length ``self.length`` to render into
+        Returns:
+            ndarray: The rendered permutation
+        """
+        order = self.orders[i] if np.ndim(i) == 0 else i
+        return render_words(self.words(y), order, self.gap, out)
+
+    def blocks(self, y, i):
+        """ Yields a permutation of the plan as blocks (words and silence), see :func:`audioperm.utils.permutation_blocks`. """
+        order = self.orders[i] if np.ndim(i) == 0 else i
+        return permutation_blocks(self.words(y), order, self.gap)
+
+    def save(self, filename):
+        """ Saves the plan to a .npz file. """
+        np.savez(filename, orders = self.orders, offsets = self.offsets, gap = self.gap, sr = self.sr)
+
+    @classmethod
+    def load(cls, filename):
+        """ Loads a plan saved with :meth:`save`. """
+        with np.load(filename) as data:
+            return cls(data["orders"], data["offsets"], int(data["gap"]), int(data["sr"]))
@@ -0,0 +1,131 @@
+"""
+Resampling of pcm16 audio, whole or block by block.
+
+``"soxr"`` runs the int16 samples through soxr (the resampler of librosa.load, without its float round trip), the fastest path.
+The polyphase qualities (``"low"``, ``"medium"``, ``"high"``) give the output of ``scipy.signal.resample_poly`` (zero padding at the edges) with the filter of the quality, designed once per (orig_sr, target_sr, quality), the same whole or block by block.
+"""
+import functools
+import math
+
+import numpy as np
+
+# quality -> (half length of the filter per unit of the largest rate factor, kaiser beta)
+QUALITIES = {"low": (4, 5.0), "medium": (10, 5.0), "high": (32, 9.0)}
+SOXR_QUALITY = "HQ" # librosa's default (soxr_hq)
+
+@functools.lru_cache(maxsize = 64)
+def polyphase_filter(orig_sr, target_sr, quality = "medium"):
+    """ Designs (once per rate pair and quality) the low-pass filter of a polyphase resampler.
+    Args:
+        orig_sr (int): Sampling rate of the input
+        target_sr (int): Sampling rate of the output
+        quality (str): "low", "medium" (resample_poly's default filter) or "high"
+    Returns:
+        (tuple): tuple containing:
+            up(int): Upsampling factor
+            down(int): Downsampling factor
+            h(ndarray): The (read-only, float32) filter, zero padded to center the output samples
+            n_pre_remove(int): Number of leading output samples of the filter delay
+    """
+    if quality not in QUALITIES:
+        raise ValueError(f"quality is {quality}, expected one of {list(QUALITIES)}")
+    from scipy.signal import firwin
+    g = math.gcd(int(orig_sr), int(target_sr))
+    up, down = int(target_sr) // g, int(orig_sr) // g
+    factor, beta = QUALITIES[quality]
+    max_rate = max(up, down)
+    half_len = factor * max_rate
+    h = firwin(2 * half_len + 1, 1. / max_rate, window = ("kaiser", beta)) * up
+    n_pre_pad = down - half_len % down
+    h = np.r_[np.zeros(n_pre_pad), h].astype(np.float32)
+    h.flags.writeable = False
+    return up, down, h, (half_len + n_pre_pad) // down
+
+def _to_pcm16(y):
+    """ Rounds and clips a float32 signal to int16, in place. """
+    np.rint(y, out = y)
+    np.clip(y, -32768, 32767, out = y)
+    return y.astype(np.int16)
+
+def _padded(y, n_pad, head = None):
+    """ The float32 samples of head and y, followed by n_pad zeros, in a single buffer. """
+    n_head = 0 if head is None else len(head)
+    x = np.empty(n_head + len(y) + n_pad, dtype = np.float32)
+    if n_head:
+        x[:n_head] = head
+    x[n_head:n_head + len(y)] = y
+    x[n_head + len(y):] = 0
+    return x
+
+def _filter_range(x, x_start, up, down, h, n_pre_remove, start, stop):
+    """ Output samples [start, stop) from the input samples x, which start at the input sample x_start (a multiple of down). """
+    from scipy.signal import upfirdn
+    i0 = max(((start + n_pre_remove) * down - len(h)) // up + 1, 0) // down * down # first input of the range, on the output grid
+    i1 = (stop - 1 + n_pre_remove) * down // up + 1
+    seg = x[i0 - x_start:i1 - x_start]
+    j0 = start + n_pre_remove - i0 * up // down
+    return upfirdn(h, seg, up, down)[j0:j0 + stop - start]
+
+def resample(y, orig_sr, target_sr, quality = "medium"):
+    """ Resamples a pcm16 signal.
+    Args:
+        y (ndarray): The audio (int16)
+        orig_sr (int): Sampling rate of the audio
+        target_sr (int): Target sampling rate
+        quality (str): "soxr", or a polyphase quality "low", "medium" or "high", see :data:`QUALITIES`
+    Returns:
+        ndarray: The resampled audio (int16)
+    """
+    if orig_sr == target_sr:
+        return y
+    if quality == "soxr":
+        import soxr
+        return soxr.resample(np.ascontiguousarray(y, dtype = np.int16), orig_sr, target_sr, quality = SOXR_QUALITY)
+    up, down, h, n_pre_remove = polyphase_filter(orig_sr, target_sr, quality)
+    n_out = -(-len(y) * up // down)
+    if n_out == 0:
+        return np.zeros(0, dtype = np.int16)
+    x = _padded(y, len(h) // up + 1) # zeros past the end, like resample_poly
+    return _to_pcm16(_filter_range(x, 0, up, down, h, n_pre_remove, 0, n_out))
+
+def resample_blocks(blocks, orig_sr, target_sr, quality = "medium"):
+    """ Resamples a stream of pcm16 blocks, only the input samples the next outputs depend on are kept between blocks.
+    With a polyphase quality the output is the one of :func:`resample` on the concatenated blocks, soxr's stream may differ from it by 2 (of 32768).
+    Args:
+        blocks (iterable): Consecutive blocks of the audio (int16)
+        orig_sr (int): Sampling rate of the audio
+        target_sr (int): Target sampling rate
+        quality (str): "soxr", or a polyphase quality "low", "medium" or "high", see :data:`QUALITIES`
+    Yields:
+        ndarray: The next resampled block (int16)
+    """
+    if orig_sr == target_sr:
+        yield from blocks
+        return
+    if quality == "soxr":
+        import soxr
+        stream = soxr.ResampleStream(orig_sr, target_sr, 1, dtype = "int16", quality = SOXR_QUALITY)
+        for block in blocks:
+            out = stream.resample_chunk(np.ascontiguousarray(block, dtype = np.int16))
+            if len(out):
+                yield out
+        out = stream.resample_chunk(np.zeros(0, dtype = np.int16), last = True)
+        if len(out):
+            yield out
+        return
+    up, down, h, n_pre_remove = polyphase_filter(orig_sr, target_sr, quality)
+    buf = np.zeros(0, dtype = np.float32)
+    buf_start, n_in, done = 0, 0, 0 # input index of buf[0], inputs seen, outputs yielded
+    for block in blocks:
+        buf = _padded(block, 0, buf)
+        n_in += len(block)
+        stop = (n_in * up - 1) // down - n_pre_remove + 1 # outputs whose inputs have all been seen
+        if stop > done:
+            yield _to_pcm16(_filter_range(buf, buf_start, up, down, h, n_pre_remove, done, stop))
+            done = stop
+            keep = max(((done + n_pre_remove) * down - len(h)) // up + 1, 0) // down * down # first input of the next outputs
+            buf, buf_start = buf[keep - buf_start:], keep
+    n_out = -(-n_in * up // down)
+    if n_out > done:
+        buf = _padded(buf, len(h) // up + 1)
+        yield _to_pcm16(_filter_range(buf, buf_start, up, down, h, n_pre_remove, done, n_out))
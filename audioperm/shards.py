@@ -0,0 +1,148 @@
+"""
+Packed shards of clips: the pcm16 samples of many clips appended to one raw file, with an index of offsets, lengths and metadata per clip.
+
+A shard ``{prefix}_{n:05d}`` is a ``.pcm`` file (little-endian int16, the clips back to back) and a ``.index.json`` file::
+
+    {"sr": 22050, "dtype": "<i2", "offsets": [...], "lengths": [...], "meta": [{"source": ..., "order": [...], "gap": ...}, ...]}
+"""
+import glob
+import json
+import os
+import re
+
+import numpy as np
+
+DTYPE = "<i2"
+
+def _jsonable(value):
+    """ Converts numpy scalars, arrays and tuples in clip metadata to json types. """
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+class ShardWriter:
+    """
+    Appends clips to shard files, a new shard is started once the current one holds max_bytes of samples.
+    The index of a shard is written when the shard is full or the writer is closed.
+    A prefix that already has shards in the directory is refused, unless ``overwrite`` removes them first (a shorter run would leave stale shards of the older one).
+    """
+    def __init__(self, path, sr = 22050, max_bytes = 1<<30, prefix = "shard", overwrite = False):
+        """ Opens a writer.
+        Args:
+            path (str): Output directory
+            sr (int): Sampling rate of the clips
+            max_bytes (int): Size of the samples of a shard before starting a new one
+            prefix (str): Prefix of the shard file names
+            overwrite (bool): Remove the existing shards of the prefix instead of raising a FileExistsError
+        """
+        self.path = path
+        self.sr = sr
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.n_clips = 0
+        self.shards = []
+        os.makedirs(path, exist_ok = True)
+        pattern = re.compile(re.escape(prefix) + r"_\d{5,}\.(pcm|index\.json(\.tmp)?)$")
+        existing = [f for f in os.listdir(path) if pattern.match(f)]
+        if existing and not overwrite:
+            raise FileExistsError(f"{path} already has shards with the prefix {prefix}, use another prefix or overwrite = True")
+        for f in existing:
+            os.remove(os.path.join(path, f))
+        self._file = None
+
+    def _open(self):
+        name = os.path.join(self.path, f"{self.prefix}_{len(self.shards):05d}")
+        self.shards.append(name)
+        self._file = open(name + ".pcm", "wb")
+        self._offsets, self._lengths, self._meta = [], [], []
+        self._pos = 0
+
+    def _close_shard(self):
+        self._file.close()
+        self._file = None
+        index = {"sr": self.sr, "dtype": DTYPE, "offsets": self._offsets, "lengths": self._lengths, "meta": self._meta}
+        tmp = self.shards[-1] + ".index.json.tmp"
+        with open(tmp, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp, self.shards[-1] + ".index.json")
+
+    def add(self, blocks, **meta):
+        """ Appends a clip.
+        Args:
+            blocks (Union[ndarray, iterable]): The clip (int16), or an iterable of 1-D blocks written one after the other (see :func:`audioperm.utils.permutation_blocks`)
+            **meta: Metadata of the clip (source, order, gap, ...), json serializable or numpy values
+        Returns:
+            int: Index of the clip in the shards written by this writer
+        """
+        if self._file is None:
+            self._open()
+        if type(blocks) == np.ndarray:
+            blocks = [blocks]
+        length = 0
+        for block in blocks:
+            block = np.ascontiguousarray(block, dtype = DTYPE)
+            self._file.write(block.data)
+            length += len(block)
+        self._offsets.append(self._pos)
+        self._lengths.append(length)
+        self._meta.append(_jsonable(meta))
+        self._pos += length
+        self.n_clips += 1
+        if self._pos * 2 >= self.max_bytes:
+            self._close_shard()
+        return self.n_clips - 1
+
+    def close(self):
+        """ Writes the index of the last shard. """
+        if self._file is not None:
+            self._close_shard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class ShardReader:
+    """
+    Reads the clips of one or more shards, the samples are memory-mapped and clips are returned as zero-copy (read-only) views.
+    """
+    def __init__(self, path):
+        """ Opens shards.
+        Args:
+            path (str): A directory of shards, or the path of one shard (with or without its extension)
+        """
+        if os.path.isdir(path):
+            names = sorted(f[:-len(".index.json")] for f in glob.glob(os.path.join(path, "*.index.json")))
+        else:
+            names = [path[:-len(".index.json")] if path.endswith(".index.json") else os.path.splitext(path)[0] if path.endswith(".pcm") else path]
+        self.offsets, self.lengths, self.meta, self._shard, self._data = [], [], [], [], []
+        self.sr = None
+        for k, name in enumerate(names):
+            with open(name + ".index.json") as f:
+                index = json.load(f)
+            self.sr = index["sr"]
+            size = os.path.getsize(name + ".pcm")
+            self._data.append(np.memmap(name + ".pcm", dtype = index["dtype"], mode = "r") if size else np.zeros(0, dtype = index["dtype"]))
+            self.offsets.extend(index["offsets"])
+            self.lengths.extend(index["lengths"])
+            self.meta.extend(index["meta"])
+            self._shard.extend([k] * len(index["offsets"]))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        """ The i-th clip, a view into the memory-mapped shard. """
+        if i < 0:
+            i += len(self)
+        start = self.offsets[i]
+        return self._data[self._shard[i]][start:start + self.lengths[i]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
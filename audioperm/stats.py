@@ -0,0 +1,126 @@
+"""
+Opt-in per-stage, per-file instrumentation for audioperm.
+"""
+import contextlib
+import json
+import time
+import tracemalloc
+
+FIELDS = ("wall_time", "samples", "segments", "bytes", "peak_bytes", "cache_hits", "cache_misses")
+
+class Stats:
+    """
+    Records the wall time, samples processed, segments produced, bytes of the outputs and cache hits of every stage of every file.
+    Stages are ``cache`` (lookups), ``decode``, ``noise_boundaries``, ``split_silence``, ``merge_chunks``, ``words`` and ``permutations``, files are identified by their index in the batch.
+    Hooks are called with every record as soon as it is complete.
+    """
+    def __init__(self, track_memory = False, hooks = None):
+        """ Creates an empty recorder.
+        Args:
+            track_memory (bool): Also record the peak memory allocated by every stage (``peak_bytes``) with tracemalloc, which slows everything down
+            hooks (list): Callables taking a record (dict)
+        """
+        self.track_memory = track_memory
+        self.hooks = list(hooks or [])
+        self.records = []
+
+    def add_hook(self, hook):
+        """ Registers a callable to be called with every new record. """
+        self.hooks.append(hook)
+
+    @contextlib.contextmanager
+    def stage(self, name, file = None, cache = None):
+        """ Times a stage, the block fills in ``samples``, ``segments`` and ``bytes`` of the yielded record.
+        Args:
+            name (str): Stage name
+            file (int): Index of the file in the batch
+            cache (:obj:`audioperm.cache.AudioCache`): Cache used by the stage, its hits and misses are counted
+        """
+        record = dict(stage = name, file = file, **dict.fromkeys(FIELDS, 0))
+        counters = (cache.hits, cache.misses) if cache else None
+        tracing = self.track_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if self.track_memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["wall_time"] = time.perf_counter() - start
+            if self.track_memory:
+                record["peak_bytes"] = tracemalloc.get_traced_memory()[1] - base
+            if tracing:
+                tracemalloc.stop()
+            if counters:
+                record["cache_hits"] = cache.hits - counters[0]
+                record["cache_misses"] = cache.misses - counters[1]
+            self.add(record)
+
+    def add(self, record):
+        """ Adds a complete record (e.g. one returned by a worker process). """
+        self.records.append(record)
+        for hook in self.hooks:
+            hook(record)
+
+    def extend(self, records):
+        """ Adds complete records. """
+        for record in records:
+            self.add(record)
+
+    def totals(self):
+        """ Sums the records of every stage.
+        Returns:
+            dict: stage -> totals of the numeric fields, with the number of records as ``calls``
+        """
+        totals = {}
+        for r in self.records:
+            t = totals.setdefault(r["stage"], dict(calls = 0, **dict.fromkeys(FIELDS, 0)))
+            t["calls"] += 1
+            for k in FIELDS:
+                t[k] = max(t[k], r[k]) if k == "peak_bytes" else t[k] + r[k]
+        return totals
+
+    def to_dict(self):
+        """ Exports the records and the totals per stage.
+        Returns:
+            dict: ``{"records": [...], "totals": {...}}``
+        """
+        return {"records": [dict(r) for r in self.records], "totals": self.totals()}
+
+    def to_jsonl(self, f):
+        """ Writes one json line per record.
+        Args:
+            f (Union[str, file]): A file path (appended to) or a writable text file
+        """
+        if type(f) == str:
+            with open(f, "a") as fp:
+                return self.to_jsonl(fp)
+        for r in self.records:
+            f.write(json.dumps(r) + "\n")
+
+    def clear(self):
+        """ Removes every record. """
+        self.records = []
+
+def get_stats(stats):
+    """ Resolves the stats argument of the audioperm functions.
+    Args:
+        stats (Union[:obj:`Stats`, bool, None]): A recorder, True for a new one, or None/False to disable instrumentation
+    Returns:
+        Stats: The recorder, None if disabled
+    """
+    if stats is None or stats is False:
+        return None
+    if stats is True:
+        return Stats()
+    if isinstance(stats, Stats):
+        return stats
+    raise TypeError("stats should be a Stats, a bool or None.")
+
+def stage(stats, name, file = None, cache = None):
+    """ Stats.stage, or a no-op context (yielding a throwaway record) if stats is None. """
+    if stats is None:
+        return contextlib.nullcontext({})
+    return stats.stage(name, file, cache)
@@ -1,8 +1,11 @@
 """
 Helper functions for audioperm.
 """
+import bisect
+import itertools
+import math
+
 import numpy as np
-import soundfile as sf 
 
 def type_nested(iterable, tp):
     """ Finds if array is of type tp (homogenous).
@@ -35,13 +38,81 @@ def type_chain(iterable, type_iterable):
 
     
 
-def max_min_heuristics(sig, max_perc = 0.2, min_perc = 0.2):
+class _ArrayPopulation:
+    """ Amplitudes held in an array. Ranges of the sorted population are selected with np.partition (O(n)) unless already sorted. """
+    def __init__(self, sig, is_sorted = False):
+        self.sig = sig
+        self.is_sorted = is_sorted
+
+    def __len__(self):
+        return len(self.sig)
+
+    def max(self):
+        return self.sig.max()
+
+    def min(self):
+        return self.sig.min()
+
+    def mean(self, start_ind, end_ind):
+        """ Mean of the sorted population in [start_ind, end_ind). """
+        if self.is_sorted or start_ind >= end_ind:
+            return self.sig[start_ind:end_ind].mean()
+        return np.partition(self.sig, [start_ind, end_ind - 1])[start_ind:end_ind].mean()
+
+class _HistogramPopulation:
+    """ Amplitudes held as a histogram (value, count), means of sorted ranges come from cumulative sums. """
+    def __init__(self, values, counts):
+        self.values = values
+        self.counts = counts
+        self.cum_counts = np.r_[0, np.cumsum(counts)]
+        self.cum_sums = np.r_[0, np.cumsum(values * counts)]
+
+    def __len__(self):
+        return int(self.cum_counts[-1])
+
+    def max(self):
+        return self.values[self.counts > 0].max()
+
+    def min(self):
+        return self.values[self.counts > 0].min()
+
+    def _sum(self, k):
+        """ Sum of the k smallest amplitudes. """
+        j = np.searchsorted(self.cum_counts, k, side = 'right') - 1
+        partial = k - self.cum_counts[j]
+        return self.cum_sums[j] + (partial * self.values[j] if partial else 0)
+
+    def mean(self, start_ind, end_ind):
+        """ Mean of the sorted population in [start_ind, end_ind). """
+        if start_ind >= end_ind:
+            return np.array([], dtype = np.float64).mean()
+        return (self._sum(end_ind) - self._sum(start_ind)) / (end_ind - start_ind)
+
+def _histogram_populations(sig, chunk_size = None):
+    """ Positive and negative populations of a pcm16 signal (or an iterable of pcm16 blocks) from a single O(n) bincount, accumulated over chunks of chunk_size samples. """
+    if chunk_size is None:
+        chunk_size = 1<<20 # cache friendly
+    blocks = [sig] if isinstance(sig, np.ndarray) else sig
+    counts = np.zeros(1<<16, dtype = np.int64)
+    for block in blocks:
+        if block.dtype != np.int16:
+            raise TypeError("The histogram method expects a pcm16 (int16) signal.")
+        block = block.reshape(-1).view(np.uint16) # two's complement: negative amplitudes land in the upper half
+        for i in range(0, len(block), chunk_size):
+            counts += np.bincount(block[i:i + chunk_size], minlength = 1<<16)
+    sig_p = _HistogramPopulation(np.arange(1, 1<<15, dtype = np.int64), counts[1:1<<15])
+    sig_n = _HistogramPopulation(np.arange(-(1<<15), 0, dtype = np.int64), counts[1<<15:])
+    return sig_p, sig_n
+
+def max_min_heuristics(sig, max_perc = 0.2, min_perc = 0.2, method = "auto", chunk_size = None):
     """ Calculates the avg max and avg min considering a percentage of sorted amplitudes.
     For audio signals finding a single peak or valley is not enough. So, we take the average of top perc percentage of the population.
     Args:
-        sig (ndarray): a numpy array
+        sig (Union[ndarray, iterable]): a numpy array, or an iterable of int16 blocks (histogram only) to process a long signal in bounded memory
         max_perc (float): Population percentage for taking max
         min_perc (float): Population percentage for taking max
+        method (str): "histogram" (O(n) bincount, int16 only), "partition" (O(n) selection), "sort" (full heapsort) or "auto" (histogram for int16, partition otherwise)
+        chunk_size (int): Process the signal in chunks of chunk_size samples to bound memory (histogram only)
     Returns:
         (tuple): tuple containing:
             max_p(float): population max for positive signal
@@ -54,9 +125,20 @@ def max_min_heuristics(sig, max_perc = 0.2, min_perc = 0.2):
     max_n = 0. 
     min_n = 0. 
 
-    sig = np.sort(sig.flatten(), kind = 'heapsort')
-    sig_p = sig[sig > 0.]
-    sig_n = sig[sig < 0.]
+    if method == "auto":
+        method = "histogram" if not isinstance(sig, np.ndarray) or sig.dtype == np.int16 else "partition"
+    if method == "histogram":
+        sig_p, sig_n = _histogram_populations(sig, chunk_size)
+    elif method == "partition":
+        sig = sig.flatten()
+        sig_p = _ArrayPopulation(sig[sig > 0.])
+        sig_n = _ArrayPopulation(sig[sig < 0.])
+    elif method == "sort":
+        sig = np.sort(sig.flatten(), kind = 'heapsort')
+        sig_p = _ArrayPopulation(sig[sig > 0.], is_sorted = True)
+        sig_n = _ArrayPopulation(sig[sig < 0.], is_sorted = True)
+    else:
+        raise ValueError(f"method is {method}, expected: auto, histogram, partition or sort")
     
     
     if len(sig_p) == 0:
@@ -67,10 +149,10 @@ def max_min_heuristics(sig, max_perc = 0.2, min_perc = 0.2):
     else:
         end_ind = len(sig_p)
         start_ind = int(end_ind * (1 - max_perc))
-        max_p = sig_p[start_ind:end_ind].mean()
+        max_p = sig_p.mean(start_ind, end_ind)
         start_ind = 0
         end_ind = int(len(sig_p)* min_perc)
-        min_p = sig_p[start_ind:end_ind].mean()
+        min_p = sig_p.mean(start_ind, end_ind)
 
     if len(sig_n) == 0:
         pass # should raise an error
@@ -80,31 +162,659 @@ def max_min_heuristics(sig, max_perc = 0.2, min_perc = 0.2):
     else:
         end_ind = len(sig_n)
         start_ind = int(end_ind * (1 - max_perc))
-        min_n = sig_n[start_ind:end_ind].mean()
+        min_n = sig_n.mean(start_ind, end_ind)
         start_ind = 0
         end_ind = int(len(sig_n)* min_perc)
-        max_n = sig_n[start_ind:end_ind].mean()
+        max_n = sig_n.mean(start_ind, end_ind)
 
     return max_p, min_p, max_n, min_n
 
-def noise_boundaries(sig, max_perc = 0.2, min_perc = 0.2):
+def noise_boundaries(sig, max_perc = 0.2, min_perc = 0.2, method = "auto", chunk_size = None):
     """ Calculates maximum noise boundaries for a signal. 
     Args:
-        sig (ndarray): a numpy array
+        sig (Union[ndarray, iterable]): a numpy array, or an iterable of int16 blocks
         max_perc (float): Population percentage for taking max
         min_perc (float): Population percentage for taking max
+        method (str): Selection method, see max_min_heuristics
+        chunk_size (int): Chunk size (in samples) for bounded memory, see max_min_heuristics
     Returns:
         (tuple): tuple containing:
             max_n(float): maximum boundary for noise
             min_n(float): minimum boundary for noise
     """
-    max_p, min_p, max_n, min_n = max_min_heuristics(sig, max_perc, min_perc)
+    max_p, min_p, max_n, min_n = max_min_heuristics(sig, max_perc, min_perc, method, chunk_size)
     # do some more operations
     snr_p = max_p - min_p
     snr_n = min_n - max_n 
 
     return min_p + snr_p * max_perc, min_n - snr_n * min_perc
 
+def batch_noise_boundaries(batch, max_perc = 0.2, min_perc = 0.2):
+    """ noise_boundaries of every row of a zero padded (n_clips, n_samples) pcm16 array, from one sort along axis 1 and a cumulative sum.
+    Zeros are not part of the populations, so the padding does not change the result. Rows with 10 or fewer positive or negative samples go through noise_boundaries.
+    Args:
+        batch (ndarray): A (n_clips, n_samples) int16 array
+        max_perc (float): Population percentage for taking max
+        min_perc (float): Population percentage for taking max
+    Returns:
+        (tuple): tuple containing:
+            max_n(ndarray): maximum boundary for noise of every row
+            min_n(ndarray): minimum boundary for noise of every row
+    """
+    if type(batch) != np.ndarray or batch.ndim != 2 or batch.dtype != np.int16:
+        raise TypeError("Expected a (n_clips, n_samples) int16 numpy array.")
+    n_rows, n = batch.shape
+    ordered = np.sort(batch, axis = 1)
+    cs = np.zeros(ordered.size + 1, dtype = np.int64)
+    np.cumsum(ordered.ravel(), dtype = np.int64, out = cs[1:]) # one flat cumulative sum, the rows are read relative to their first sample
+    base = np.arange(n_rows) * n
+    n_p = np.count_nonzero(batch > 0, axis = 1)
+    n_n = np.count_nonzero(batch < 0, axis = 1)
+
+    def mean(first, start, end):
+        """ Means of the sorted populations (starting at column first) in [start, end). """
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            return (cs[base + first + end] - cs[base + first + start]) / (end - start)
+
+    zero = np.zeros(n_rows, dtype = np.int64)
+    max_p = mean(n - n_p, (n_p * (1 - max_perc)).astype(np.int64), n_p)
+    min_p = mean(n - n_p, zero, (n_p * min_perc).astype(np.int64))
+    min_n = mean(zero, (n_n * (1 - max_perc)).astype(np.int64), n_n)
+    max_n = mean(zero, zero, (n_n * min_perc).astype(np.int64))
+    snr_p = max_p - min_p
+    snr_n = min_n - max_n
+    upper, lower = min_p + snr_p * max_perc, min_n - snr_n * min_perc
+    for i in np.flatnonzero((n_p <= 10) | (n_n <= 10)):
+        upper[i], lower[i] = noise_boundaries(batch[i], max_perc, min_perc)
+    return upper, lower
+
+def as_spans(offsets):
+    """ A (n_spans, 3) int64 table of [start, end, word] rows, from such a table or from (n_words, 2) offsets of a single span per word.
+    Args:
+        offsets (ndarray): The spans of the words, or their [start, end) sample offsets
+    Returns:
+        ndarray: The spans of the words
+    """
+    offsets = np.asarray(offsets, dtype = np.int64)
+    if offsets.ndim == 2 and offsets.shape[1] == 3:
+        return offsets
+    offsets = offsets.reshape(-1, 2)
+    return np.c_[offsets, np.arange(len(offsets), dtype = np.int64)]
+
+def span_words(y, spans):
+    """ The words of a table of spans, a view into the audio for a word of a single span, the concatenation of its spans for a word that skips a silence.
+    Args:
+        y (ndarray): The audio the spans refer to
+        spans (ndarray): A (n_spans, 3) array of [start, end, word] rows, the [start, end) sample offsets of the spans of every word in order (see :func:`audioperm.word_segments`), or a (n_words, 2) array of a single span per word
+    Returns:
+        list: The words
+    """
+    spans = as_spans(spans)
+    bounds = np.flatnonzero(np.diff(spans[:, 2], prepend = -1, append = -1)) # first span of every word, and the end
+    return [y[spans[i, 0]:spans[i, 1]] if j - i == 1 else np.concatenate([y[start:end] for start, end in spans[i:j, :2]]) for i, j in zip(bounds[:-1], bounds[1:])]
+
+def rendered_length(words, order, gap):
+    """ Calculates the length of a permutation of words, each followed by gap samples of silence.
+    Args:
+        words (list): a list of numpy arrays
+        order (iterable): Indices of words, in the order they are rendered
+        gap (Union[int, list]): Silence (in samples) after each word, or after every position of order
+    Returns:
+        int: Length of the rendered permutation (in samples)
+    """
+    order = list(order)
+    gaps = [gap] * len(order) if np.ndim(gap) == 0 else gap
+    return int(sum(len(words[i]) + g for i, g in zip(order, gaps)))
+
+def render_words(words, order, gap, out = None):
+    """ Renders a permutation of words into a single pcm16 buffer, each word followed by gap samples of silence.
+    Every word is written only once, by slice assignment, without any float intermediate.
+    Args:
+        words (list): a list of numpy arrays (int16)
+        order (iterable): Indices of words, in the order they are rendered
+        gap (Union[int, list]): Silence (in samples) after each word, or after every position of order
+        out (ndarray): Optional int16 buffer of length rendered_length(words, order, gap) to render into
+    Returns:
+        ndarray: The rendered permutation (``out`` if given)
+    """
+    order = list(order)
+    n = rendered_length(words, order, gap)
+    if out is None:
+        out = np.empty(n, dtype = np.int16)
+    elif type(out) != np.ndarray or out.dtype != np.int16 or out.shape != (n,):
+        raise ValueError(f"out should be an int16 numpy array of shape ({n},)")
+    gaps = [gap] * len(order) if np.ndim(gap) == 0 else gap
+    pos = 0
+    for i, g in zip(order, gaps):
+        w = words[i]
+        out[pos:pos + len(w)] = w
+        pos += len(w)
+        out[pos:pos + g] = 0
+        pos += g
+    return out
+
+_ZEROS = np.zeros(1<<16, dtype = np.int16)
+
+def silence_blocks(n, dtype = np.int16):
+    """ Yields n samples of silence as read-only views of a shared zero buffer.
+    Args:
+        n (int): Number of samples
+        dtype (numpy.dtype): Sample type
+    Yields:
+        ndarray: Blocks of zeros
+    """
+    zeros = _ZEROS if np.dtype(dtype) == np.int16 else np.zeros(len(_ZEROS), dtype = dtype)
+    while n > 0:
+        yield zeros[:min(n, len(zeros))]
+        n -= len(zeros)
+
+def permutation_blocks(words, order, gap):
+    """ Yields a permutation of words as blocks, the words themselves and the silence after each one, without concatenating them. Same samples as render_words.
+    Args:
+        words (list): a list of numpy arrays (int16)
+        order (iterable): Indices of words, in the order they are rendered
+        gap (Union[int, list]): Silence (in samples) after each word, or after every position of order
+    Yields:
+        ndarray: Blocks of samples
+    """
+    order = list(order)
+    gaps = [gap] * len(order) if np.ndim(gap) == 0 else gap
+    for i, g in zip(order, gaps):
+        if len(words[i]):
+            yield words[i]
+        yield from silence_blocks(g, words[i].dtype)
+
+def gather_indices(lengths, orders):
+    """ Builds a gather-index matrix for rendering many permutations of consecutive blocks at once.
+    Block i occupies ``[starts[i], starts[i] + lengths[i])`` of a base buffer, where the blocks are laid out back to back in index order.
+    Args:
+        lengths (ndarray): Length of every block (in samples)
+        orders (ndarray): A (n_permutations, n_blocks) array of block indices
+    Returns:
+        ndarray: A (n_permutations, sum(lengths)) index array into the base buffer
+    """
+    lengths = np.asarray(lengths, dtype = np.intp)
+    total = int(lengths.sum())
+    if len(orders) == 0:
+        return np.zeros((0, total), dtype = np.intp)
+    orders = np.asarray(orders, dtype = np.intp).reshape(len(orders), -1)
+    starts = np.cumsum(lengths) - lengths
+    p_lengths = lengths[orders]
+    p_starts = np.cumsum(p_lengths, axis = 1) - p_lengths # destination offset of every block
+    shift = np.repeat((starts[orders] - p_starts).ravel(), p_lengths.ravel())
+    return shift.reshape(len(orders), total) + np.arange(total, dtype = np.intp)
+
+def permutation_unrank(rank, n):
+    """ Finds the permutation of range(n) with a given lexicographic rank (the same order as itertools.permutations), using the factorial number system (Lehmer code).
+    Args:
+        rank (int): Lexicographic rank, 0 <= rank < n!
+        n (int): Number of items
+    Returns:
+        tuple: The permutation
+    """
+    items = list(range(n))
+    order = []
+    for i in range(n - 1, -1, -1):
+        d, rank = divmod(rank, math.factorial(i))
+        order.append(items.pop(d))
+    return tuple(order)
+
+def permutation_rank(order):
+    """ Finds the lexicographic rank of a permutation of range(n). Inverse of permutation_unrank.
+    Args:
+        order (iterable): A permutation of range(n)
+    Returns:
+        int: Lexicographic rank
+    """
+    items = list(range(len(order)))
+    rank = 0
+    for i, o in enumerate(order):
+        d = items.index(o)
+        items.pop(d)
+        rank += d * math.factorial(len(order) - 1 - i)
+    return rank
+
+def permutation_range(n, start = 0, stop = None):
+    """ Yields the permutations of range(n) with lexicographic ranks in [start, stop), in order. The first one is unranked and the next ones are stepped to, so a range deep into the permutation space starts right away.
+    Args:
+        n (int): Number of items
+        start (int): Rank of the first permutation
+        stop (int): Rank to stop before, None for n!
+    Yields:
+        tuple: The permutations, the same as itertools.permutations(range(n))[start:stop]
+    """
+    n_total = math.factorial(n)
+    stop = n_total if stop is None else min(stop, n_total)
+    if start >= stop:
+        return
+    if start == 0:
+        yield from itertools.islice(itertools.permutations(range(n)), stop)
+        return
+    order = list(permutation_unrank(start, n))
+    for _ in range(start, stop):
+        yield tuple(order)
+        # next permutation: swap the last ascent with its smallest larger successor, reverse the tail
+        i = n - 2
+        while i >= 0 and order[i] > order[i + 1]:
+            i -= 1
+        if i < 0:
+            return
+        j = n - 1
+        while order[j] < order[i]:
+            j -= 1
+        order[i], order[j] = order[j], order[i]
+        order[i + 1:] = order[:i:-1]
+
+def rank_range(n_total, start_rank = 0, stop_rank = None, shard_index = 0, num_shards = 1):
+    """ The ranks of n_total outputs one job generates: shard ``shard_index`` of ``num_shards`` contiguous, balanced and disjoint ranges, restricted to [start_rank, stop_rank).
+    Every job computes its range on its own, and a failed shard is resumed by passing its last rank + 1 as start_rank.
+    Args:
+        n_total (int): Number of outputs (e.g. n_permutations)
+        start_rank (int): First rank
+        stop_rank (int): Rank to stop before, None for no limit
+        shard_index (int): Index of the shard, 0 <= shard_index < num_shards
+        num_shards (int): Number of shards
+    Returns:
+        range: The ranks to generate
+    """
+    if num_shards < 1 or not 0 <= shard_index < num_shards:
+        raise ValueError(f"shard_index should be in [0, num_shards), got {shard_index} of {num_shards}.")
+    if start_rank < 0 or (stop_rank is not None and stop_rank < 0):
+        raise ValueError("start_rank and stop_rank should be positive.")
+    start = max(shard_index * n_total // num_shards, start_rank)
+    stop = (shard_index + 1) * n_total // num_shards
+    if stop_rank is not None:
+        stop = min(stop, stop_rank)
+    return range(start, max(start, stop))
+
+def sample_permutations(n, rng = None, start = 0):
+    """ Yields distinct random permutations of range(n), without enumerating the permutation space.
+    Small spaces are shuffled up front, ranks are drawn with rejection while n! fits in int64, and larger spaces draw permutations directly (with rejection of repeats).
+    Args:
+        n (int): Number of items
+        rng (Union[int, :obj:`numpy.random.Generator`]): Seed or generator for reproducibility
+        start (int): Position in the sequence to start at, the previous permutations are drawn but not unranked
+    Yields:
+        tuple: A permutation, each one at most once
+    """
+    rng = np.random.default_rng(rng)
+    n_total = math.factorial(n)
+    if n_total <= (1 << 20):
+        for rank in rng.permutation(n_total)[start:]:
+            yield permutation_unrank(int(rank), n)
+    elif n_total < (1 << 63):
+        seen = set()
+        while len(seen) < n_total:
+            rank = int(rng.integers(n_total))
+            if rank not in seen:
+                seen.add(rank)
+                if len(seen) > start:
+                    yield permutation_unrank(rank, n)
+    else:
+        seen = set()
+        while True:
+            order = tuple(int(i) for i in rng.permutation(n))
+            if order not in seen:
+                seen.add(order)
+                if len(seen) > start:
+                    yield order
+
+def _ms_to_samples(ms, sr):
+    """ Converts milliseconds to sample offsets, rounding like pydub's AudioSegment slicing. """
+    return (np.asarray(ms, dtype = np.int64) * (sr / 1000.0)).astype(np.int64)
+
+def _silent_windows(y, offset, sr, starts, min_silence_len, silence_thresh, n, engine = "numpy"):
+    """ Which of pydub's silence windows, starting at starts (in ms), are silent. y holds the samples from offset on, windows past n (the length of the signal) are zero padded like pydub. """
+    thresh = 10 ** (silence_thresh / 20) * (1<<15)
+    a = _ms_to_samples(starts, sr)
+    b = _ms_to_samples(starts + min_silence_len, sr)
+    if engine == "numpy":
+        # framed rms from a cumulative sum of squares
+        css = np.r_[0, np.cumsum(np.square(y, dtype = np.int64))]
+        ss = (css[np.minimum(b, n) - offset] - css[np.minimum(a, n) - offset]).astype(np.float64)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            rms = np.where((b > a) & (a < n), np.floor(np.sqrt(ss / (b - a))), 0.)
+    elif engine == "pydub":
+        import pydub
+        rms = np.array([pydub.AudioSegment(np.r_[y[min(i, n) - offset:min(j, n) - offset], np.zeros(j - min(j, n), dtype = np.int16)].astype(np.int16).tobytes(), frame_rate = sr, sample_width = 2, channels = 1).rms for i, j in zip(a, b)], dtype = np.float64)
+    else:
+        raise ValueError(f"engine is {engine}, expected: numpy or pydub")
+    return rms <= thresh
+
+def _detect_silence(y, sr, min_silence_len, silence_thresh, seek_step):
+    """ Vectorized pydub.silence.detect_silence for a pcm16 signal. Returns silent ranges (in ms). """
+    n = len(y)
+    seg_len = round(1000 * (n / sr))
+    if seg_len < min_silence_len:
+        return []
+
+    last_slice_start = seg_len - min_silence_len
+    slice_starts = np.arange(0, last_slice_start + 1, seek_step, dtype = np.int64)
+    if last_slice_start % seek_step:
+        slice_starts = np.r_[slice_starts, last_slice_start]
+    silence_starts = slice_starts[_silent_windows(y, 0, sr, slice_starts, min_silence_len, silence_thresh, n)]
+    if len(silence_starts) == 0:
+        return []
+
+    # combine the silence into ranges, a new range starts after a gap longer than min_silence_len
+    prev = silence_starts[:-1]
+    cur = silence_starts[1:]
+    breaks = np.flatnonzero((cur != prev + seek_step) & (cur > prev + min_silence_len))
+    range_starts = np.r_[silence_starts[0], cur[breaks]]
+    range_ends = np.r_[prev[breaks], silence_starts[-1]] + min_silence_len
+    return [[int(i), int(j)] for i, j in zip(range_starts, range_ends)]
+
+def _detect_nonsilent(silent_ranges, seg_len):
+    """ Inverts silent ranges (in ms) into nonsilent ones, same as pydub.silence.detect_nonsilent. """
+    if not silent_ranges:
+        return [[0, seg_len]]
+    if silent_ranges[0][0] == 0 and silent_ranges[0][1] == seg_len:
+        return []
+    prev_end_i = 0
+    nonsilent = []
+    for start_i, end_i in silent_ranges:
+        nonsilent.append([prev_end_i, start_i])
+        prev_end_i = end_i
+    if end_i != seg_len:
+        nonsilent.append([prev_end_i, seg_len])
+    if nonsilent[0] == [0, 0]:
+        nonsilent.pop(0)
+    return nonsilent
+
+def nonsilent_ranges(y, sr = 22050, silence_thresh = -16., min_silence_len = 1000, keep_silence = 100, seek_step = 1, engine = "numpy"):
+    """ Finds the chunks pydub.silence.split_on_silence would return, as sample offsets into the signal.
+    The numpy engine computes the framed rms of all the windows at once from a cumulative sum of squares, the pydub engine runs pydub's own silence detection.
+    Args:
+        y (ndarray): a numpy array (int16)
+        sr (int): Sampling rate.
+        silence_thresh (float): Silence threshold (in dBFS). Same as pydub.
+        min_silence_len (int): Minimum silence length (in ms). Same as pydub.
+        keep_silence (Union[int, bool]): Silence to keep around every chunk (in ms). Same as pydub.
+        seek_step (int): Step size for the silence windows (in ms). Same as pydub.
+        engine (str): "numpy" or "pydub"
+    Returns:
+        ndarray: A (n_chunks, 2) int64 array of [start, end) sample offsets
+    """
+    n = len(y)
+    seg_len = round(1000 * (n / sr))
+    if engine == "numpy":
+        nonsilent = _detect_nonsilent(_detect_silence(y, sr, min_silence_len, silence_thresh, seek_step), seg_len)
+    elif engine == "pydub":
+        import pydub
+        audio_segment = pydub.AudioSegment(y.astype(np.int16).tobytes(), frame_rate = sr, sample_width = 2, channels = 1)
+        nonsilent = pydub.silence.detect_nonsilent(audio_segment, min_silence_len, silence_thresh, seek_step)
+    else:
+        raise ValueError(f"engine is {engine}, expected: numpy or pydub")
+
+    if isinstance(keep_silence, bool):
+        keep_silence = seg_len if keep_silence else 0
+    output_ranges = [[start - keep_silence, end + keep_silence] for start, end in nonsilent]
+    # overlapping padding is split evenly between neighbours
+    for range_i, range_ii in zip(output_ranges, output_ranges[1:]):
+        if range_ii[0] < range_i[1]:
+            range_i[1] = (range_i[1] + range_ii[0]) // 2
+            range_ii[0] = range_i[1]
+    output_ranges = np.array(output_ranges, dtype = np.int64).reshape(-1, 2)
+    output_ranges = np.clip(output_ranges, 0, seg_len)
+    return np.minimum(_ms_to_samples(output_ranges, sr), n)
+
+def batch_nonsilent_ranges(batch, lengths = None, sr = 22050, silence_thresh = -16., min_silence_len = 1000, keep_silence = 100):
+    """ nonsilent_ranges (numpy engine, seek_step of 1 ms) of every row of a zero padded (n_clips, n_samples) pcm16 array.
+    The framed rms of all the clips comes from one cumulative sum of squares along axis 1, the silence runs are found and inverted on the flattened (clip, frame) indices.
+    Args:
+        batch (ndarray): A (n_clips, n_samples) int16 array, every row padded with zeros after its clip
+        lengths (ndarray): Length (in samples) of every clip, None if no row is padded
+        sr (int): Sampling rate.
+        silence_thresh (float): Silence threshold (in dBFS). Same as pydub.
+        min_silence_len (int): Minimum silence length (in ms). Same as pydub.
+        keep_silence (Union[int, bool]): Silence to keep around every chunk (in ms). Same as pydub.
+    Returns:
+        list: A (n_chunks, 2) int64 array of [start, end) sample offsets per clip
+    """
+    if type(batch) != np.ndarray or batch.ndim != 2 or batch.dtype != np.int16:
+        raise TypeError("Expected a (n_clips, n_samples) int16 numpy array.")
+    n_rows, n_max = batch.shape
+    n = np.full(n_rows, n_max, dtype = np.int64) if lengths is None else np.asarray(lengths, dtype = np.int64)
+    seg_len = np.rint(1000 * (n / sr)).astype(np.int64) # round half to even, like round()
+    last_start = seg_len - min_silence_len
+    thresh = 10 ** (silence_thresh / 20) * (1<<15)
+
+    # silent frames of every clip, the frames are the same for all the clips up to their last start
+    rows = cols = np.zeros(0, dtype = np.int64)
+    if n_rows and last_start.max() >= 0:
+        starts = np.arange(last_start.max() + 1, dtype = np.int64)
+        a = _ms_to_samples(starts, sr)
+        b = _ms_to_samples(starts + min_silence_len, sr)
+        css = np.zeros(batch.size + 1, dtype = np.int64)
+        np.square(batch.ravel(), dtype = np.int64, out = css[1:])
+        np.cumsum(css, out = css) # one flat cumulative sum, the padding adds nothing, like pydub's zero padded windows
+        base = (np.arange(n_rows) * n_max)[:, None]
+        ss = (css[base + np.minimum(b, n_max)] - css[base + np.minimum(a, n_max)]).astype(np.float64)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            rms = np.where((b > a) & (a < n[:, None]), np.floor(np.sqrt(ss / (b - a))), 0.)
+        rows, cols = np.nonzero((rms <= thresh) & (starts <= last_start[:, None]))
+
+    # silence runs, a new run starts with a new clip or after a gap longer than min_silence_len
+    first = np.ones(len(cols), dtype = bool)
+    first[1:] = (rows[1:] != rows[:-1]) | ((cols[1:] != cols[:-1] + 1) & (cols[1:] > cols[:-1] + min_silence_len))
+    run_rows = rows[first]
+    run_starts = cols[first]
+    run_ends = cols[np.r_[np.flatnonzero(first)[1:] - 1, len(cols) - 1].astype(np.int64)] + min_silence_len
+
+    # nonsilent ranges: before every run (from the end of the previous run of the clip) and after the last run of a clip
+    row_first = np.ones(len(run_rows), dtype = bool)
+    row_first[1:] = run_rows[1:] != run_rows[:-1]
+    row_last = np.r_[row_first[1:], True] if len(run_rows) else row_first
+    head_starts = np.where(row_first, 0, np.r_[0, run_ends[:-1]].astype(np.int64))
+    keep = ~(row_first & (run_starts == 0)) # no [0, 0] range when a clip starts with silence
+    tail = row_last & (run_ends != seg_len[run_rows])
+    silent_rows = np.zeros(n_rows, dtype = bool)
+    silent_rows[run_rows] = True
+    no_silence = np.flatnonzero(~silent_rows)
+    out_rows = np.r_[run_rows[keep], run_rows[tail], no_silence]
+    out = np.stack([np.r_[head_starts[keep], run_ends[tail], np.zeros(len(no_silence), dtype = np.int64)],
+                    np.r_[run_starts[keep], seg_len[run_rows[tail]], seg_len[no_silence]]], axis = 1).astype(np.int64).reshape(-1, 2)
+    order = np.lexsort((out[:, 0], out_rows))
+    out_rows, out = out_rows[order], out[order]
+
+    # keep_silence around every range, overlapping padding is split evenly between neighbours
+    if isinstance(keep_silence, bool):
+        keep_silence = np.where(keep_silence, seg_len, 0)[out_rows]
+    out[:, 0] -= keep_silence
+    out[:, 1] += keep_silence
+    overlap = np.flatnonzero((out_rows[1:] == out_rows[:-1]) & (out[1:, 0] < out[:-1, 1]))
+    mid = (out[overlap, 1] + out[overlap + 1, 0]) // 2
+    out[overlap, 1] = mid
+    out[overlap + 1, 0] = mid
+    out = np.clip(out, 0, seg_len[out_rows][:, None])
+    out = np.minimum(_ms_to_samples(out, sr), n[out_rows][:, None])
+    return np.split(out, np.cumsum(np.bincount(out_rows, minlength = n_rows))[:-1])
+
+def stream_nonsilent_ranges(blocks, sr = 22050, silence_thresh = -16., min_silence_len = 1000, keep_silence = 100, engine = "numpy"):
+    """ nonsilent_ranges (seek_step of 1 ms) of a stream of blocks, yielding every chunk with its samples as soon as it can't change anymore.
+    The silence windows are scanned once, on the millisecond grid of the whole stream, the open silence run and the chunk being read are carried across blocks.
+    Only the samples of the next windows and of the chunk being read are held, so memory depends on the block size and the longest chunk, not on the length of the stream.
+    Args:
+        blocks (iterable): Consecutive blocks of the signal (int16)
+        sr (int): Sampling rate.
+        silence_thresh (float): Silence threshold (in dBFS). Same as pydub.
+        min_silence_len (int): Minimum silence length (in ms). Same as pydub.
+        keep_silence (int): Silence to keep around every chunk (in ms). Same as pydub.
+        engine (str): "numpy" or "pydub", the rms of the silence windows
+    Yields:
+        tuple: (start, end, samples) of every chunk, the [start, end) sample offsets and a copy of the samples
+    """
+    held, held_starts = [], [] # blocks still needed, and their offsets
+    n = 0 # samples seen
+    next_s = 0 # next silence window (in ms)
+    run = None # open silence run: [first window, last window, chunk before it yielded]
+    lo = -keep_silence # start (in ms) of the chunk being read, before clipping
+    n_runs = 0 # closed silence runs
+    last_end = None # end (in ms) of the last closed silence run
+
+    def take(start, stop):
+        i = max(bisect.bisect_right(held_starts, start) - 1, 0)
+        parts = [b[max(start - s, 0):stop - s] for s, b in zip(held_starts[i:], held[i:]) if s < stop]
+        return np.concatenate(parts or [np.zeros(0, dtype = np.int16)])
+
+    def chunk(start, stop, n_total):
+        a, b = (int(x) for x in np.minimum(_ms_to_samples([max(start, 0), stop], sr), n_total))
+        return a, b, take(a, b)
+
+    def windows(last, n_total):
+        """ Scans the windows up to last and closes the silence runs that can't grow anymore. """
+        nonlocal next_s, run
+        if last >= next_s:
+            starts = np.arange(next_s, last + 1, dtype = np.int64)
+            a0 = int(_ms_to_samples(next_s, sr))
+            silent = starts[_silent_windows(take(a0, min(int(_ms_to_samples(last + min_silence_len, sr)), n_total)), a0, sr, starts, min_silence_len, silence_thresh, n_total, engine)]
+            next_s = last + 1
+            if len(silent):
+                # combine the silence into runs like _detect_silence, continuing the open run
+                seq = silent if run is None else np.r_[run[1], silent]
+                prev, cur = seq[:-1], seq[1:]
+                breaks = np.flatnonzero((cur != prev + 1) & (cur > prev + min_silence_len))
+                firsts = np.r_[seq[0] if run is None else run[0], cur[breaks]]
+                lasts = np.r_[prev[breaks], seq[-1]]
+                for k, (i, j) in enumerate(zip(firsts, lasts)):
+                    if k or run is None:
+                        run = [int(i), int(j), False]
+                    else:
+                        run[1] = int(j)
+                    if k < len(firsts) - 1:
+                        yield from close()
+        if run is not None and not run[2] and run[1] + min_silence_len - keep_silence >= run[0] + keep_silence:
+            # the chunk before a long silence doesn't share its padding with the next one
+            if run[0]:
+                yield chunk(lo, run[0] + keep_silence, n_total)
+            run[2] = True
+        if run is not None and next_s > run[1] + min_silence_len: # a silent window from now on starts a new run
+            yield from close()
+
+    def close(seg_len = None):
+        nonlocal run, lo, n_runs, last_end
+        first, end = run[0], run[1] + min_silence_len
+        hi, next_lo = first + keep_silence, end - keep_silence
+        if not run[2] and first: # a run at the start has no chunk before it
+            if next_lo < hi and end != seg_len: # overlapping padding is split evenly between neighbours, a run at the end has no chunk after it
+                hi = next_lo = (hi + next_lo) // 2
+            yield chunk(lo, hi if seg_len is None else min(hi, seg_len), n)
+        lo, last_end, run = next_lo, end, None
+        n_runs += 1
+
+    for block in blocks:
+        if len(block) == 0:
+            continue
+        held.append(block)
+        held_starts.append(n)
+        n += len(block)
+        yield from windows(n * 1000 // sr - min_silence_len, n) # windows inside the samples seen, and inside any longer signal
+        # drop the blocks before the next windows and the chunk being read (or the padding of the one after the open run)
+        keep = min(next_s, lo if run is None or not run[2] else run[1] + min_silence_len - keep_silence)
+        keep = int(_ms_to_samples(max(keep, 0), sr))
+        k = bisect.bisect_right(held_starts, keep) - 1
+        if k > 0:
+            del held[:k], held_starts[:k]
+
+    seg_len = round(1000 * (n / sr))
+    if seg_len >= min_silence_len:
+        yield from windows(seg_len - min_silence_len, n) # the last windows are zero padded past the end
+    if run is not None:
+        yield from close(seg_len)
+    if n_runs == 0 or last_end != seg_len:
+        yield chunk(lo, seg_len, n)
+
+def _sf_info(filename):
+    """ soundfile's header info of a file, None if soundfile can't read it. """
+    import soundfile as sf
+    try:
+        return sf.info(filename)
+    except Exception:
+        return None
+
+def native_sr(filename):
+    """ Native sampling rate of an audio file, from its header.
+    Args:
+        filename (str): Filepath of the audio file.
+    Returns:
+        int: Sampling rate, None if soundfile can't read the file
+    """
+    info = _sf_info(filename)
+    return None if info is None else info.samplerate
+
+def _pcm16_mono(block, is_pcm):
+    """ Converts a (samples, channels) block read by soundfile to mono pcm16, same as librosa for float encodings. """
+    if is_pcm:
+        return block[:,0] if block.shape[1] == 1 else block.mean(axis = 1).astype(np.int16)
+    return np.array(block.mean(axis = 1) * (1<<15), dtype=np.int16)
+
+def load_audio(filename, sr = 22050, resample = "librosa"):
+    """ Decodes an audio file to mono pcm16.
+    Files soundfile can read that are already at the sampling rate skip librosa: PCM is read directly as int16, other encodings (float wav, ...) through float32 exactly like librosa.
+    librosa (and audioread) is only used for resampling and for containers soundfile can't read.
+    Args:
+        filename (str): Filepath of the audio file.
+        sr (int): Sampling rate, None for the native one.
+        resample (str): Resampler, "librosa" (librosa.load's), or "soxr" (fastest) or a polyphase quality ("low", "medium", "high") of :mod:`audioperm.resample` applied to the pcm16 audio at its native rate
+    Returns:
+        (tuple): tuple containing:
+            y(ndarray): The audio (int16)
+            sr(int): Sampling rate of the audio
+    """
+    info = _sf_info(filename)
+    if info is not None and (sr is None or info.samplerate == sr):
+        import soundfile as sf
+        is_pcm = info.subtype.startswith("PCM")
+        y = sf.read(filename, dtype = 'int16' if is_pcm else 'float32', always_2d = True)[0]
+        return _pcm16_mono(y, is_pcm), info.samplerate
+
+    if resample != "librosa":
+        from audioperm.resample import resample as poly_resample
+        y, y_sr = load_audio(filename, None)
+        return poly_resample(y, y_sr, sr, resample), sr
+
+    import librosa
+    y, sr = librosa.load(filename, sr = sr)
+    return np.array(y * (1<<15), dtype=np.int16), sr
+
+def _sf_blocks(filename, info, block_size):
+    """ Streams a file soundfile can read as mono pcm16 blocks at its native rate. """
+    import soundfile as sf
+    is_pcm = info.subtype.startswith("PCM")
+    with sf.SoundFile(filename) as f:
+        for block in f.blocks(blocksize = block_size, dtype = 'int16' if is_pcm else 'float32', always_2d = True):
+            yield _pcm16_mono(block, is_pcm)
+
+def iter_blocks(audio, sr = 22050, block_size = 1<<20, resample = "librosa"):
+    """ Yields an audio as consecutive mono pcm16 blocks, without holding all of it in memory.
+    Audio files soundfile can read at the sampling rate are streamed with SoundFile.blocks, .npy files are memory-mapped, other files are decoded with load_audio first.
+    With a polyphase resampler, files soundfile can read at another rate are streamed too, through :func:`audioperm.resample.resample_blocks`.
+    Args:
+        audio (Union[str, ndarray]): Filepath of an audio (or .npy) file, or a numpy array (a np.memmap is read block by block)
+        sr (int): Sampling rate, None for the native one.
+        block_size (int): Block size (in samples)
+        resample (str): Resampler of files at another rate, see load_audio
+    Yields:
+        ndarray: The next block (int16)
+    """
+    if type(audio) == str and audio.endswith(".npy"):
+        audio = np.load(audio, mmap_mode = 'r')
+    if type(audio) == str:
+        info = _sf_info(audio)
+        if info is not None and (sr is None or info.samplerate == sr):
+            yield from _sf_blocks(audio, info, block_size)
+            return
+        if info is not None and resample != "librosa":
+            from audioperm.resample import resample_blocks
+            yield from resample_blocks(_sf_blocks(audio, info, block_size), info.samplerate, sr, resample)
+            return
+        audio = load_audio(audio, sr, resample)[0]
+    if len(audio.shape) > 1:
+        audio = audio[:,0] # single channel
+    for i in range(0, len(audio), block_size):
+        block = np.asarray(audio[i:i + block_size])
+        yield block if block.dtype == np.int16 else np.array(block * (1<<15), dtype=np.int16)
+
 def save_audio(sig, filename, sr = 22050):
     """Takes a PCM 16 or float32 signal and saves the audio in pcm16 format.
     Args:
@@ -112,6 +822,7 @@ def save_audio(sig, filename, sr = 22050):
         filename (str): Filepath and filename.
         sr (int): Sampling rate.
     """
+    import soundfile as sf
     try:
         if type(sig) != np.ndarray:
             raise TypeError("Expected a numpy array (int16, float32).")
@@ -130,5 +841,58 @@ def segment_aud_eq(audio_segment, k):
     a_segs = [audio_segment[i*k:min((i+1)*k, len(audio_segment)-1)] for i in range(len(audio_segment)//k)]
     return a_segs
 
+def eq_windows(n_samples, sr, k):
+    """ Sample offsets of the windows segment_aud_eq cuts from an audio of n_samples, with pydub's millisecond rounding.
+    Args:
+        n_samples (int): Length of the audio (in samples)
+        sr (int): Sampling rate
+        k (int): Window size (in ms)
+    Returns:
+        ndarray: An (n, 2) array of [start, end) sample offsets
+    """
+    n_ms = round(1000 * (n_samples / sr))
+    i = np.arange(n_ms // k, dtype = np.int64)
+    ms = np.stack([i * k, np.minimum((i + 1) * k, n_ms - 1)], axis = 1)
+    return _ms_to_samples(ms, sr).reshape(-1, 2)
+
+def slice_windows(y, ranges, order, windows):
+    """ Cuts windows out of the concatenation of the ranges of y in a given order, without building the concatenation.
+    Args:
+        y (ndarray): The audio
+        ranges (ndarray): An (n, 2) array of [start, end) sample offsets into y
+        order (iterable): Indices of ranges, in the order they are concatenated
+        windows (ndarray): An (m, 2) array of [start, end) sample offsets into the concatenation
+    Returns:
+        list: a list of numpy arrays, one per window
+    """
+    out = []
+    for w_start, w_end in windows:
+        buf = np.empty(w_end - w_start, dtype = y.dtype)
+        pos = 0
+        for block in window_blocks(y, ranges, order, (w_start, w_end)):
+            buf[pos:pos + len(block)] = block
+            pos += len(block)
+        out.append(buf)
+    return out
+
+def window_blocks(y, ranges, order, window):
+    """ Yields a window of the concatenation of the ranges of y in a given order as views into y, only the ranges overlapping the window are visited.
+    Args:
+        y (ndarray): The audio
+        ranges (ndarray): An (n, 2) array of [start, end) sample offsets into y
+        order (iterable): Indices of ranges, in the order they are concatenated
+        window (tuple): [start, end) sample offsets into the concatenation
+    Yields:
+        ndarray: Blocks of samples
+    """
+    ranges = np.asarray(ranges, dtype = np.int64).reshape(-1, 2)[list(order)]
+    ends = np.cumsum(ranges[:, 1] - ranges[:, 0])
+    starts = ends - (ranges[:, 1] - ranges[:, 0])
+    w_start, w_end = window
+    for i in range(np.searchsorted(ends, w_start, side = "right"), min(np.searchsorted(ends, w_end, side = "left") + 1, len(ranges))):
+        lo, hi = max(w_start, starts[i]), min(w_end, ends[i])
+        if lo < hi:
+            yield y[ranges[i, 0] + lo - starts[i]:ranges[i, 0] + hi - starts[i]]
+
 
 
@@ -0,0 +1,72 @@
+"""
+Background writing of audio files, rendering and disk writes overlap through a bounded queue.
+"""
+import queue
+import threading
+
+import numpy as np
+
+class BackgroundWriter:
+    """
+    Writes pcm16 wav files in a background thread. Every file is given as an iterable of blocks (e.g. the words of a permutation and the silence after each one) and streamed into an open SoundFile, so the file is never concatenated in memory.
+    At most max_pending files wait in the queue, ``write`` blocks beyond that, which bounds the memory held by pending outputs.
+    The first error of the writer thread is raised by the next ``write`` or by ``close``.
+    """
+    def __init__(self, max_pending = 8, subtype = "PCM_16"):
+        """ Starts the writer thread.
+        Args:
+            max_pending (int): Maximum number of files waiting to be written
+            subtype (str): soundfile subtype of the outputs
+        """
+        self.subtype = subtype
+        self.n_written = 0
+        self._queue = queue.Queue(maxsize = max(max_pending, 1))
+        self._error = None
+        self._thread = threading.Thread(target = self._run, daemon = True)
+        self._thread.start()
+
+    def _run(self):
+        import soundfile as sf
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if self._error is None:
+                filename, blocks, sr = job
+                try:
+                    with sf.SoundFile(filename, "w", samplerate = sr, channels = 1, subtype = self.subtype) as f:
+                        for block in blocks:
+                            f.write(block)
+                    self.n_written += 1
+                except Exception as e:
+                    self._error = e
+
+    def _raise(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def write(self, filename, blocks, sr = 22050):
+        """ Queues a file.
+        Args:
+            filename (str): Output path
+            blocks (Union[ndarray, iterable]): The audio, or an iterable of 1-D blocks consumed by the writer thread (the arrays must not change until written)
+            sr (int): Sampling rate
+        """
+        self._raise()
+        if type(blocks) == np.ndarray:
+            blocks = [blocks]
+        self._queue.put((filename, blocks, sr))
+
+    def close(self):
+        """ Writes the queued files and stops the writer thread. """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
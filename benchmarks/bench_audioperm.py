@@ -0,0 +1,202 @@
+"""
+Benchmarks for the audioperm pipeline stages on synthetic speech-like audio.
+
+Every (case, stage) pair runs in a fresh python process, so the peak RSS of a stage is not hidden by the ones before it.
+Throughput is reported as real-time factor (processing time / audio duration, lower is better).
+
+usage: python benchmarks/bench_audioperm.py [--durations 1 60 3600] [--files 4] [--json out.json] [--compare baseline.json]
+       python benchmarks/bench_audioperm.py --file-sr 44100 --resample librosa soxr low medium high --stages read_audio fixed_len_segments
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # benchmark the checkout, not an installed release
+
+STAGES = ["read_audio", "noise_boundaries", "word_segments", "batch_word_segments", "permutations", "fixed_len_segments", "save_audio"]
+DECODE_STAGES = ["read_audio", "fixed_len_segments"] # the stages timed once per resampler
+RESAMPLERS = ["librosa", "soxr", "low", "medium", "high"]
+
+def synthetic_speech(duration, sr = 22050, words_per_sec = 2.5, seed = 0):
+    """ Generates a speech-like pcm16 signal: voiced, amplitude modulated words separated by pauses with a low noise floor.
+    Args:
+        duration (float): Length of the signal (in sec.)
+        sr (int): Sampling rate
+        words_per_sec (float): Speaking rate
+        seed (int): Seed of the random generator
+    Returns:
+        ndarray: The signal (int16)
+    """
+    rng = np.random.default_rng(seed)
+    n = int(duration * sr)
+    y = (rng.standard_normal(n) * 3).astype(np.float32) # noise floor, about -80 dBFS
+    n_words = max(int(round(duration * words_per_sec)), 1)
+    slot = n // n_words
+    for i in range(n_words):
+        length = int(slot * rng.uniform(0.4, 0.8))
+        start = i * slot + int(rng.integers(0, slot - length + 1))
+        t = np.arange(length, dtype = np.float32) / sr
+        f0 = rng.uniform(100, 250)
+        voiced = sum(np.sin(2 * np.pi * f0 * h * t) / h for h in range(1, 9))
+        envelope = np.hanning(length).astype(np.float32) * (0.6 + 0.4 * np.sin(2 * np.pi * rng.uniform(3, 6) * t)) # syllables
+        word = voiced * envelope + rng.standard_normal(length).astype(np.float32) * 0.05
+        y[start:start + length] += word / np.abs(word).max() * rng.uniform(4000, 12000)
+    return np.clip(y, -32768, 32767).astype(np.int16)
+
+def make_corpus(path, duration, n_files, sr = 22050, words_per_sec = 2.5):
+    """ Writes n_files synthetic wav files (pcm16) to path.
+    Returns:
+        list: Paths of the files
+    """
+    filenames = []
+    for i in range(n_files):
+        f = os.path.join(path, f"synthetic_{duration:g}s_{i}.wav")
+        sf.write(f, synthetic_speech(duration, sr, words_per_sec, seed = i), sr, "PCM_16")
+        filenames.append(f)
+    return filenames
+
+def peak_rss_mb():
+    """ Peak resident set size of this process (in MB), None where it is not available. """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1<<20) if sys.platform == "darwin" else peak / 1024 # bytes on macOS, KB on linux
+
+def run_stage(stage, filenames, sr, n_permutations, segment_size, out_dir, resample = "librosa"):
+    """ Times a single stage, its inputs are prepared (untimed) by the stages before it.
+    Returns:
+        float: Elapsed time (in sec.)
+    """
+    from audioperm import read_audio, word_segments, batch_word_segments, permutations, fixed_len_segments
+    from audioperm.utils import noise_boundaries, save_audio
+
+    audio = None if stage in DECODE_STAGES else read_audio(filenames, sr = sr, resample = resample)
+    words = word_segments(audio, sr = sr) if stage == "permutations" else None
+
+    start = time.perf_counter()
+    if stage == "read_audio":
+        read_audio(filenames, sr = sr, resample = resample)
+    elif stage == "noise_boundaries":
+        for y in audio:
+            noise_boundaries(y)
+    elif stage == "word_segments":
+        word_segments(audio, sr = sr)
+    elif stage == "batch_word_segments":
+        batch_word_segments(audio, sr = sr)
+    elif stage == "permutations":
+        permutations(words, sr = sr, n_permutations = n_permutations)
+    elif stage == "fixed_len_segments":
+        for f in filenames:
+            fixed_len_segments(f, sr = sr, segment_size = segment_size, seed = 0, resample = resample)
+    elif stage == "save_audio":
+        for i, y in enumerate(audio):
+            save_audio(y, os.path.join(out_dir, f"{i}.wav"), sr = sr)
+    else:
+        raise ValueError(f"unknown stage {stage}, expected one of {STAGES}")
+    return time.perf_counter() - start
+
+def _child(args):
+    """ Runs one (case, stage) pair and prints its result as json. """
+    with tempfile.TemporaryDirectory() as out_dir:
+        elapsed = min(run_stage(args.stage, args.child_files, args.sr, args.n_permutations, args.segment_size, out_dir, args.resample[0]) for _ in range(args.repeat))
+    print(json.dumps({"elapsed": elapsed, "peak_rss_mb": peak_rss_mb()}))
+
+def benchmark(durations, n_files = 4, words_per_sec = 2.5, sr = 22050, stages = STAGES, n_permutations = 2, segment_size = 5.0, repeat = 3, log = sys.stderr, file_sr = None, resamplers = ("librosa",)):
+    """ Runs the benchmark cases.
+    Args:
+        durations (list): Length of the synthetic files (in sec.), one case per duration
+        n_files (int): Number of files per case
+        words_per_sec (float): Speaking rate of the synthetic files
+        sr (int): Sampling rate
+        stages (list): Stages to time
+        n_permutations (int): Number of permutations per file for the permutations stage
+        segment_size (float): Segment size (in sec.) for the fixed_len_segments stage
+        repeat (int): Best of repeat runs is reported
+        log (file): Where to print the results table
+        file_sr (int): Sampling rate of the synthetic files, sr if None (another rate times the resampling of the decoding stages)
+        resamplers (list): Resamplers the decoding stages (read_audio, fixed_len_segments) are timed with, "librosa" or polyphase qualities
+    Returns:
+        list: One record per (case, stage, resampler) with the elapsed time, real-time factor and peak RSS
+    """
+    results = []
+    print(f"{'stage':<30}{'duration':>10}{'files':>7}{'time (s)':>12}{'RTF':>12}{'peak RSS (MB)':>16}", file = log)
+    for duration in durations:
+        with tempfile.TemporaryDirectory() as path:
+            filenames = make_corpus(path, duration, n_files, file_sr or sr, words_per_sec)
+            for stage in stages:
+                for resample in (resamplers if stage in DECODE_STAGES else resamplers[:1]):
+                    cmd = [sys.executable, os.path.abspath(__file__), "--stage", stage, "--sr", str(sr), "--n-permutations", str(n_permutations),
+                           "--segment-size", str(segment_size), "--repeat", str(repeat), "--resample", resample, "--child-files", *filenames]
+                    out = subprocess.run(cmd, check = True, capture_output = True, text = True).stdout
+                    record = json.loads(out.strip().splitlines()[-1])
+                    record.update(stage = stage, duration = duration, files = n_files, rtf = record["elapsed"] / (duration * n_files), resample = resample)
+                    results.append(record)
+                    rss = "-" if record["peak_rss_mb"] is None else f"{record['peak_rss_mb']:.1f}"
+                    name = stage if len(resamplers) == 1 or stage not in DECODE_STAGES else f"{stage}[{resample}]"
+                    print(f"{name:<30}{duration:>10g}{n_files:>7}{record['elapsed']:>12.4f}{record['rtf']:>12.2e}{rss:>16}", file = log)
+    return results
+
+def compare(results, baseline, tolerance = 0.2):
+    """ Finds the (case, stage) pairs that got slower than a baseline.
+    Args:
+        results (list): Records from benchmark
+        baseline (list): Records from an earlier run
+        tolerance (float): Allowed relative slow down of the real-time factor
+    Returns:
+        list: (stage, duration, baseline rtf, rtf) of the regressions
+    """
+    base = {(r["stage"], r["duration"], r["files"], r.get("resample", "librosa")): r["rtf"] for r in baseline}
+    regressions = []
+    for r in results:
+        b = base.get((r["stage"], r["duration"], r["files"], r.get("resample", "librosa")))
+        if b is not None and r["rtf"] > b * (1 + tolerance):
+            regressions.append((r["stage"], r["duration"], b, r["rtf"]))
+    return regressions
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Benchmark the audioperm pipeline stages on synthetic speech-like audio.")
+    parser.add_argument("--durations", type = float, nargs = "+", default = [1, 60, 600], help = "Length of the synthetic files (in sec.), one case per value")
+    parser.add_argument("--files", type = int, default = 4, help = "Number of files per case")
+    parser.add_argument("--words-per-sec", type = float, default = 2.5, help = "Speaking rate of the synthetic files")
+    parser.add_argument("--sr", type = int, default = 22050, help = "Sampling rate")
+    parser.add_argument("--file-sr", type = int, default = None, help = "Sampling rate of the synthetic files, default: --sr (no resampling)")
+    parser.add_argument("--resample", nargs = "+", choices = RESAMPLERS, default = ["librosa"], help = "Resamplers the decoding stages are timed with")
+    parser.add_argument("--stages", nargs = "+", choices = STAGES, default = STAGES, help = "Stages to time")
+    parser.add_argument("--n-permutations", type = int, default = 2, help = "Permutations per file for the permutations stage")
+    parser.add_argument("--segment-size", type = float, default = 5.0, help = "Segment size (in sec.) for the fixed_len_segments stage")
+    parser.add_argument("--repeat", type = int, default = 3, help = "Best of REPEAT runs is reported")
+    parser.add_argument("--json", default = None, help = "Write the results to a json file")
+    parser.add_argument("--compare", default = None, help = "A json file of an earlier run, exits with 1 if a stage got slower")
+    parser.add_argument("--tolerance", type = float, default = 0.2, help = "Allowed relative slow down for --compare")
+    parser.add_argument("--stage", help = argparse.SUPPRESS)
+    parser.add_argument("--child-files", nargs = "+", help = argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.stage:
+        _child(args)
+        return 0
+
+    results = benchmark(args.durations, args.files, args.words_per_sec, args.sr, args.stages, args.n_permutations, args.segment_size, args.repeat,
+                        file_sr = args.file_sr, resamplers = args.resample)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent = 2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for stage, duration, b, rtf in regressions:
+            print(f"regression: {stage} ({duration:g}s): RTF {b:.2e} -> {rtf:.2e}", file = sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
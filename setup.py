@@ -25,5 +25,7 @@ setup(
     ],
     packages=find_packages(exclude=("tests",)),
     include_package_data=True,
-    install_requires=["feedparser", "html2text", "numpy", "librosa>=0.8.1", "pydub", "PySoundFile"],
+    install_requires=["feedparser", "html2text", "numpy", "librosa>=0.8.1", "pydub", "PySoundFile", "scipy", "soxr"],
+    extras_require={"torch": ["torch"]},
+    entry_points={"console_scripts": ["audioperm=audioperm.cli:main"]},
 )
@@ -187,4 +187,733 @@ def test_fixed_len_segments():
     
     out = fixed_len_segments("tests/bangla_demo.wav", return_segments = True, save = False, segment_size = 0.5)
     assert len(out) == 10
-    assert(type(out[0])) == np.ndarray
\ No newline at end of file
+    assert(type(out[0])) == np.ndarray
+
+def test_iter_permutations():
+    import types
+    from audioperm import permutations, iter_permutations
+    words = [np.full(100, i + 1, dtype=np.int16) for i in range(3)]
+    gen = iter_permutations(words, n_permutations = 4)
+    assert isinstance(gen, types.GeneratorType)
+
+    perms = list(gen)
+    assert len(perms) == 4 # 4 permutations
+    assert perms[0].dtype == np.int16
+    for p, q in zip(perms, permutations(words, n_permutations = 4)):
+        assert np.array_equal(p, q)
+
+    gens = iter_permutations([words, words[:1]], n_permutations = 10)
+    assert len(gens) == 2 # 2 audio files
+    assert len(list(gens[0])) == 6 # 3! perms
+    assert len(list(gens[1])) == 1 # 1 max perm possible
+
+    with pytest.raises(TypeError):
+        iter_permutations([1, 2, 3])
+
+def test_render_words():
+    from audioperm.utils import render_words, rendered_length
+    words = [np.array([1, 2, 3], dtype=np.int16), np.array([4, 5], dtype=np.int16)]
+
+    x = render_words(words, [1, 0], 2)
+    assert x.dtype == np.int16
+    assert np.array_equal(x, [4, 5, 0, 0, 1, 2, 3, 0, 0])
+
+    out = np.full(rendered_length(words, [0, 1], 1), 7, dtype=np.int16)
+    x = render_words(words, [0, 1], 1, out = out)
+    assert x is out
+    assert np.array_equal(out, [1, 2, 3, 0, 4, 5, 0])
+
+    with pytest.raises(ValueError):
+        render_words(words, [0, 1], 1, out = np.zeros(3, dtype=np.int16))
+    with pytest.raises(ValueError):
+        render_words(words, [0, 1], 1, out = np.zeros(7, dtype=np.float32))
+
+def test_batch_permutations():
+    from audioperm import permutations, batch_permutations
+    rng = np.random.default_rng(0)
+    words = [rng.integers(-1000, 1000, size=n).astype(np.int16) for n in (50, 120, 80, 10)]
+
+    out = batch_permutations(words, sr = 1000, n_permutations = 7, interm_silence = 20)
+    assert out.dtype == np.int16
+    assert out.shape == (7, 260 + 4 * 20)
+    for p, q in zip(out, permutations(words, sr = 1000, n_permutations = 7, interm_silence = 20)):
+        assert np.array_equal(p, q)
+
+    out = batch_permutations([words, words[:1]], sr = 1000, n_permutations = 3, interm_silence = 0)
+    assert len(out) == 2 # 2 audio files
+    assert out[0].shape == (3, 260)
+    assert out[1].shape == (1, 50) # 1 max perm possible
+
+def test_permutation_rank():
+    import itertools
+    from audioperm.utils import permutation_rank, permutation_unrank, sample_permutations
+    for rank, order in enumerate(itertools.permutations(range(4))):
+        assert permutation_unrank(rank, 4) == order
+        assert permutation_rank(order) == rank
+
+    for n in (3, 12, 25):
+        orders = list(itertools.islice(sample_permutations(n, 7), 6))
+        assert len(set(orders)) == 6 # distinct
+        assert orders == list(itertools.islice(sample_permutations(n, 7), 6)) # reproducible
+        assert all(sorted(o) == list(range(n)) for o in orders)
+    assert len(list(sample_permutations(3, 0))) == 6 # exhausts the space
+
+def test_permute_random():
+    from audioperm import permutations
+    words = [np.full(10, i + 1, dtype=np.int16) for i in range(6)]
+    perms = permutations(words, n_permutations = 20, interm_silence = 0, random = True, seed = 3)
+    assert len(perms) == 20
+    assert len({p.tobytes() for p in perms}) == 20 # unique
+    again = permutations(words, n_permutations = 20, interm_silence = 0, random = True, seed = 3)
+    assert all(np.array_equal(p, q) for p, q in zip(perms, again))
+
+    perms = permutations([words[:2], words], n_permutations = 5, random = True, seed = 3)
+    assert len(perms[0]) == 2 # 2 max perm possible
+    assert len(perms[1]) == 5
+
+def test_nonsilent_ranges():
+    import pydub
+    from audioperm.utils import nonsilent_ranges
+    sr = 8000
+    y = np.zeros(sr, dtype=np.int16)
+    y[1000:2000] = 3000
+    y[2100:2600] = -3000 # short gap, merged by keep_silence
+    y[6000:7000] = 2000
+
+    audio_segment = pydub.AudioSegment(y.tobytes(), frame_rate=sr, sample_width=2, channels=1)
+    expected = pydub.silence.split_on_silence(audio_segment, min_silence_len=20, silence_thresh=-40., keep_silence=30)
+    for engine in ("numpy", "pydub"):
+        ranges = nonsilent_ranges(y, sr, silence_thresh=-40., min_silence_len=20, keep_silence=30, engine=engine)
+        assert ranges.shape == (len(expected), 2)
+        for (start, end), s in zip(ranges, expected):
+            assert np.array_equal(y[start:end], s.get_array_of_samples())
+
+    assert len(nonsilent_ranges(np.zeros(sr, dtype=np.int16), sr)) == 0 # all silent
+    with pytest.raises(ValueError):
+        nonsilent_ranges(y, sr, engine="scipy")
+
+def test_word_segments_engine():
+    from audioperm import read_audio, word_segments
+    y = read_audio("tests/bangla_demo.wav")
+    a = word_segments(y, engine="numpy")
+    b = word_segments(y, engine="pydub")
+    assert len(a) == len(b)
+    assert all(np.array_equal(p, q) for p, q in zip(a, b))
+
+def test_word_segments_offsets():
+    from audioperm import read_audio, word_segments
+    y = read_audio("tests/bangla_demo.wav")
+    words = word_segments(y)
+    views, offsets = word_segments(y, return_offsets = True)
+
+    assert offsets.shape == (len(words), 3) and np.array_equal(offsets[:, 2], np.arange(len(words)))
+    assert len(views) == len(words)
+    for w, v, (start, end, _) in zip(words, views, offsets):
+        assert np.shares_memory(v, y) # zero-copy
+        assert len(v) == end - start
+        assert np.array_equal(v, w)
+
+    ap = AudioPerm(["tests/test.wav", "tests/bangla_demo.wav"])
+    views, offsets = ap.word_segments(return_offsets = True)
+    assert len(offsets) == 2
+    assert ap.offsets is offsets
+
+def test_max_min_heuristics_methods():
+    from audioperm.utils import max_min_heuristics, noise_boundaries
+    rng = np.random.default_rng(0)
+    y = (rng.standard_normal(10000) * 2000).astype(np.int16)
+    expected = max_min_heuristics(y, method = "sort")
+    assert np.allclose(max_min_heuristics(y, method = "partition"), expected)
+    assert np.allclose(max_min_heuristics(y, method = "histogram"), expected)
+    assert np.allclose(max_min_heuristics(y, method = "histogram", chunk_size = 999), expected)
+    assert np.allclose(noise_boundaries(y), noise_boundaries(y, method = "sort"))
+
+    y = np.array([3, -2, 5, -7, 1], dtype = np.int16) # small population
+    assert np.allclose(max_min_heuristics(y), max_min_heuristics(y, method = "sort"))
+
+    with pytest.raises(TypeError):
+        max_min_heuristics(y.astype(np.float32), method = "histogram")
+    with pytest.raises(ValueError):
+        max_min_heuristics(y, method = "quicksort")
+
+def test_parallel():
+    from concurrent.futures import ThreadPoolExecutor
+    from audioperm import read_audio, word_segments, permutations, fixed_len_segments
+    files = ["tests/bangla_demo.wav", "tests/test.wav", "tests/test.flac"]
+    serial = read_audio(files)
+    par = read_audio(files, n_jobs = 2)
+    assert all(np.array_equal(p, q) for p, q in zip(serial, par)) # input order
+
+    words = word_segments(serial)
+    for w in (word_segments(serial, n_jobs = 2), word_segments(serial, executor = ThreadPoolExecutor(2))):
+        assert [len(x) for x in w] == [len(x) for x in words]
+        assert all(np.array_equal(p, q) for x, y in zip(words, w) for p, q in zip(x, y))
+    views, offsets = word_segments(serial, n_jobs = 2, return_offsets = True)
+    assert np.shares_memory(views[0][0], serial[0])
+
+    perms = permutations(words, n_permutations = 3, random = True, seed = 1)
+    par = permutations(words, n_permutations = 3, random = True, seed = 1, n_jobs = 2)
+    assert all(np.array_equal(p, q) for x, y in zip(perms, par) for p, q in zip(x, y))
+
+    out = fixed_len_segments(files[:2], segment_size = 0.5, max_segments = 3, seed = 0, n_jobs = 2)
+    assert len(out) == 2
+    assert all(np.array_equal(p, q) for p, q in zip(out[0], fixed_len_segments(files[0], segment_size = 0.5, max_segments = 3, seed = 0)))
+
+    ap = AudioPerm(files, n_jobs = 2)
+    assert len(ap.word_segments()) == 3
+
+    if os.path.isdir("/dev/shm"): # the shared memory of the finished tasks is freed when a task fails
+        before = set(os.listdir("/dev/shm"))
+        for kwargs in (dict(n_jobs = 4), dict(executor = ThreadPoolExecutor(4))):
+            with pytest.raises(Exception):
+                read_audio([files[0], files[1], "/nonexistent.wav", files[0]], **kwargs)
+            with pytest.raises(Exception):
+                fixed_len_segments([files[0], "/nonexistent.wav", files[1]], segment_size = 0.5, max_segments = 3, **kwargs)
+        assert set(os.listdir("/dev/shm")) <= before
+
+def test_cli(tmp_path):
+    import json
+    from audioperm.cli import main, list_inputs
+    manifest = tmp_path / "inputs.jsonl"
+    manifest.write_text('{"path": "tests/bangla_demo.wav"}\n{"path": "tests/test.wav"}\n')
+    assert list_inputs(str(manifest)) == ["tests/bangla_demo.wav", "tests/test.wav"]
+    assert "tests/test.flac" in list_inputs("tests")
+    assert list_inputs("tests/*.wav") == ["tests/bangla_demo.wav", "tests/test.wav"]
+
+    out = tmp_path / "out"
+    assert main([str(manifest), "-o", str(out), "-j", "2", "--segment-size", "0.5", "--max-segments", "3"]) == 0
+    records = [json.loads(line) for line in (out / "manifest.jsonl").read_text().splitlines()]
+    assert [r["source"] for r in records] == ["tests/bangla_demo.wav", "tests/test.wav"]
+    assert len(records[0]["outputs"]) == 3
+    assert all(os.path.isfile(f) for f in records[0]["outputs"])
+
+    # resume: everything is already done
+    assert main([str(manifest), "-o", str(out)]) == 0
+    assert len((out / "manifest.jsonl").read_text().splitlines()) == 2
+
+    import shutil
+    from audioperm.cli import output_names
+    for d in ("a", "b"): # same base names in different directories
+        os.makedirs(tmp_path / "corpus" / d)
+        shutil.copy("tests/test.wav", tmp_path / "corpus" / d / "x.y.wav")
+    out = tmp_path / "out2"
+    assert main([str(tmp_path / "corpus" / "**" / "*.wav"), "-o", str(out), "--segment-size", "0.5", "--max-segments", "2"]) == 0
+    records = [json.loads(line) for line in (out / "manifest.jsonl").read_text().splitlines()]
+    outputs = [f for r in records for f in r["outputs"]]
+    assert len(set(outputs)) == 4 and all(os.path.isfile(f) for f in outputs)
+    assert os.path.join(str(out), "a", "x.y_0.wav") in outputs
+    with pytest.raises(ValueError):
+        output_names(["a/x.wav", "a/x.flac"])
+
+def test_cli_duration(monkeypatch):
+    """
+    Testing that the duration of a file without a header soundfile can read (.mp3, .m4a, ...) is the one of the decoded audio.
+    """
+    import soundfile as sf
+    from audioperm.cli import _duration
+    from audioperm.utils import load_audio
+    y, sr = load_audio("tests/test.wav", None)
+    assert _duration("tests/test.wav") == pytest.approx(len(y) / sr)
+    def no_header(*args, **kwargs):
+        raise RuntimeError("unknown format")
+    monkeypatch.setattr(sf, "info", no_header) # as for compressed containers
+    assert _duration("tests/test.wav") == pytest.approx(len(y) / sr)
+    assert _duration("/nonexistent.mp3") == 0.
+
+def test_load_audio():
+    import librosa
+    from audioperm.utils import load_audio
+    for f, sr in [("tests/test.wav", 48000), ("tests/bangla_demo.wav", 22050), ("tests/test.sph", 48000), ("tests/test.wav", 22050)]:
+        y, y_sr = load_audio(f, sr = sr)
+        expected = np.array(librosa.load(f, sr = sr)[0] * (1<<15), dtype = np.int16)
+        assert y_sr == sr
+        assert y.dtype == np.int16
+        assert np.array_equal(y, expected)
+
+    y, y_sr = load_audio("tests/test.flac", sr = None)
+    assert y_sr == 48000
+    assert np.abs(y.astype(np.int32) - np.array(librosa.load("tests/test.flac", sr = None)[0] * (1<<15), dtype = np.int16)).max() <= 1
+
+def test_stream_word_segments(tmp_path, monkeypatch):
+    import types
+    import audioperm.audioperm
+    from audioperm import read_audio, word_segments, stream_word_segments
+    rng = np.random.default_rng(0)
+    sr = 16000
+    parts = []
+    for i in range(20):
+        parts.append((rng.standard_normal(int(rng.integers(800, 8000))) * 3000).astype(np.int16))
+        parts.append(rng.integers(-2, 3, int(rng.integers(200, 6000))).astype(np.int16))
+    y = np.concatenate(parts)
+    words = word_segments(y, sr, min_silence_len = 20)
+
+    gen = stream_word_segments(y, sr, min_silence_len = 20, block_size = 5000)
+    assert isinstance(gen, types.GeneratorType)
+    streamed = list(gen)
+    assert len(streamed) == len(words)
+    assert all(np.array_equal(p, q) for p, q in zip(words, streamed))
+
+    n_read = [0] # a word is yielded before all the blocks are read
+    def counted_blocks(*args):
+        for block in iter_blocks(*args):
+            n_read[0] += 1
+            yield block
+    iter_blocks = audioperm.audioperm.iter_blocks
+    monkeypatch.setattr(audioperm.audioperm, "iter_blocks", counted_blocks)
+    gen = stream_word_segments(y, sr, min_silence_len = 20, block_size = 500)
+    next(gen)
+    n_first = n_read[0]
+    list(gen)
+    assert n_first < n_read[0] # the histogram pass reads every block once, the words come during the second pass
+    monkeypatch.undo()
+
+    np.save(tmp_path / "long.npy", y) # memory-mapped
+    streamed = list(stream_word_segments(str(tmp_path / "long.npy"), sr, min_silence_len = 20, block_size = 7777, return_offsets = True))
+    assert all(np.array_equal(p, q) for p, (q, _) in zip(words, streamed))
+
+    words, offsets = word_segments(read_audio("tests/bangla_demo.wav"), return_offsets = True)
+    streamed = list(stream_word_segments("tests/bangla_demo.wav", block_size = 4096, return_offsets = True))
+    assert len(streamed) == len(words)
+    assert np.array_equal(np.concatenate([o for w, o in streamed]), offsets)
+
+def test_merge_noise_closures():
+    from audioperm import word_segments, batch_word_segments, stream_word_segments, permutations, permutation_plan
+    rng = np.random.default_rng(0)
+    sr = 8000
+    gap = np.zeros(3000, dtype = np.int16)
+    word = lambda: (rng.standard_normal(4000) * 6000).astype(np.int16)
+    noise = lambda: rng.integers(-200, 201, 2000).astype(np.int16)
+    y = np.concatenate([word(), gap, noise(), gap, word(), gap, noise(), gap, word()]) # a word after a noise closure extends the closed word
+    words = word_segments(y, sr)
+    assert [len(w) for w in words] == [8400, 17600, 22400]
+    assert all(np.array_equal(p, q) for p, q in zip(words, word_segments(y, sr, engine = "pydub")))
+    assert all(np.array_equal(p, q) for p, q in zip(words, stream_word_segments(y, sr, block_size = 1000)))
+
+    # the words skip the silence between their chunks, with or without offsets
+    views, offsets = word_segments(y, sr, return_offsets = True)
+    assert len(views) == len(words) and all(np.array_equal(p, q) for p, q in zip(words, views))
+    assert len(offsets) > len(words) and np.array_equal(np.unique(offsets[:, 2]), np.arange(len(words)))
+    assert np.array_equal(batch_word_segments([y], sr = sr)[0], offsets)
+    streamed = list(stream_word_segments(y, sr, block_size = 1000, return_offsets = True))
+    assert np.array_equal(np.concatenate([o for _, o in streamed]), offsets)
+    plan = permutation_plan(offsets, sr = sr, n_permutations = 6)
+    assert plan.orders.shape == (6, 3) and all(np.array_equal(plan.render(y, i), p) for i, p in enumerate(permutations(words, sr = sr, n_permutations = 6)))
+
+def test_stream_no_silence(tmp_path):
+    import tracemalloc
+    from audioperm import stream_word_segments
+    from audioperm.utils import nonsilent_ranges, stream_nonsilent_ranges
+    sr = 16000
+    y = (np.random.default_rng(0).standard_normal(120 * sr) * 328).astype(np.int16) # about -40 dBFS, never silent
+    np.save(tmp_path / "noise.npy", y) # memory-mapped
+    tracemalloc.start()
+    words = list(stream_word_segments(str(tmp_path / "noise.npy"), sr, block_size = 4096))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert len(words) == 1 and np.array_equal(words[0], y)
+    assert peak < 2 * y.nbytes # the word (and the histogram of the noise boundaries), not the rescans of a growing buffer
+
+    chunks = list(stream_nonsilent_ranges((y[i:i + 777] for i in range(0, len(y), 777)), sr, silence_thresh = -60., min_silence_len = 5))
+    assert [c[:2] for c in chunks] == [tuple(r) for r in nonsilent_ranges(y, sr, silence_thresh = -60., min_silence_len = 5).tolist()]
+
+def test_cache(tmp_path, monkeypatch):
+    from audioperm import AudioPerm, read_audio, word_segments, fixed_len_segments
+    from audioperm.cache import AudioCache
+    files = ["tests/test.wav", "tests/bangla_demo.wav"]
+    words = word_segments(read_audio(files))
+    cache = AudioCache(str(tmp_path / "cache"))
+    for _ in range(2):
+        cached = word_segments(read_audio(files, cache = cache), cache = cache)
+        assert all(len(p) == len(q) and all(np.array_equal(a, b) for a, b in zip(p, q)) for p, q in zip(words, cached))
+    assert cache.stats()["misses"] == 4 # 2 decodes and 2 segment tables
+    assert cache.stats()["hits"] == 4
+
+    ap = AudioPerm("tests/test.wav", cache = str(tmp_path / "cache"))
+    assert all(np.array_equal(a, b) for a, b in zip(ap.word_segments(), words[0]))
+    assert ap.cache.stats()["misses"] == 0
+
+    segments = fixed_len_segments("tests/bangla_demo.wav", segment_size = 0.5, seed = 0)
+    for _ in range(2):
+        cached = fixed_len_segments("tests/bangla_demo.wav", segment_size = 0.5, seed = 0, cache = cache)
+        assert len(cached) == len(segments) and all(np.array_equal(a, b) for a, b in zip(cached, segments))
+
+    small = AudioCache(str(tmp_path / "small"), max_bytes = 1000)
+    read_audio(files, cache = small)
+    assert small.stats()["evictions"] > 0
+    assert small.stats()["bytes"] <= 1000
+
+    # an entry evicted by another worker between its read and its utime is still a hit
+    cache.put("raced", x = np.arange(3))
+    def evicted(f, *args, **kwargs):
+        raise FileNotFoundError(f)
+    monkeypatch.setattr(os, "utime", evicted)
+    assert np.array_equal(cache.get("raced")["x"], np.arange(3))
+
+def test_fixed_len_segments_engine():
+    from audioperm import fixed_len_segments
+    from audioperm.utils import eq_windows
+    for kwargs in [dict(segment_size = 0.5, max_segments = 30), dict(segment_size = 0.13, max_segments = 200), dict(segment_size = 0.3, max_segments = 0)]:
+        fast = fixed_len_segments("tests/bangla_demo.wav", seed = 3, engine = "numpy", **kwargs)
+        slow = fixed_len_segments("tests/bangla_demo.wav", seed = 3, engine = "pydub", **kwargs)
+        assert len(fast) == len(slow) == kwargs["max_segments"]
+        assert all(np.array_equal(a, b) for a, b in zip(fast, slow))
+    assert eq_windows(50, 22050, 5).shape == (0, 2)
+
+def test_benchmark(tmp_path):
+    import json, subprocess, sys
+    out = tmp_path / "bench.json"
+    subprocess.run([sys.executable, "benchmarks/bench_audioperm.py", "--durations", "1", "--files", "1", "--repeat", "1", "--stages", "read_audio", "word_segments", "--json", str(out)], check = True, capture_output = True)
+    results = json.loads(out.read_text())
+    assert [r["stage"] for r in results] == ["read_audio", "word_segments"]
+    assert all(r["rtf"] > 0 for r in results)
+
+def test_stats(tmp_path):
+    import json
+    from audioperm import AudioPerm
+    from audioperm.stats import Stats
+    seen = []
+    stats = Stats(hooks = [seen.append])
+    ap = AudioPerm(["tests/test.wav", "tests/bangla_demo.wav"], stats = stats, cache = str(tmp_path / "cache"))
+    words = ap.word_segments()
+    perms = ap.permutations(n_permutations = 2)
+    assert seen == stats.records
+    totals = stats.to_dict()["totals"]
+    assert totals["decode"]["calls"] == 2 and totals["decode"]["samples"] == sum(len(y) for y in ap.audio_files)
+    assert totals["cache"]["cache_misses"] == 4
+    assert totals["merge_chunks"]["segments"] == sum(len(w) for w in words)
+    assert totals["permutations"]["segments"] == sum(len(p) for p in perms)
+    assert all(r["wall_time"] >= 0 for r in stats.records)
+
+    stats.to_jsonl(str(tmp_path / "stats.jsonl"))
+    lines = [json.loads(l) for l in open(tmp_path / "stats.jsonl")]
+    assert lines == stats.records
+
+    parallel = AudioPerm(["tests/test.wav", "tests/bangla_demo.wav"], n_jobs = 2, stats = Stats(track_memory = True))
+    parallel.word_segments()
+    assert {(r["stage"], r["file"]) for r in parallel.stats.records} == {(r["stage"], r["file"]) for r in stats.records if r["stage"] not in ("cache", "permutations")}
+    assert parallel.stats.totals()["decode"]["peak_bytes"] > 0
+    assert AudioPerm("tests/test.wav").stats is None
+
+def test_augmentation():
+    from audioperm import read_audio, word_segments, permutations, fixed_len_segments
+    from audioperm.augmentation import Augmentation, gain, add_noise, time_shift, speed, random_gaps
+    rng = np.random.default_rng(0)
+    x = (np.sin(np.arange(4000) / 7.) * 0.5).astype(np.float32)[None].repeat(8, axis = 0)
+    assert np.allclose(gain(x, rng, 6., 6.), x * 10 ** (6 / 20), atol = 1e-6)
+    noisy = add_noise(x, rng, 20., 20.)
+    snr = 10 * np.log10(np.mean(x ** 2, axis = 1) / np.mean((noisy - x) ** 2, axis = 1))
+    assert np.all(np.abs(snr - 20.) < 1.)
+    shifted = time_shift(x, rng, 0.1)
+    assert shifted.shape == x.shape and all(np.allclose(np.sort(r), np.sort(x[0])) for r in shifted)
+    assert np.array_equal(speed(x, rng, 1., 1.), x)
+    assert np.all(speed(x, rng, 2., 2.)[:, 2000:] == 0)
+    gaps = random_gaps(5, 7, 100, rng)
+    assert gaps.shape == (5, 7) and np.all(gaps.sum(axis = 1) == 700) and np.all(gaps >= 0)
+
+    words = word_segments(read_audio(["tests/bangla_demo.wav", "tests/test.wav"]))
+    augment = Augmentation(gain_db = (-3, 3), snr_db = (10, 30), shift = 0.05, speed_rate = (0.9, 1.1), gap_jitter = 0.5)
+    plain = permutations(words, n_permutations = 3, seed = 1)
+    augmented = permutations(words, n_permutations = 3, seed = 1, augment = augment)
+    assert [[len(p) for p in f] for f in augmented] == [[len(p) for p in f] for f in plain]
+    assert all(p.dtype == np.int16 for f in augmented for p in f)
+    assert not np.array_equal(augmented[0][0], plain[0][0])
+    again = permutations(words, n_permutations = 3, seed = 1, augment = augment, n_jobs = 2)
+    assert all(np.array_equal(p, q) for f, g in zip(augmented, again) for p, q in zip(f, g))
+
+    segments = fixed_len_segments("tests/bangla_demo.wav", segment_size = 0.5, seed = 0, augment = augment)
+    assert [len(s) for s in segments] == [len(s) for s in fixed_len_segments("tests/bangla_demo.wav", segment_size = 0.5, seed = 0)]
+
+def test_async():
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from audioperm import AudioPerm, read_audio, word_segments, iter_permutations, aread_audio, aword_segments, aiter_permutations
+    files = ["tests/test.wav", "tests/bangla_demo.wav"]
+    audio = read_audio(files)
+    words = word_segments(audio)
+
+    async def main():
+        semaphore = asyncio.Semaphore(1)
+        with ThreadPoolExecutor(2) as ex:
+            a = await aread_audio(files, executor = ex, limit = semaphore)
+            assert all(np.array_equal(p, q) for p, q in zip(a, audio))
+            w = await aword_segments(a, executor = ex, limit = 2)
+            assert all(np.array_equal(p, q) for f, g in zip(w, words) for p, q in zip(f, g))
+
+            perms = [p async for p in aiter_permutations(words[1], n_permutations = 4, random = True, seed = 3, executor = ex)]
+            assert all(np.array_equal(p, q) for p, q in zip(perms, iter_permutations(words[1], n_permutations = 4, random = True, seed = 3)))
+
+            ap = await AudioPerm.aload(files, executor = ex)
+            assert ap.audio_type == list
+            w, offsets = await ap.aword_segments(return_offsets = True)
+            assert len(w) == len(offsets) == 2
+            perms = [p async for p in ap.aiter_permutations(n_permutations = 2)[1]]
+            assert len(perms) == 2
+
+            task = asyncio.ensure_future(aword_segments([y for y in audio for _ in range(20)], executor = ex, limit = 1))
+            await asyncio.sleep(0)
+            task.cancel()
+            try:
+                await task
+                assert False
+            except asyncio.CancelledError:
+                pass
+
+    asyncio.run(main())
+
+def test_write_permutations(tmp_path):
+    import soundfile as sf
+    from audioperm import AudioPerm, read_audio, word_segments, permutations, write_permutations, fixed_len_segments
+    from audioperm.writer import BackgroundWriter
+    words = word_segments(read_audio(["tests/bangla_demo.wav", "tests/test.wav"]))
+    paths = write_permutations(words, str(tmp_path / "perms"), n_permutations = 4, random = True, seed = 2, file_save_tag = "p")
+    perms = permutations(words, n_permutations = 4, random = True, seed = 2)
+    assert [len(p) for p in paths] == [len(p) for p in perms]
+    assert os.path.basename(paths[0][1]) == "p0_1.wav"
+    assert all(np.array_equal(sf.read(p, dtype = "int16")[0], q) for ps, qs in zip(paths, perms) for p, q in zip(ps, qs))
+
+    ap = AudioPerm("tests/bangla_demo.wav")
+    ap.word_segments()
+    assert len(ap.write_permutations(str(tmp_path / "ap"), n_permutations = 2)) == 2
+
+    segments = fixed_len_segments("tests/bangla_demo.wav", segment_size = 0.3, max_segments = 20, seed = 1)
+    fixed_len_segments("tests/bangla_demo.wav", save = True, return_segments = False, save_path = str(tmp_path / "fls"), segment_size = 0.3, max_segments = 20, seed = 1)
+    assert all(np.array_equal(sf.read(str(tmp_path / "fls" / f"bangla_demo_{i}.wav"), dtype = "int16")[0], s) for i, s in enumerate(segments))
+
+    writer = BackgroundWriter(max_pending = 1)
+    writer.write(str(tmp_path / "missing" / "x.wav"), np.zeros(10, dtype = np.int16))
+    try:
+        writer.close()
+        assert False
+    except Exception:
+        pass
+
+def test_shards(tmp_path):
+    from audioperm import read_audio, word_segments, permutations, write_permutations, fixed_len_segments
+    from audioperm.shards import ShardWriter, ShardReader
+    words = word_segments(read_audio(["tests/bangla_demo.wav", "tests/test.wav"]))
+    clips = write_permutations(words, str(tmp_path / "perms"), n_permutations = 4, random = True, seed = 2, shard_size = 300000)
+    perms = permutations(words, n_permutations = 4, random = True, seed = 2)
+    reader = ShardReader(str(tmp_path / "perms"))
+    assert len(reader) == 5 and len(reader.offsets) == 5
+    assert len([f for f in os.listdir(tmp_path / "perms") if f.endswith(".pcm")]) > 1
+    assert all(np.array_equal(reader[c], p) for cs, ps in zip(clips, perms) for c, p in zip(cs, ps))
+    assert reader.meta[4] == {"source": 1, "rank": 0, "order": [0], "gap": 22050}
+    assert isinstance(reader[0], np.memmap) and not reader[0].flags.writeable
+
+    write_permutations(words, str(tmp_path / "perms"), n_permutations = 1, seed = 2, shard_size = 300000) # a shorter run replaces the shards
+    assert len(ShardReader(str(tmp_path / "perms"))) == 2
+    with pytest.raises(FileExistsError):
+        ShardWriter(str(tmp_path / "perms"))
+    ShardWriter(str(tmp_path / "perms"), overwrite = True).close()
+    assert len(ShardReader(str(tmp_path / "perms"))) == 0
+
+    segments = fixed_len_segments("tests/bangla_demo.wav", segment_size = 0.3, max_segments = 20, seed = 1)
+    with ShardWriter(str(tmp_path / "fls"), max_bytes = 1<<20) as writer:
+        fixed_len_segments("tests/bangla_demo.wav", save = True, return_segments = False, segment_size = 0.3, max_segments = 20, seed = 1, shard_writer = writer)
+    reader = ShardReader(str(tmp_path / "fls" / "shard_00000.pcm"))
+    assert [m["segment"] for m in reader.meta] == list(range(20))
+    assert all(np.array_equal(a, b) for a, b in zip(reader, segments))
+
+def test_permutation_plan(tmp_path):
+    import pickle
+    from audioperm import AudioPerm, read_audio, word_segments, permutations, permutation_plan
+    from audioperm.plan import PermutationPlan
+    audio = read_audio(["tests/bangla_demo.wav", "tests/test.wav"])
+    words, offsets = word_segments(audio, return_offsets = True)
+    for random in [False, True]:
+        plans = permutation_plan(offsets, n_permutations = 5, random = random, seed = 4)
+        perms = permutations(words, n_permutations = 5, random = random, seed = 4)
+        assert [p.orders.shape for p in plans] == [(5, 3), (1, 1)]
+        assert plans[0].orders.dtype == np.uint8
+        assert all(np.array_equal(plan.render(y, i), p) for plan, y, ps in zip(plans, audio, perms) for i, p in enumerate(ps))
+        assert all(len(p) == plans[0].length for p in perms[0])
+
+    plan = pickle.loads(pickle.dumps(plans[0]))
+    assert np.array_equal(np.concatenate(list(plan.blocks(audio[0], 2))), plan.render(audio[0], plan.orders[2]))
+    plan.save(str(tmp_path / "plan.npz"))
+    loaded = PermutationPlan.load(str(tmp_path / "plan.npz"))
+    assert np.array_equal(loaded.orders, plan.orders) and loaded.gap == plan.gap
+
+    quiet = np.random.default_rng(0).integers(-2, 3, 16000).astype(np.int16) # no words
+    quiet_words, quiet_offsets = word_segments(quiet, 16000, return_offsets = True)
+    assert quiet_words == [] and quiet_offsets.shape == (0, 3)
+    plan = permutation_plan(quiet_offsets, sr = 16000, n_permutations = 3)
+    assert plan.orders.shape == (1, 0) and plan.length == 0 and len(plan.render(quiet, 0)) == 0 # the empty permutation, like permutations
+    plan.save(str(tmp_path / "quiet.npz"))
+    assert PermutationPlan.load(str(tmp_path / "quiet.npz")).orders.shape == (1, 0)
+
+    big = permutation_plan(np.arange(20).reshape(10, 2), n_permutations = 100000)
+    assert big.orders.shape == (100000, 10) and big.orders.nbytes == 1000000
+
+    ap = AudioPerm("tests/bangla_demo.wav")
+    try:
+        ap.permutation_plan()
+        assert False
+    except ValueError:
+        pass
+    ap.word_segments(return_offsets = True)
+    assert len(ap.permutation_plan(n_permutations = 3)) == 3
+
+def test_lazy_imports():
+    """
+    Testing that importing audioperm and working on arrays does not import the audio backends.
+    """
+    import subprocess
+    import sys
+    code = """
+import sys
+import numpy as np
+import audioperm
+heavy = ["librosa", "pydub", "soundfile", "scipy", "numba", "asyncio"]
+loaded = [m for m in heavy if m in sys.modules]
+y = (np.sin(np.arange(22050) / 20.) * 8000).astype(np.int16)
+y[5000:10000] = 0
+ap = audioperm.AudioPerm(y)
+ap.word_segments()
+ap.permutations(n_permutations = 2)
+print(loaded, [m for m in heavy if m in sys.modules])
+"""
+    out = subprocess.run([sys.executable, "-c", code], capture_output = True, text = True, check = True).stdout
+    assert out.split() == ["[]", "[]"]
+
+def test_rank_sharding(tmp_path):
+    """
+    Testing that shards of the permutation ranks are disjoint and give the same outputs as a single job.
+    """
+    import itertools
+    from audioperm import read_audio, word_segments, permutations, batch_permutations, permutation_plan, write_permutations, fixed_len_segments
+    from audioperm.utils import permutation_range, permutation_rank, rank_range
+    assert list(permutation_range(5, 37, 70)) == list(itertools.permutations(range(5)))[37:70]
+    assert [permutation_rank(o) for o in permutation_range(6, 100, 110)] == list(range(100, 110))
+    assert [rank_range(10, shard_index = i, num_shards = 3) for i in range(3)] == [range(0, 3), range(3, 6), range(6, 10)]
+    assert rank_range(10, start_rank = 5, shard_index = 1, num_shards = 3) == range(5, 6)
+    with pytest.raises(ValueError):
+        rank_range(10, shard_index = 3, num_shards = 3)
+
+    words = word_segments(read_audio(["tests/bangla_demo.wav"]))[0]
+    for random in [False, True]:
+        full = permutations(words, n_permutations = 6, random = random, seed = 2)
+        shards = [permutations(words, n_permutations = 6, random = random, seed = 2, shard_index = k, num_shards = 4) for k in range(4)]
+        assert [len(s) for s in shards] == [1, 2, 1, 2]
+        assert all(np.array_equal(a, b) for a, b in zip(full, sum(shards, [])))
+        resumed = permutations(words, n_permutations = 6, random = random, seed = 2, start_rank = 4, stop_rank = 5)
+        assert len(resumed) == 1 and np.array_equal(resumed[0], full[4])
+        assert np.array_equal(batch_permutations(words, n_permutations = 6, random = random, seed = 2, start_rank = 3), np.stack(full[3:]))
+
+    # ranges past the permutations are empty, like permutations gives []
+    two = [np.full(50, 2, dtype = np.int16), np.ones(100, dtype = np.int16)]
+    assert permutations(two, n_permutations = 6, start_rank = 3) == []
+    assert batch_permutations(two, n_permutations = 6, start_rank = 3).shape == (0, 44250)
+    assert [batch_permutations(two, n_permutations = 2, shard_index = k, num_shards = 3).shape for k in range(3)] == [(0, 44250), (1, 44250), (1, 44250)]
+
+    paths = [write_permutations(words, str(tmp_path), n_permutations = 6, shard_index = k, num_shards = 2) for k in range(2)]
+    assert [os.path.basename(p) for p in sum(paths, [])] == [f"0_{i}.wav" for i in range(6)]
+    offsets = word_segments(read_audio(["tests/bangla_demo.wav"]), return_offsets = True)[1][0]
+    assert np.array_equal(permutation_plan(offsets, n_permutations = 6, start_rank = 2).orders, permutation_plan(offsets, n_permutations = 6).orders[2:])
+
+    segs = fixed_len_segments("tests/bangla_demo.wav", segment_size = 0.5, max_segments = 10, seed = 1)
+    parts = [fixed_len_segments("tests/bangla_demo.wav", segment_size = 0.5, max_segments = 10, seed = 1, shard_index = k, num_shards = 3) for k in range(3)]
+    assert len(sum(parts, [])) == len(segs) and all(np.array_equal(a, b) for a, b in zip(segs, sum(parts, [])))
+
+    # augmented ranks are the same whichever shard or resumed range generates them
+    from audioperm.augmentation import Augmentation
+    from audioperm.shards import ShardReader
+    augment = Augmentation(gain_db = (-3, 3), snr_db = (10, 30), gap_jitter = 0.5)
+    full = permutations(words, n_permutations = 6, random = True, seed = 2, augment = augment)
+    shards = [permutations(words, n_permutations = 6, random = True, seed = 2, augment = augment, shard_index = k, num_shards = 4) for k in range(4)]
+    assert all(np.array_equal(a, b) for a, b in zip(full, sum(shards, [])))
+    resumed = permutations(words, n_permutations = 6, random = True, seed = 2, augment = augment, start_rank = 4)
+    assert all(np.array_equal(a, b) for a, b in zip(full[4:], resumed))
+    for k in range(2):
+        write_permutations(words, str(tmp_path / "aug"), n_permutations = 6, random = True, seed = 2, augment = augment, shard_size = 1<<20, shard_index = k, num_shards = 2)
+    reader = ShardReader(str(tmp_path / "aug"))
+    assert sorted(m["rank"] for m in reader.meta) == list(range(6))
+    assert all(np.array_equal(full[m["rank"]], clip) for m, clip in zip(reader.meta, reader))
+    segs = fixed_len_segments("tests/bangla_demo.wav", segment_size = 0.5, max_segments = 10, seed = 1, augment = augment)
+    parts = [fixed_len_segments("tests/bangla_demo.wav", segment_size = 0.5, max_segments = 10, seed = 1, augment = augment, shard_index = k, num_shards = 3) for k in range(3)]
+    assert all(np.array_equal(a, b) for a, b in zip(segs, sum(parts, [])))
+
+def test_permutation_dataset():
+    """
+    Testing the iterable dataset: fixed length segments, split across ranks without overlap.
+    """
+    from audioperm.dataset import PermutationDataset, shuffle_buffer
+    from audioperm.augmentation import Augmentation
+    files = ["tests/bangla_demo.wav", "tests/test.wav", "tests/test.flac"]
+    kwargs = dict(segment_size = 0.5, n_permutations = 3, seed = 1, augment = Augmentation(gain_db = (-3, 3)))
+    full = [np.asarray(s) for s in PermutationDataset(files, **kwargs)]
+    assert len(full) > 0 and all(s.shape == (11025,) and s.dtype == np.int16 for s in full)
+    parts = [np.asarray(s) for r in range(2) for s in PermutationDataset(files, rank = r, world_size = 2, prefetch = 0, **kwargs)]
+    assert sorted(s.tobytes() for s in parts) == sorted(s.tobytes() for s in full)
+
+    ds = PermutationDataset(files, shuffle_buffer = 4, dtype = "float32", **kwargs)
+    shuffled = [np.asarray(s) for s in ds]
+    assert shuffled[0].dtype == np.float32 and len(shuffled) == len(full)
+    assert all(np.array_equal(a, b) for a, b in zip(shuffled, ds))
+    assert sorted(shuffle_buffer(range(100), 10, 0)) == list(range(100))
+
+    from audioperm import read_audio, word_segments, permutation_segments
+    words = word_segments(read_audio(files[:2]))
+    segs = list(permutation_segments(enumerate(words), 2, segment_size = 0.5, n_permutations = 3, seed = 1))
+    reverse = list(permutation_segments(reversed(list(enumerate(words))), 2, segment_size = 0.5, n_permutations = 3, seed = 1))
+    assert sorted((i, s.tobytes()) for i, s in segs) == sorted((i, s.tobytes()) for i, s in reverse) # the segments of a file depend on its index, not the order
+    with pytest.raises(TypeError):
+        PermutationDataset([1, 2])
+
+def test_batch_word_segments():
+    """
+    Testing that the batched segmentation of many clips gives the offsets of word_segments.
+    """
+    from audioperm import read_audio, word_segments, batch_word_segments
+    y = read_audio(["tests/bangla_demo.wav"], return_as_array = True)[0]
+    rng = np.random.default_rng(0)
+    clips = [np.roll(y, int(rng.integers(len(y))))[:int(rng.integers(len(y) // 3, len(y)))] for _ in range(40)]
+    clips += read_audio(["tests/test.wav", "tests/test.flac"], return_as_array = True)
+    expected = word_segments(clips, return_offsets = True)[1]
+    offsets = batch_word_segments(clips, batch_samples = 1<<18)
+    assert all(np.array_equal(a, b) for a, b in zip(offsets, expected))
+
+    padded = np.zeros((len(clips), max(len(c) for c in clips)), dtype = np.int16)
+    for row, c in zip(padded, clips):
+        row[:len(c)] = c
+    words, offsets = batch_word_segments(padded, [len(c) for c in clips], return_words = True)
+    assert all(np.array_equal(a, b) for a, b in zip(offsets, expected))
+    assert all(np.array_equal(w, v) for w, v in zip(words[0], word_segments(clips[0])))
+    with pytest.raises(TypeError):
+        batch_word_segments([c.astype(np.float32) for c in clips])
+
+def test_polyphase_resample(tmp_path):
+    """
+    Testing the polyphase resampler against scipy's resample_poly, block by block and through load_audio.
+    """
+    import soundfile as sf
+    from scipy.signal import resample_poly
+    from audioperm import read_audio
+    from audioperm.resample import resample, resample_blocks, polyphase_filter
+    from audioperm.utils import load_audio, iter_blocks
+    y = read_audio(["tests/bangla_demo.wav"], return_as_array = True)[0]
+    for orig_sr, target_sr in [(22050, 16000), (22050, 44100), (44100, 22050)]:
+        up, down, _, _ = polyphase_filter(orig_sr, target_sr, "medium")
+        expected = resample_poly(y.astype(np.float64), up, down)
+        out = resample(y, orig_sr, target_sr, "medium")
+        assert out.dtype == np.int16 and len(out) == len(expected)
+        assert np.abs(out - expected).max() <= 1 # float32 filter
+        for block_size in (1000, 4096):
+            blocks = resample_blocks((y[i:i + block_size] for i in range(0, len(y), block_size)), orig_sr, target_sr, "medium")
+            assert np.array_equal(np.concatenate(list(blocks)), out)
+    hits = polyphase_filter.cache_info().hits
+    resample(y, 22050, 16000, "medium")
+    assert polyphase_filter.cache_info().hits == hits + 1
+    with pytest.raises(ValueError):
+        resample(y, 22050, 16000, "best")
+
+    f = str(tmp_path / "a_44k.wav")
+    sf.write(f, y, 44100, "PCM_16")
+    for quality in ("low", "soxr"):
+        out, sr = load_audio(f, 22050, resample = quality)
+        assert sr == 22050 and np.array_equal(out, resample(y, 44100, 22050, quality))
+        streamed = np.concatenate(list(iter_blocks(f, 22050, 5000, resample = quality)))
+        assert len(streamed) == len(out) and np.abs(streamed - out.astype(np.int32)).max() <= (0 if quality == "low" else 2)
+        assert np.array_equal(AudioPerm(f, sr = 22050, resample = quality).audio_files[0], out)
+    librosa_out = load_audio(f, 22050)[0]
+    assert np.abs(load_audio(f, 22050, resample = "soxr")[0] - librosa_out.astype(np.int32)).max() <= 2 # the same resampler, without the float round trip